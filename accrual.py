@@ -0,0 +1,202 @@
+import argparse
+import sys
+from datetime import date
+from ledger import balance_change
+from records import APPROVED, PENDING
+from reporting import format_table, write_csv
+from utils import to_ordinal
+
+# Yearly leave accrual and carry-over, applied to every employee in one batch.
+#
+# The policy (ACCRUAL_POLICY in config.py) maps a leave type to its rules:
+#   grant               days added at the start of each year
+#   prorate             scale the grant by the share of the year left after the
+#                       employee's "joined_on" date (employees without one get it all)
+#   carry_over          most unused days kept from last year (None keeps all of them,
+#                       0 resets the balance)
+#   carry_over_expires  "MM-DD": carried-over days not used by leave starting on or
+#                       before this date are removed by the expiry run
+# Leave types without a rule are left alone.
+#
+# Every balance change is recorded as a grant in the employee's ledger (ledger.py)
+# with the run ID as its reason. The days an accrual run carried over under a rule with
+# carry_over_expires are kept on the employee's record for the expiry run, as
+# "carried_over": {"year": 2027, "days": {leave_type: days}}.
+#
+# Every run has an ID ("accrual-2027", "expire-2027" by default) recorded in the store
+# in the same commit as the balance changes, so applying a run twice (by ID, or the
+# same kind of run for the same year) is refused. Runs are also written to the audit
+# log. A dry run computes the same changes without saving anything.
+
+RUNS_KEY = "accrual_runs"
+CARRIED_KEY = "carried_over"
+
+
+class AccrualResult:
+    # Outcome of a run: one diff row per changed balance and, per changed employee, the
+    # partial change to save (new balances and ledger grants, see ledger.balance_change)
+    def __init__(self, run_id, dry_run):
+        self.run_id = run_id
+        self.dry_run = dry_run
+        self.already_applied = False
+        self.diffs = []
+        self.changes = {}
+
+    def summary(self):
+        if self.already_applied:
+            return f"Run {self.run_id} was already applied; nothing changed."
+        verb = "would change" if self.dry_run else "changed"
+        return f"Run {self.run_id} {verb} {len(self.diffs)} balance(s) of {len(self.changes)} employee(s)."
+
+
+# Grant for one employee: the full grant, or the share of the year from joined_on on
+def _grant(rule, joined, first, last):
+    grant = rule.get("grant", 0)
+    if not rule.get("prorate") or joined is None or joined <= first:
+        return grant
+    if joined > last:
+        return 0
+    return grant * (last - joined + 1) // (last - first + 1)
+
+
+# New balances for every employee for the year, and the carried-over days that expire
+# later
+def plan_accrual(db, year, policy, run_id=None, dry_run=False):
+    result = AccrualResult(run_id or f"accrual-{year}", dry_run)
+    first = date(year, 1, 1).toordinal()
+    last = date(year, 12, 31).toordinal()
+    rules = list(policy.items())
+    today = date.today().isoformat()
+    for name, emp in db.iter_employees():
+        balances = emp.get("leave_balance", {})
+        joined = emp.get("joined_on")
+        joined = to_ordinal(joined) if isinstance(joined, str) else None
+        new_balances = {}
+        carried = {}
+        for ltype, rule in rules:
+            old = balances.get(ltype, 0)
+            cap = rule.get("carry_over")
+            kept = old if cap is None else min(old, cap)
+            new = kept + _grant(rule, joined, first, last)
+            if rule.get("carry_over_expires") and kept > 0:
+                carried[ltype] = kept
+            if new != old or ltype not in balances:
+                new_balances[ltype] = new
+                result.diffs.append({"employee": name, "leave_type": ltype, "old": old, "new": new, "change": new - old})
+        if new_balances:
+            result.changes[name] = balance_change(emp, new_balances, result.run_id, today)
+        if carried:
+            result.changes.setdefault(name, {})[CARRIED_KEY] = {"year": year, "days": carried}
+    return result
+
+
+# Remove carried-over days the accrual run for the year recorded and that were not
+# used by Pending/Approved leave starting by the type's carry_over_expires date
+def plan_expiry(db, year, policy, run_id=None, dry_run=False):
+    result = AccrualResult(run_id or f"expire-{year}", dry_run)
+    first = date(year, 1, 1).toordinal()
+    deadlines = {ltype: to_ordinal(f"{year}-{rule['carry_over_expires']}")
+                 for ltype, rule in policy.items() if rule.get("carry_over_expires")}
+    today = date.today().isoformat()
+    for name, emp in db.iter_employees():
+        carried = emp.get(CARRIED_KEY)
+        if not isinstance(carried, dict) or carried.get("year") != year:
+            continue
+        kept = carried.get("days", {})
+        balances = emp.get("leave_balance", {})
+        new_balances = {}
+        for ltype, days in kept.items():
+            deadline = deadlines.get(ltype)
+            if deadline is None:
+                continue
+            used = sum(entry.get("days") or 0 for entry in emp.get("leave_history", [])
+                       if entry.get("type") == ltype and entry.get("status") in (PENDING, APPROVED)
+                       and first <= (to_ordinal(entry.get("start_date")) or 0) <= deadline)
+            old = balances.get(ltype, 0)
+            expired = min(max(days - used, 0), max(old, 0))
+            if expired:
+                new_balances[ltype] = old - expired
+                result.diffs.append({"employee": name, "leave_type": ltype, "old": old, "new": old - expired,
+                                     "change": -expired})
+        if new_balances:
+            result.changes[name] = balance_change(emp, new_balances, result.run_id, today)
+    return result
+
+
+# Run the yearly accrual (kind "accrual") or carry-over expiry (kind "expire") for a
+# year. The store stays locked from reading the balances to saving them, and the new
+# balances are saved with the run's record in one commit.
+def run(db, kind, year, policy=None, run_id=None, dry_run=False, actor="Admin"):
+    if policy is None:
+        from config import ACCRUAL_POLICY
+        policy = ACCRUAL_POLICY
+    run_id = run_id or f"{kind}-{year}"
+    with db.locked():
+        db.refresh()
+        runs = db.get_meta(RUNS_KEY, {})
+        # The same run ID, or any run of the same kind for the same year, counts as applied
+        applied = next((rid for rid, r in runs.items()
+                        if rid == run_id or (r.get("kind"), r.get("year")) == (kind, year)), None)
+        if applied is not None:
+            result = AccrualResult(applied, dry_run)
+            result.already_applied = True
+            return result
+        if kind == "accrual":
+            result = plan_accrual(db, year, policy, run_id, dry_run)
+        else:
+            if not any(r.get("kind") == "accrual" and r.get("year") == year for r in runs.values()):
+                raise ValueError(f"No accrual run for {year} has been applied, so nothing can expire.")
+            result = plan_expiry(db, year, policy, run_id, dry_run)
+        if dry_run:
+            return result
+        runs[result.run_id] = {"kind": kind, "year": year, "date": date.today().isoformat(), "actor": actor,
+                               "employees": len(result.changes)}
+        db.update_employees(result.changes, meta={RUNS_KEY: runs})
+    db.log_action(f"{actor} applied {kind} run {result.run_id}: {len(result.diffs)} balance(s) of "
+                  f"{len(result.changes)} employee(s) changed.", actor=actor, action=kind, run_id=result.run_id)
+    return result
+
+
+def main(argv=None):
+    from database import open_database
+
+    parser = argparse.ArgumentParser(description="Yearly leave accrual, carry-over and expiry.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in (("accrue", "grant the year's leave and apply carry-over caps"),
+                               ("expire", "remove carried-over days not used by the expiry date")):
+        cmd = sub.add_parser(command, help=help_text)
+        cmd.add_argument("year", type=int)
+        cmd.add_argument("--dry-run", action="store_true", help="show the changes without saving them")
+        cmd.add_argument("--run-id", help="ID recorded for the run (default: accrual-YEAR / expire-YEAR)")
+        cmd.add_argument("--csv", metavar="FILE", help="write every balance change as CSV ('-' for stdout)")
+        cmd.add_argument("--actor", default="Admin", help="name recorded in the audit log")
+    sub.add_parser("runs", help="list the runs applied so far")
+    args = parser.parse_args(argv)
+
+    db = open_database()
+    try:
+        if args.command == "runs":
+            runs = db.get_meta(RUNS_KEY, {})
+            print(format_table([{"run_id": run_id, **r} for run_id, r in runs.items()]))
+            return
+        kind = "accrual" if args.command == "accrue" else "expire"
+        try:
+            result = run(db, kind, args.year, run_id=args.run_id, dry_run=args.dry_run, actor=args.actor)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        if args.csv == "-":
+            write_csv(result.diffs, sys.stdout)
+            return
+        if args.csv:
+            write_csv(result.diffs, args.csv)
+        elif result.diffs:
+            print(format_table(result.diffs[:20]))
+            if len(result.diffs) > 20:
+                print(f"... and {len(result.diffs) - 20} more (use --csv for all)")
+        print(result.summary())
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
+import os
+import subprocess
+import sys
+from database import ConflictError
+from records import LEAVE_TYPES
+from reporting import format_table, run_report, write_csv
 from utils import validate_date
 
-def admin_mode(emp_manager, db):
+def admin_mode(emp_manager, db, actor="Admin"):
+    # actor is the logged-in admin's name, recorded in the audit log for every action
     # Function to display all admin commands available
     def show_commands():
         print("\nAdmin Commands:")
@@ -9,12 +16,14 @@ def admin_mode(emp_manager, db):
         print("3. Delete Employee")
         print("4. Add Holiday")
         print("5. Approve Leave Requests")
-        print("6. Quit Admin Mode\n")
+        print("6. Leave Reports")
+        print("7. Archive Old Leave History")
+        print("8. Quit Admin Mode\n")
 
     # Function to ask admin to input leave balances for different leave types
     # Accepts optional existing_balances to allow editing without losing old data
     def ask_leave_balances(existing_balances=None):
-        leave_types = ["Sick Leave", "Annual Leave", "Maternity Leave"]
+        leave_types = LEAVE_TYPES
         balances = {}
         print("Enter leave balances for each leave type (leave empty to keep current balance):")
         for lt in leave_types:
@@ -46,6 +55,9 @@ def admin_mode(emp_manager, db):
                     print("Invalid number. Please enter a valid integer.")
         return balances
 
+    # Background archive process started from this menu, if any
+    archiver = None
+
     # Initially show the list of commands to admin
     show_commands()
 
@@ -58,13 +70,12 @@ def admin_mode(emp_manager, db):
             leave_balances = ask_leave_balances()  # Get initial leave balances
             is_manager_input = input("Is this employee a manager? (yes/no): ").strip().lower()
             is_manager = is_manager_input == "yes"
-            result = emp_manager.add_employee(name, leave_balances, is_manager)
+            result = emp_manager.add_employee(name, leave_balances, is_manager, actor=actor)
             print(result)
-            db.log_action(f"Admin added employee {name} (Manager: {is_manager}) with leave balances {leave_balances}.")
 
         # Edit Employee workflow
         elif choice == "2":
-            employee_names = list(db.data.get("employees", {}).keys())
+            employee_names = db.employee_names()
             if not employee_names:
                 print("No employees found.")
                 show_commands()
@@ -90,7 +101,7 @@ def admin_mode(emp_manager, db):
                 show_commands()
                 continue
 
-            current_balances = db.data["employees"][selected_name].get("leave_balance", {})
+            current_balances = db.get_employee(selected_name).get("leave_balance", {})
             print("Leave balances edit:")
             leave_balances = ask_leave_balances(current_balances)  # Get updated balances
 
@@ -102,13 +113,15 @@ def admin_mode(emp_manager, db):
             elif is_manager_input == "no":
                 is_manager = False
 
-            result = emp_manager.edit_employee(selected_name, leave_balances, is_manager)
+            try:
+                result = emp_manager.edit_employee(selected_name, leave_balances, is_manager, actor=actor)
+            except ConflictError as e:
+                result = str(e)
             print(result)
-            db.log_action(f"Admin edited employee {selected_name} with leave balances {leave_balances}. Manager status: {is_manager}.")
 
         # Delete Employee workflow
         elif choice == "3":
-            employee_names = list(db.data.get("employees", {}).keys())
+            employee_names = db.employee_names()
             if not employee_names:
                 print("No employees found to delete.")
                 show_commands()
@@ -141,10 +154,10 @@ def admin_mode(emp_manager, db):
                 # Confirm deletion before removing
                 confirm = input(f"Are you sure you want to DELETE employee '{selected_name}' and all their records? (yes/no): ").strip().lower()
                 if confirm == "yes":
-                    db.data["employees"].pop(selected_name, None)
-                    db.save()
+                    db.delete_employee(selected_name)
                     print(f"Employee '{selected_name}' has been deleted from the system.")
-                    db.log_action(f"Admin deleted employee {selected_name} and all their records.")
+                    db.log_action(f"Admin deleted employee {selected_name} and all their records.",
+                                  actor=actor, action="delete_employee", employee=selected_name)
                 else:
                     print("Deletion cancelled.")
                 break
@@ -166,72 +179,117 @@ def admin_mode(emp_manager, db):
                 show_commands()
                 continue
 
-            result = emp_manager.add_holiday(date)
+            result = emp_manager.add_holiday(date, actor=actor)
             print(result)
-            db.log_action(f"Admin added holiday on {date}.")
 
         # Approve Leave Requests workflow
         elif choice == "5":
-            users_with_pending = []
-            # Find employees who have pending leave requests
-            for user, data in db.data.get("employees", {}).items():
-                pending = [l for l in data.get("leave_history", []) if l["status"] == "Pending"]
-                if pending:
-                    users_with_pending.append(user)
+            # Find employees who have pending leave requests, one page at a time
+            page_size = 20
+            offset = 0
+            users_with_pending = db.pending_employees(offset, page_size + 1)
 
             if not users_with_pending:
                 print("No pending leave requests from any employee.")
                 show_commands()
                 continue
 
-            print("\nEmployees with pending leave requests:")
-            for i, u in enumerate(users_with_pending, 1):
-                print(f"{i}. {u}")
-            print("Type 'quit' to cancel.")
-
-            # Select employee to review leave requests
             while True:
-                selection = input("Select employee number to review leave requests or 'quit': ").strip().lower()
-                if selection == "quit":
+                has_more = len(users_with_pending) > page_size
+                users_with_pending = users_with_pending[:page_size]
+                print("\nEmployees with pending leave requests:")
+                for i, u in enumerate(users_with_pending, offset + 1):
+                    print(f"{i}. {u}")
+                if has_more:
+                    print("Type 'more' to see the next page.")
+                print("Type 'quit' to cancel.")
+
+                # Select employee to review leave requests
+                while True:
+                    selection = input("Select employee number to review leave requests or 'quit': ").strip().lower()
+                    if selection == "quit" or (selection == "more" and has_more):
+                        break
+                    if not selection.isdigit() or int(selection) <= offset or int(selection) > offset + len(users_with_pending):
+                        print("Invalid input. Please enter a valid number or 'quit'.")
+                        continue
+                    target = users_with_pending[int(selection) - offset - 1]
                     break
-                if not selection.isdigit() or int(selection) < 1 or int(selection) > len(users_with_pending):
-                    print("Invalid input. Please enter a valid number or 'quit'.")
-                    continue
-                target = users_with_pending[int(selection) - 1]
-                break
+
+                if selection != "more":
+                    break
+                offset += page_size
+                users_with_pending = db.pending_employees(offset, page_size + 1)
 
             if selection == "quit":
                 show_commands()
                 continue
 
-            emp_data = db.data["employees"][target]
-            pending = [l for l in emp_data.get("leave_history", []) if l["status"] == "Pending"]
+            emp_data = db.get_employee(target)
+            positions = db.pending_requests(target)
 
-            # For each pending leave request, approve or deny
-            for i, req in enumerate(pending, 1):
+            # For each pending leave request, collect an approve or deny decision
+            decisions = []
+            for i, pos in enumerate(positions, 1):
+                req = emp_data["leave_history"][pos]
                 print(f"\nRequest {i}: {req['days']} days of {req['type']} leave starting {req['start_date']}.")
                 while True:
                     decision = input("Approve or Deny? (a/d): ").strip().lower()
                     if decision == "a":
-                        req["status"] = "Approved"
-                        print("Request approved.")
-                        db.log_action(f"Admin approved {req['days']} {req['type']} leave(s) for {target} starting {req['start_date']}.")
+                        decisions.append({"employee": target, "position": pos, "start_date": req["start_date"],
+                                          "decision": "approve"})
                         break
                     elif decision == "d":
-                        req["status"] = "Denied"
-                        # Refund leave balance on denial
-                        emp_data["leave_balance"][req["type"]] = emp_data["leave_balance"].get(req["type"], 0) + req["days"]
-                        print("Request denied and leave balance refunded.")
-                        db.log_action(f"Admin denied {req['days']} {req['type']} leave(s) for {target} starting {req['start_date']}.")
+                        # Leave balance is refunded on denial
+                        decisions.append({"employee": target, "position": pos, "start_date": req["start_date"],
+                                          "decision": "deny"})
                         break
                     else:
                         print("Invalid input. Please enter 'a' to approve or 'd' to deny.")
 
-            db.data["employees"][target] = emp_data
-            db.save()
+            # Apply all decisions with a single save and report them only once it succeeded
+            try:
+                print(emp_manager.decide_leaves(decisions, actor=actor))
+            except ConflictError as e:
+                print(e)
 
-        # Quit admin mode and exit the loop
+        # Leave analytics reports, optionally saved as CSV
         elif choice == "6":
+            reports = [("utilization", "Utilization per leave type"),
+                       ("latency", "Approval latency"),
+                       ("denials", "Denial rate per month")]
+            for i, (_, title) in enumerate(reports, 1):
+                print(f"{i}. {title}")
+            selection = input("Select report number or 'quit': ").strip().lower()
+            if not selection.isdigit() or not 1 <= int(selection) <= len(reports):
+                if selection != "quit":
+                    print("Invalid selection.")
+                show_commands()
+                continue
+
+            rows = run_report(db, reports[int(selection) - 1][0])
+            print(format_table(rows))
+            filename = input("Enter a CSV file name to export, or press Enter to skip: ").strip()
+            if filename:
+                try:
+                    write_csv(rows, filename)
+                    print(f"Report saved to {filename}.")
+                except OSError as e:
+                    print(f"Could not write {filename}: {e}")
+
+        # Move old closed leave history to the archive in a separate process, so the
+        # admin can carry on; the process takes the store's lock one batch at a time
+        elif choice == "7":
+            if archiver is not None and archiver.poll() is None:
+                print("The archive is still running in the background.")
+            else:
+                script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive.py")
+                archiver = subprocess.Popen([sys.executable, script, "run", "--actor", actor],
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                print(f"Archiving started in the background (process {archiver.pid}). "
+                      "The result is written to the audit log.")
+
+        # Quit admin mode and exit the loop
+        elif choice == "8":
             print("Exiting admin mode...")
             break
 
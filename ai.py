@@ -1,11 +1,57 @@
-from openai import OpenAI
-from config import OPENAI_API_KEY
+from config import (OPENAI_API_KEY, OPENAI_BASE_URL, LLM_LATENCY_BUDGET, OFFLINE_MODE,
+                    LLM_CACHE_FILE, LLM_CACHE_TTL, LLM_CACHE_MAX_BYTES)
+import os
 import re
-import dateparser
+import copy
+import json
+import time
+import calendar
+from bisect import bisect_left
 from datetime import datetime, timedelta
+from functools import lru_cache
 
-# Initialize the OpenAI client using the API key from config
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Async OpenAI client, created on first use by get_async_client (False once creation failed)
+async_client = None
+
+def is_offline():
+    """
+    True when the system should only use the rule-based extractor, either
+    from OFFLINE_MODE in config or the LMS_OFFLINE environment variable.
+    """
+    return OFFLINE_MODE or os.environ.get("LMS_OFFLINE", "").lower() in ("1", "true", "yes")
+
+def get_async_client():
+    """
+    Import openai and build the async client on first use, so sessions that
+    never reach the AI path do not pay for it. Returns None if the openai
+    package is not installed or no API key is configured.
+    """
+    global async_client
+    if async_client is None:
+        try:
+            from openai import AsyncOpenAI
+            if not OPENAI_API_KEY:
+                raise ValueError("OPENAI_API_KEY is not set")
+            async_client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        except Exception as e:
+            print(f"[WARNING] AI client unavailable, using rule-based extraction only: {e}")
+            async_client = False
+    return async_client or None
+
+# Persistent cache of AI extraction results, opened on first use by get_response_cache
+response_cache = None
+
+def get_response_cache():
+    """
+    Open the disk-backed AI response cache. Cached dates are re-resolved with
+    resolve_date_local on every hit, so relative phrases stay correct.
+    """
+    global response_cache
+    if response_cache is None:
+        from llm_cache import LLMResponseCache
+        response_cache = LLMResponseCache(LLM_CACHE_FILE, resolve_date_local,
+                                          ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES)
+    return response_cache
 
 def is_valid_date(date_obj):
     """
@@ -35,78 +81,304 @@ def get_next_weekday(target_day_name):
         return today + timedelta(days=days_ahead)
     return None
 
+# Intent keywords in precedence order: if keywords of several groups appear,
+# the earliest group in this list decides the intent
+INTENT_KEYWORDS = [
+    ("team_availability", ["availability", "who is off", "who's off", "coverage"]),
+    ("view_history", [
+        "history", "show all my previous", "what leaves have i taken",
+        "leave record", "display my leave", "past leave", "previous leave request",
+        "what is my past leave", "all my previous leave"
+    ]),
+    ("cancel_leave", ["cancel"]),
+    ("check_balance", ["balance", "how many", "do i have", "remaining", "left"]),
+    ("request_leave", ["take", "request", "need", "off", "leave", "days", "day"]),
+]
+
+# Mapping of keywords to standardized leave types, in precedence order
+LEAVE_TYPES = {
+    "sick": "Sick Leave",
+    "annual": "Annual Leave",
+    "maternity": "Maternity Leave"
+}
+
+WEEKDAY_NAMES = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Matchers built once at import time. Intent keywords are flattened in
+# precedence order, so the first keyword found decides the intent. Each leave
+# type keyword gets its own whole-word pattern so the precedence of LEAVE_TYPES
+# is kept, and a cheap substring test guards every regex so it only runs when
+# it can match.
+_INTENT_KEYWORD_ORDER = tuple(
+    (kw, intent) for intent, keywords in INTENT_KEYWORDS for kw in keywords
+)
+# The same without the manager-only team_availability keywords
+_FALLBACK_KEYWORD_ORDER = tuple(
+    (kw, intent) for kw, intent in _INTENT_KEYWORD_ORDER if intent != "team_availability"
+)
+_LEAVE_TYPE_RES = tuple(
+    (key, value, re.compile(r'\b' + re.escape(key) + r'\b'))
+    for key, value in LEAVE_TYPES.items()
+)
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_PAGE_RE = re.compile(r'\bpage\s+(\d+)\b')
+_NEXT_WEEKDAY_RE = re.compile(r'next\s+(' + "|".join(WEEKDAY_NAMES) + r')')
+
+# Month names and abbreviations accepted by the fast date resolver
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sept": 9, "sep": 9,
+    "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12
+}
+_MONTH_PATTERN = "|".join(sorted(MONTHS, key=len, reverse=True))
+_WEEKDAY_PATTERN = "|".join(WEEKDAY_NAMES)
+
+# Date formats users actually type, resolved without dateparser:
+# ISO dates, "june 10", "10 june", "10/06" (day/month), "this friday",
+# "in 3 days", "next week" and "end of month"
+_FAST_DATE_RE = re.compile(
+    r'\b(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2})\b'
+    r'|\b(?P<md_m>' + _MONTH_PATTERN + r')\.?\s+(?P<md_d>\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(?P<md_y>\d{4})\b)?'
+    r'|\b(?P<dm_d>\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<dm_m>' + _MONTH_PATTERN + r')\b(?:,?\s+(?P<dm_y>\d{4})\b)?'
+    r'|\b(?P<sl_d>\d{1,2})/(?P<sl_m>\d{1,2})(?:/(?P<sl_y>\d{4}))?\b'
+    r'|\bthis\s+(?P<this_wd>' + _WEEKDAY_PATTERN + r')\b'
+    r'|\bin\s+(?P<in_n>\d+)\s+(?P<in_unit>days?|weeks?)\b'
+    r'|\b(?P<next_week>next\s+week)\b'
+    r'|\b(?P<end_of_month>end\s+of\s+(?:the\s+|this\s+)?month)\b'
+)
+
+# How each extraction resolved its start date: "fast" without dateparser,
+# "slow" through dateparser, "skipped" when the intent does not use a date
+_date_paths = {"fast": 0, "slow": 0, "skipped": 0}
+
+# dateparser.search, imported on first use because the import is slow
+_dateparser_search = None
+
+def _future_date(year, month, day, today):
+    """
+    Build a datetime for the given day; when no year was typed and the date
+    has already passed this year, roll over to next year (future preference).
+    """
+    explicit_year = year is not None
+    year = int(year) if explicit_year else today.year
+    try:
+        date = datetime(year, int(month), int(day))
+    except ValueError:
+        return None
+    if not explicit_year and date.date() < today.date():
+        try:
+            date = date.replace(year=year + 1)
+        except ValueError:
+            return None
+    return date
+
+def _resolve_fast_match(match, today):
+    """
+    Turn one match of _FAST_DATE_RE into a datetime (or None if invalid).
+    """
+    groups = match.groupdict()
+    if groups["iso_y"]:
+        return _future_date(groups["iso_y"], groups["iso_m"], groups["iso_d"], today)
+    if groups["md_m"]:
+        return _future_date(groups["md_y"], MONTHS[groups["md_m"]], groups["md_d"], today)
+    if groups["dm_m"]:
+        return _future_date(groups["dm_y"], MONTHS[groups["dm_m"]], groups["dm_d"], today)
+    if groups["sl_d"]:
+        return _future_date(groups["sl_y"], groups["sl_m"], groups["sl_d"], today)
+    if groups["this_wd"]:
+        days_ahead = (WEEKDAY_NAMES.index(groups["this_wd"]) - today.weekday()) % 7
+        return today + timedelta(days=days_ahead)
+    if groups["in_n"]:
+        days = int(groups["in_n"]) * (7 if groups["in_unit"].startswith("week") else 1)
+        return today + timedelta(days=days)
+    if groups["next_week"]:
+        return today + timedelta(days=7 - today.weekday())
+    if groups["end_of_month"]:
+        last_day = calendar.monthrange(today.year, today.month)[1]
+        return today.replace(day=last_day)
+    return None
+
+def resolve_relative_date(text):
+    """
+    Resolve "day after tomorrow", "tomorrow" and "next <weekday>".
+    Returns (found, date) like resolve_date_fast.
+    """
+    if "tomorrow" in text:
+        if "day after tomorrow" in text:
+            return True, datetime.now() + timedelta(days=2)
+        return True, datetime.now() + timedelta(days=1)
+    if "next" in text:
+        match = _NEXT_WEEKDAY_RE.search(text)
+        if match:
+            return True, get_next_weekday(match.group(1))
+    return False, None
+
+def resolve_date_local(text):
+    """
+    Resolve every date phrasing known without dateparser: the relative
+    phrases first, then the fast-path formats. Returns (found, date).
+    """
+    found, date = resolve_relative_date(text)
+    if found:
+        return found, date
+    return resolve_date_fast(text)
+
+def resolve_date_fast(text):
+    """
+    Resolve the common date formats without dateparser.
+    Returns (found, date): found is True when any supported format appears in
+    the text, and date is the first one that is today or in the future.
+    """
+    today = datetime.now()
+    found = False
+    for match in _FAST_DATE_RE.finditer(text):
+        found = True
+        date = _resolve_fast_match(match, today)
+        if is_valid_date(date):
+            return True, date
+    return found, None
+
+def search_dates_slow(text):
+    """
+    Last-resort date search through dateparser, loaded lazily on first use.
+    Returns the first date found that is today or in the future.
+    """
+    global _dateparser_search
+    if _dateparser_search is None:
+        import dateparser.search
+        _dateparser_search = dateparser.search
+    results = _dateparser_search.search_dates(
+        text,
+        settings={'PREFER_DATES_FROM': 'future'}
+    )
+    if results:
+        # Pick the first valid future date found
+        for _, dt in results:
+            if is_valid_date(dt):
+                return dt
+    return None
+
+def date_path_stats():
+    """
+    Return how many extractions resolved their date on the fast path, through
+    dateparser, or skipped it, plus the fraction that took the slow path.
+    """
+    stats = dict(_date_paths)
+    total = sum(stats.values())
+    stats["slow_fraction"] = stats["slow"] / total if total else 0.0
+    return stats
+
+# Day the extraction cache was last used on; the cache is cleared when it changes
+_cache_day = None
+
 def extract_intent_entities(user_input: str):
     """
     A rule-based function to extract the user's intent and entities
     from the input text for leave management.
-    It identifies intent such as 'request_leave', 'cancel_leave', 'check_balance', 'view_history', or 'unknown'.
-    It also extracts entities like leave_type, num_days, and start_date.
+    It identifies intent such as 'request_leave', 'cancel_leave', 'check_balance', 'view_history',
+    'team_availability', or 'unknown'.
+    It also extracts entities like leave_type, num_days, and start_date. A
+    'team_availability' result also carries fallback_intent, the intent used
+    for employees who are not managers.
+    Results are cached per normalized input and day, so repeated phrasings skip
+    the regexes and date resolution entirely.
+    """
+    global _cache_day
+    today = datetime.now().date()
+    if today != _cache_day:
+        # Relative dates like "tomorrow" resolve differently after midnight
+        invalidate_extraction_cache()
+        _cache_day = today
+    normalized = " ".join(user_input.lower().split())
+    intent, entities = _cached_extract(normalized, today.isoformat())
+    # Callers may change the entities, nested values included, so never hand out the cached ones
+    return intent, copy.deepcopy(entities)
+
+
+def extraction_cache_info():
+    """
+    Return the hit/miss counters and size of the extraction cache.
+    """
+    return _cached_extract.cache_info()
+
+
+def invalidate_extraction_cache():
+    """
+    Drop every cached extraction result and reset the counters.
+    """
+    _cached_extract.cache_clear()
+
+
+@lru_cache(maxsize=1024)
+def _cached_extract(normalized_input, day):
+    """
+    Cached wrapper around the rule-based extractor. day is only part of the
+    cache key, so results resolved against one date are never reused on another.
+    """
+    return _extract_intent_entities(normalized_input)
+
+
+def _extract_intent_entities(user_input: str):
+    """
+    Uncached rule-based extraction used by extract_intent_entities.
+    Uses the matchers compiled at import time and stops each check at its
+    first hit.
     """
-    intent = None
     text = user_input.lower()
 
-    # Check for history-related keywords first (more specific)
-    if any(kw in text for kw in [
-        "history", "show all my previous", "what leaves have i taken",
-        "leave record", "display my leave", "past leave", "previous leave request",
-        "what is my past leave", "all my previous leave"
-    ]):
-        intent = "view_history"
-    elif "cancel" in text:
-        intent = "cancel_leave"
-    elif any(kw in text for kw in ["balance", "how many", "do i have", "remaining", "left"]):
-        intent = "check_balance"
-    elif any(kw in text for kw in ["take", "request", "need", "off", "leave", "days", "day"]):
-        intent = "request_leave"
-    else:
-        intent = "unknown"
+    # Check keywords in precedence order (availability and history are the most specific)
+    intent = "unknown"
+    for kw, kw_intent in _INTENT_KEYWORD_ORDER:
+        if kw in text:
+            intent = kw_intent
+            break
 
-    # Mapping of keywords to standardized leave types
-    leave_types = {
-        "sick": "Sick Leave",
-        "annual": "Annual Leave",
-        "maternity": "Maternity Leave"
-    }
     entities = {}
 
+    # team_availability is only answered for managers. Everyone else gets the intent
+    # the other keywords give, which also decides the entities extracted below.
+    base_intent = intent
+    if intent == "team_availability":
+        base_intent = "unknown"
+        for kw, kw_intent in _FALLBACK_KEYWORD_ORDER:
+            if kw in text:
+                base_intent = kw_intent
+                break
+        entities["fallback_intent"] = base_intent
+
     # Identify leave type mentioned in the input
-    for key, value in leave_types.items():
-        if re.search(r'\b' + re.escape(key) + r'\b', text):
+    for key, value, pattern in _LEAVE_TYPE_RES:
+        if key in text and pattern.search(text):
             entities["leave_type"] = value
             break
 
     # Extract number of days requested (first numeric value found)
-    days = re.findall(r'\b\d+\b', user_input)
-    if days:
-        entities["num_days"] = int(days[0])
+    match = _NUMBER_RE.search(text)
+    if match:
+        entities["num_days"] = int(match.group())
 
-    date = None
-    import dateparser.search
+    # History is paged only when a page is asked for explicitly ("history page 2")
+    if base_intent == "view_history":
+        match = _PAGE_RE.search(text)
+        if match:
+            entities["page"] = int(match.group(1))
 
     # Handle relative date phrases explicitly first
-    if "day after tomorrow" in text:
-        date = datetime.now() + timedelta(days=2)
-    elif "tomorrow" in text:
-        date = datetime.now() + timedelta(days=1)
-
-    # Check for 'next <weekday>' pattern
-    if not date:
-        match = re.search(r'next\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)', text)
-        if match:
-            date = get_next_weekday(match.group(1))
-
-    # Fallback to dateparser library to find date mentions
-    if not date:
-        results = dateparser.search.search_dates(
-            user_input,
-            settings={'PREFER_DATES_FROM': 'future'}
-        )
-        if results:
-            # Pick the first valid future date found
-            for _, dt in results:
-                if is_valid_date(dt):
-                    date = dt
-                    break
+    found, date = resolve_relative_date(text)
+    if found:
+        _date_paths["fast"] += 1
+    elif base_intent not in ("request_leave", "cancel_leave"):
+        # Only requests and cancellations use a start date
+        _date_paths["skipped"] += 1
+    else:
+        # Try the common formats, and only fall back to dateparser if none appear
+        found, date = resolve_date_fast(text)
+        if found:
+            _date_paths["fast"] += 1
+        else:
+            _date_paths["slow"] += 1
+            date = search_dates_slow(user_input)
 
     # Format the date as YYYY-MM-DD or set None if no date found
     if date:
@@ -120,39 +392,141 @@ def extract_intent_entities(user_input: str):
 def process_input(user_input: str, use_openai=True):
     """
     Processes the user input to extract intent and entities.
-    If use_openai is True, it sends the input to OpenAI GPT-3.5-turbo model for extraction,
-    expecting a JSON response. If AI fails or parsing fails, falls back to rule-based extraction.
+    If use_openai is True, the OpenAI GPT-3.5-turbo model and the rule-based
+    extractor run concurrently (see process_input_async) and the AI answer is
+    used only if it arrives within LLM_LATENCY_BUDGET seconds and is valid JSON.
+    In offline mode, or when the AI client cannot be created, only the
+    rule-based extractor is used.
     """
-    if not use_openai:
+    if not use_openai or is_offline() or get_async_client() is None:
         return extract_intent_entities(user_input)
+    return _get_event_loop().run_until_complete(process_input_async(user_input))
 
-    messages = [
-        {"role": "system", "content": "You are an HR assistant helping employees with leave management. Extract the intent and entities (leave_type, num_days, start_date) from the user input. Return them in JSON format with keys 'intent' and 'entities'."},
-        {"role": "user", "content": user_input}
-    ]
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages
-        )
-        # Get the assistant's reply text
-        reply = response.choices[0].message.content
-
-        # Attempt to parse the JSON formatted response from the AI
-        import json
-        try:
-            data = json.loads(reply)
-            intent = data.get("intent", "unknown")
-            entities = data.get("entities", {})
-            return intent, entities
-        except json.JSONDecodeError:
-            # If JSON parsing fails, warn and fallback to rule-based extraction
-            print("[WARNING] Failed to parse JSON from AI response, falling back to rule-based extraction.")
-            return extract_intent_entities(user_input)
+async def process_input_async(user_input: str, budget=None):
+    """
+    Start the OpenAI call and the rule-based extractor at the same time.
+    The AI result wins if it arrives within the latency budget and validates;
+    otherwise the rule-based result is returned. Utterances already answered
+    by the AI are served from the persistent response cache.
+    """
+    import asyncio
+    if budget is None:
+        budget = LLM_LATENCY_BUDGET
+
+    # Text classified before is answered from the response cache without an AI call;
+    # the SQLite lookup runs in a worker thread so it does not block the event loop
+    cached = await asyncio.to_thread(get_response_cache().get, user_input)
+    if cached is not None:
+        return cached
 
+    local_task = asyncio.ensure_future(asyncio.to_thread(_timed_local_extract, user_input))
+    llm_task = asyncio.ensure_future(_llm_extract(user_input, budget))
+
+    try:
+        result = await asyncio.wait_for(llm_task, timeout=budget)
+    except asyncio.TimeoutError:
+        _record_latency("llm_timeout", budget)
+        result = None
     except Exception as e:
         # Handle exceptions during AI call, fallback to rule-based
         if "insufficient_quota" not in str(e):
             print(f"[ERROR] AI processing failed: {e}")
-        return extract_intent_entities(user_input)
+        result = None
+
+    if result is not None:
+        # The rule-based answer is not needed; stop waiting for it so no task is left pending
+        local_task.cancel()
+        try:
+            await local_task
+        except asyncio.CancelledError:
+            pass
+        return result
+    return await local_task
+
+
+async def _llm_extract(user_input, budget):
+    """
+    Ask the model for intent and entities. Returns None when the reply is not
+    a JSON object with a string 'intent' and a dict 'entities'.
+    """
+    messages = [
+        {"role": "system", "content": (
+            "You are an HR assistant helping employees with leave management. "
+            "Extract the intent and entities (leave_type, num_days, start_date, and page when a "
+            "history page is asked for) from the user input. "
+            "Return them in JSON format with keys 'intent' and 'entities'.")},
+        {"role": "user", "content": user_input}
+    ]
+    start = time.perf_counter()
+    response = await get_async_client().chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=messages,
+        timeout=budget
+    )
+    _record_latency("llm", time.perf_counter() - start)
+    # Get the assistant's reply text
+    reply = response.choices[0].message.content
+
+    # Attempt to parse the JSON formatted response from the AI
+    try:
+        data = json.loads(reply)
+    except (json.JSONDecodeError, TypeError):
+        # If JSON parsing fails, warn and fallback to rule-based extraction
+        print("[WARNING] Failed to parse JSON from AI response, falling back to rule-based extraction.")
+        return None
+    if not isinstance(data, dict):
+        return None
+    intent = data.get("intent", "unknown")
+    entities = data.get("entities", {})
+    if not isinstance(intent, str) or not isinstance(entities, dict):
+        return None
+    usage = getattr(response, "usage", None)
+    get_response_cache().put(user_input, intent, entities, getattr(usage, "total_tokens", 0) or 0)
+    return intent, entities
+
+
+def _timed_local_extract(user_input):
+    """
+    Rule-based extraction with its latency recorded.
+    """
+    start = time.perf_counter()
+    result = extract_intent_entities(user_input)
+    _record_latency("local", time.perf_counter() - start)
+    return result
+
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Per-path latency histograms: path -> list of bucket counts
+_latency_histograms = {}
+
+def _record_latency(path, seconds):
+    """
+    Add one observation to the histogram of the given path.
+    """
+    counts = _latency_histograms.setdefault(path, [0] * (len(LATENCY_BUCKETS) + 1))
+    counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+
+def latency_histograms():
+    """
+    Return {path: {bucket label: count}} for the 'llm', 'llm_timeout' and
+    'local' paths observed so far.
+    """
+    labels = [f"<={bound}s" for bound in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+    return {path: dict(zip(labels, counts)) for path, counts in _latency_histograms.items()}
+
+
+# Event loop reused by process_input so the async client keeps its connections
+_event_loop = None
+
+def _get_event_loop():
+    # asyncio is imported here rather than at module level because it roughly
+    # doubles the import time of this module on the offline path
+    import asyncio
+    global _event_loop
+    if _event_loop is None:
+        _event_loop = asyncio.new_event_loop()
+    return _event_loop
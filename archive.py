@@ -0,0 +1,234 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import date
+from itertools import islice
+from records import CANCELLED, DENIED
+from utils import leave_span, to_ordinal
+
+# Archive tier for old leave history. Cancelled and Denied entries whose leave ended
+# before a cutoff are moved out of the employee records into compressed per-year
+# segments, so the main store stops loading and rewriting them:
+#
+#   <ARCHIVE_DIR>/leave-<year>.jsonl.gz    one {"employee", ...entry} line per entry,
+#                                          the year being the leave's start year
+#
+# Employees are archived in chunks. Each chunk is a batch: its lines are appended to
+# the segments (one gzip member per segment) and synced first, then the employees are
+# saved without the entries in one commit, each recording under "archived_history"
+# where the batch's gzip member starts in each year's segment and how many of the
+# employee's entries it holds ({year: {offset: count}}). Readers only read members
+# the record lists, so the lines of a batch whose commit never happened are ignored,
+# and a page of history decompresses just the members it needs, not whole segments.
+# Closed entries do not count against balances, so the balance ledger is unaffected.
+
+HISTORY_KEY = "archived_history"
+CLOSED = (CANCELLED, DENIED)
+
+
+class ArchiveResult:
+    def __init__(self, cutoff, dry_run):
+        self.cutoff = cutoff
+        self.dry_run = dry_run
+        self.entries = 0
+        self.employees = 0
+        self.years = {}
+
+    def summary(self):
+        verb = "would move" if self.dry_run else "moved"
+        years = ", ".join(f"{year}: {count}" for year, count in sorted(self.years.items()))
+        return (f"Archive {verb} {self.entries} closed entr{'y' if self.entries == 1 else 'ies'} of "
+                f"{self.employees} employee(s) that ended before {self.cutoff}" + (f" ({years})." if years else "."))
+
+
+def _directory(directory):
+    if directory is None:
+        from config import ARCHIVE_DIR
+        directory = ARCHIVE_DIR
+    return directory
+
+def segment_path(directory, year):
+    return os.path.join(directory, f"leave-{year}.jsonl.gz")
+
+# Split a history into the entries kept and {year: [entries]} to archive: Cancelled or
+# Denied entries whose leave ended before the cutoff ordinal
+def split_history(history, cutoff):
+    kept = []
+    archived = {}
+    for entry in history:
+        span = leave_span(entry) if entry.get("status") in CLOSED else None
+        if span is None or span[1] >= cutoff:
+            kept.append(entry)
+        else:
+            archived.setdefault(str(date.fromordinal(span[0]).year), []).append(entry)
+    return kept, archived
+
+# Append lines to a year's segment as a new gzip member, sync it to disk and return
+# the member's offset
+def _append_segment(directory, year, lines):
+    with open(segment_path(directory, year), "ab") as raw:
+        offset = raw.seek(0, os.SEEK_END)
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as f:
+            f.write("".join(lines).encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    return offset
+
+
+# Move closed entries that ended before cutoff (YYYY-MM-DD, default ARCHIVE_AFTER_DAYS
+# ago) out of every employee record, chunk_size employees per batch and commit
+def archive(db, cutoff=None, directory=None, chunk_size=1000, dry_run=False, actor="Admin"):
+    directory = _directory(directory)
+    if cutoff is None:
+        from config import ARCHIVE_AFTER_DAYS
+        cutoff = date.fromordinal(date.today().toordinal() - ARCHIVE_AFTER_DAYS).isoformat()
+    cutoff_day = to_ordinal(cutoff)
+    if cutoff_day is None:
+        raise ValueError(f"cutoff must be YYYY-MM-DD, not {cutoff!r}")
+    result = ArchiveResult(cutoff, dry_run)
+    if not dry_run:
+        os.makedirs(directory, exist_ok=True)
+
+    names = db.employee_names()
+    for first in range(0, len(names), chunk_size):
+        # Each batch holds the write lock from reading the records to saving them
+        with db.locked():
+            db.refresh()
+            changed = {}
+            segments = {}
+            for name, emp in db.iter_employees(names[first:first + chunk_size]):
+                kept, archived = split_history(emp.get("leave_history", []), cutoff_day)
+                if not archived:
+                    continue
+                emp["leave_history"] = kept
+                prefix = _prefix(name)
+                for year, entries in archived.items():
+                    segments.setdefault(year, []).extend(prefix + json.dumps(entry)[1:] + "\n" for entry in entries)
+                    result.years[year] = result.years.get(year, 0) + len(entries)
+                    result.entries += len(entries)
+                changed[name] = (emp, {year: len(entries) for year, entries in archived.items()})
+            result.employees += len(changed)
+            if dry_run or not changed:
+                continue
+            offsets = {year: _append_segment(directory, year, lines) for year, lines in segments.items()}
+            for name, (emp, counts) in changed.items():
+                index = emp.setdefault(HISTORY_KEY, {})
+                for year, count in counts.items():
+                    index.setdefault(year, {})[str(offsets[year])] = count
+                changed[name] = emp
+            db.put_employees(changed)
+    if not dry_run:
+        db.log_action(f"{actor} archived {result.entries} closed leave entries of {result.employees} employee(s) "
+                      f"that ended before {cutoff}.", actor=actor, action="archive_history", cutoff=cutoff,
+                      entries=result.entries)
+    return result
+
+
+# Start of a segment line, up to the entry's own fields
+def _prefix(name):
+    return json.dumps({"employee": name})[:-1] + ", "
+
+def archived_count(emp):
+    return sum(sum(members.values()) for members in emp.get(HISTORY_KEY, {}).values())
+
+# Yield the employee's archived entries, newest year and batch first. Only the gzip
+# members of the employee's batches are read, and those before skip entries are not.
+def iter_archived(name, emp, directory=None, skip=0):
+    directory = _directory(directory)
+    prefix = _prefix(name)
+    for year, members in sorted(emp.get(HISTORY_KEY, {}).items(), reverse=True):
+        for offset, count in sorted(members.items(), key=lambda item: -int(item[0])):
+            if skip >= count:
+                skip -= count
+                continue
+            try:
+                raw = open(segment_path(directory, year), "rb")
+            except FileNotFoundError:
+                continue
+            with raw:
+                raw.seek(int(offset))
+                # A batch's lines for one employee are consecutive
+                found = 0
+                for line in gzip.GzipFile(fileobj=raw, mode="rb"):
+                    line = line.decode("utf-8")
+                    if not line.startswith(prefix):
+                        if found:
+                            break
+                        continue
+                    found += 1
+                    if skip:
+                        skip -= 1
+                    else:
+                        yield json.loads("{" + line[len(prefix):])
+                    if found == count:
+                        break
+
+# Yield (name, entry) for the archived entries of many employees at once. batches
+# maps each gzip member to the employees whose entries it holds, {(year, offset):
+# {name: count}} as collected from their records, and every member is read once.
+def iter_batches(batches, directory=None):
+    directory = _directory(directory)
+    for (year, offset), counts in sorted(batches.items()):
+        try:
+            raw = open(segment_path(directory, year), "rb")
+        except FileNotFoundError:
+            continue
+        remaining = dict(counts)
+        left = sum(counts.values())
+        with raw:
+            raw.seek(offset)
+            for line in gzip.GzipFile(fileobj=raw, mode="rb"):
+                entry = json.loads(line)
+                name = entry.pop("employee", None)
+                if not remaining.get(name):
+                    continue
+                remaining[name] -= 1
+                left -= 1
+                yield name, entry
+                if not left:
+                    break
+
+# One page (1-based) of the employee's archived entries
+def history_page(name, emp, page=1, page_size=20, directory=None):
+    return list(islice(iter_archived(name, emp, directory, skip=(page - 1) * page_size), page_size))
+
+
+def main(argv=None):
+    from config import ARCHIVE_CHUNK_SIZE, ARCHIVE_PAGE_SIZE
+    from database import open_database
+
+    parser = argparse.ArgumentParser(description="Archive old closed leave history into per-year segments.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="move Cancelled/Denied entries that ended before the cutoff")
+    run_cmd.add_argument("--before", metavar="YYYY-MM-DD", help="cutoff date (default: ARCHIVE_AFTER_DAYS ago)")
+    run_cmd.add_argument("--chunk-size", type=int, default=ARCHIVE_CHUNK_SIZE, help="employees archived per commit")
+    run_cmd.add_argument("--dry-run", action="store_true", help="count the entries without moving them")
+    run_cmd.add_argument("--actor", default="Admin", help="name recorded in the audit log")
+    show_cmd = sub.add_parser("show", help="print an employee's archived entries")
+    show_cmd.add_argument("name")
+    show_cmd.add_argument("--page", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    db = open_database()
+    try:
+        if args.command == "run":
+            try:
+                result = archive(db, args.before, chunk_size=args.chunk_size, dry_run=args.dry_run, actor=args.actor)
+            except ValueError as e:
+                sys.exit(f"Error: {e}")
+            print(result.summary())
+            return
+        emp = db.get_employee(args.name)
+        if emp is None:
+            sys.exit(f"Error: employee {args.name} not found")
+        for entry in history_page(args.name, emp, args.page, ARCHIVE_PAGE_SIZE):
+            print(json.dumps(entry))
+        print(f"{archived_count(emp)} archived entr(ies) in total.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import atexit
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+class AuditLogger:
+    # Buffered audit log writing one JSON object per line.
+    # Records are queued in memory and appended by a background thread every
+    # flush_interval seconds (or as soon as max_buffer records are waiting), so an
+    # action costs no file open/close. The file is rotated when it grows past
+    # max_bytes or when the day changes; rotated files are gzip-compressed and all of
+    # them are kept, as the log is the only record of who did what. Pruning is opt-in:
+    # with backup_count set, only the newest backup_count rotated files are kept.
+    # Buffered records are flushed on close() and at interpreter exit.
+    def __init__(self, filename="system.log", max_bytes=5 * 1024 * 1024, flush_interval=1.0,
+                 max_buffer=1000, backup_count=None, rotate_daily=True):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.backup_count = backup_count
+        self.rotate_daily = rotate_daily
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        # Timestamp text of the current second, formatted once per second
+        self._second = None
+        self._timestamp = None
+        self._segment_day = self._current_segment_day()
+        self._thread = threading.Thread(target=self._run, name="audit-log-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # Queue one audit record. message is the human-readable text; the keyword
+    # arguments (actor, action, employee, leave_type, start_date, days, ...) are
+    # stored as separate fields.
+    def log(self, message, **fields):
+        second = int(time.time())
+        if second != self._second:
+            self._timestamp = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+            self._second = second
+        record = {"ts": self._timestamp}
+        record.update((k, v) for k, v in fields.items() if v is not None)
+        record["message"] = message
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            full = len(self._buffer) >= self.max_buffer
+        if full:
+            self._wakeup.set()
+
+    # Write every queued record to disk, rotating first if needed
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            self._maybe_rotate()
+            with open(self.filename, "a") as log_file:
+                log_file.write("".join(lines))
+
+    # Stop the background thread and flush what is left
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    # Day the current log file was started, taken from its modification time
+    def _current_segment_day(self):
+        if os.path.exists(self.filename):
+            return datetime.fromtimestamp(os.path.getmtime(self.filename)).date()
+        return datetime.now().date()
+
+    def _maybe_rotate(self):
+        today = datetime.now().date()
+        if not os.path.exists(self.filename):
+            self._segment_day = today
+            return
+        too_big = os.path.getsize(self.filename) >= self.max_bytes
+        new_day = self.rotate_daily and today != self._segment_day
+        if too_big or new_day:
+            self._rotate()
+            self._segment_day = today
+
+    # Move the current file aside as "<filename>.<timestamp>.gz" and, if pruning is
+    # enabled, drop old backups
+    def _rotate(self):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        rotated = f"{self.filename}.{stamp}"
+        os.replace(self.filename, rotated)
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+        backups = sorted(glob.glob(glob.escape(self.filename) + ".*.gz"))
+        for old in backups[:-self.backup_count] if self.backup_count else []:
+            os.remove(old)
@@ -0,0 +1,252 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+
+# Free-text lines written before the structured audit log: "[YYYY-MM-DD HH:MM:SS] message"
+LEGACY_LINE_RE = re.compile(r'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (.*)$')
+
+# Known legacy messages, tried in order: (action, pattern with actor/employee groups)
+LEGACY_PATTERNS = [
+    ("request_leave", re.compile(r'^(?P<actor>\S+) requested (?P<days>\d+) (?P<leave_type>.+?) leave\(s\) '
+                                 r'from (?P<start_date>\S+?)\.')),
+    ("cancel_leave", re.compile(r'^(?P<actor>\S+) cancelled a leave request'
+                                r'(?: for (?P<leave_type>.+?) starting on (?P<start_date>\S+?))?\.')),
+    ("approve_all", re.compile(r'^(?P<actor>\S+) approved all pending leaves for (?P<employee>\S+?)\.')),
+    ("approve", re.compile(r'^(?P<actor>\S+) approved (?P<days>\d+) (?P<leave_type>.+?) leave\(s\) '
+                           r'for (?P<employee>\S+) starting (?P<start_date>\S+?)\.')),
+    ("deny", re.compile(r'^(?P<actor>\S+) denied (?P<days>\d+) (?P<leave_type>.+?) leave\(s\) '
+                        r'for (?P<employee>\S+) starting (?P<start_date>\S+?)\.')),
+    ("add_employee", re.compile(r'^(?P<actor>\S+) added (?:new )?employee (?P<employee>[^\s.]+)')),
+    ("edit_employee", re.compile(r'^(?P<actor>\S+) edited employee (?P<employee>[^\s.]+)')),
+    ("delete_employee", re.compile(r'^(?P<actor>\S+) deleted employee (?P<employee>\S+)')),
+    ("add_holiday", re.compile(r'^(?P<actor>\S+) added holiday (?:on )?(?P<date>[^\s.]+)')),
+]
+
+def parse_line(line):
+    # Turn one log line (structured JSON or legacy free text) into a record dict, or None
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+    match = LEGACY_LINE_RE.match(line)
+    if not match:
+        return None
+    ts, message = match.groups()
+    record = {"ts": ts, "message": message}
+    for action, pattern in LEGACY_PATTERNS:
+        found = pattern.match(message)
+        if found:
+            record["action"] = action
+            record.update((k, v) for k, v in found.groupdict().items() if v is not None)
+            break
+    else:
+        record["actor"] = message.split(" ", 1)[0]
+    # Employees acting on their own records are both actor and employee
+    if record.get("action") in ("request_leave", "cancel_leave"):
+        record.setdefault("employee", record.get("actor"))
+    if "days" in record:
+        record["days"] = int(record["days"])
+    return record
+
+
+class AuditIndex:
+    # On-disk SQLite index over system.log and its rotated .gz files.
+    # Each log line gets one row holding its timestamp, actor, action and employee plus
+    # the segment (file) and byte offset where the line lives; the text itself is read
+    # back by seeking to that offset. Time-range, per-actor and per-employee queries
+    # are answered from the indexes instead of scanning the log.
+    # update() only reads bytes appended since the last call. When the live log has been
+    # rotated away, its segment is re-pointed at the oldest rotated file not yet indexed,
+    # and rotated files that were pruned (AUDIT_BACKUP_COUNT) are dropped from the index.
+    # Rotation is told apart from appending by the inode, the size and the first bytes of
+    # the live file, as a new log file may reuse the inode of the one rotated away.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS segments (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            inode INTEGER,
+            indexed_bytes INTEGER NOT NULL DEFAULT 0,
+            live INTEGER NOT NULL DEFAULT 0,
+            head BLOB
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            segment INTEGER NOT NULL,
+            offset INTEGER NOT NULL,
+            ts TEXT NOT NULL,
+            actor TEXT,
+            action TEXT,
+            employee TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_entries_ts ON entries (ts);
+        CREATE INDEX IF NOT EXISTS idx_entries_employee ON entries (employee, ts);
+        CREATE INDEX IF NOT EXISTS idx_entries_actor ON entries (actor, ts);
+    """
+    # Leading bytes of the live file remembered to recognize it on the next update()
+    HEAD_BYTES = 256
+
+    def __init__(self, log_filename="system.log", index_filename="audit_index.db"):
+        self.log_filename = log_filename
+        self.conn = sqlite3.connect(index_filename)
+        self.conn.executescript(self.SCHEMA)
+        if "head" not in {row[1] for row in self.conn.execute("PRAGMA table_info(segments)")}:
+            # Index built before the head column existed; it is filled on the next update()
+            self.conn.execute("ALTER TABLE segments ADD COLUMN head BLOB")
+
+    def close(self):
+        self.conn.close()
+
+    # Index everything appended to the log (and any newly rotated files) since the last call
+    def update(self):
+        with self.conn:
+            for seg_id, path in self.conn.execute("SELECT id, path FROM segments WHERE live = 0").fetchall():
+                if not os.path.exists(path):
+                    self.conn.execute("DELETE FROM entries WHERE segment = ?", (seg_id,))
+                    self.conn.execute("DELETE FROM segments WHERE id = ?", (seg_id,))
+            known = {row[0] for row in self.conn.execute("SELECT path FROM segments")}
+            rotated = [p for p in sorted(glob.glob(glob.escape(self.log_filename) + ".*.gz")) if p not in known]
+            live = self.conn.execute("SELECT id, inode, indexed_bytes, head FROM segments WHERE live = 1").fetchone()
+            stat = os.stat(self.log_filename) if os.path.exists(self.log_filename) else None
+
+            if live and (stat is None or stat.st_ino != live[1] or stat.st_size < live[2]
+                         or self._read_head(self.log_filename, len(live[3] or b"")) != (live[3] or b"")):
+                # The live file was rotated: it is now the oldest rotated file we have not seen
+                seg_id, _, indexed, _ = live
+                if rotated:
+                    path = rotated.pop(0)
+                    self.conn.execute("UPDATE segments SET path = ?, inode = NULL, live = 0 WHERE id = ?", (path, seg_id))
+                    self._index_segment(seg_id, path, indexed)
+                else:
+                    self.conn.execute("DELETE FROM entries WHERE segment = ?", (seg_id,))
+                    self.conn.execute("DELETE FROM segments WHERE id = ?", (seg_id,))
+                live = None
+
+            for path in rotated:
+                seg_id = self.conn.execute("INSERT INTO segments (path) VALUES (?)", (path,)).lastrowid
+                self._index_segment(seg_id, path, 0)
+
+            if stat is not None:
+                if live is None:
+                    seg_id = self.conn.execute("INSERT INTO segments (path, inode, live) VALUES (?, ?, 1)",
+                                               (self.log_filename, stat.st_ino)).lastrowid
+                    indexed = 0
+                else:
+                    seg_id, _, indexed, _ = live
+                self._index_segment(seg_id, self.log_filename, indexed)
+                self.conn.execute("UPDATE segments SET head = ? WHERE id = ?",
+                                  (self._read_head(self.log_filename, self.HEAD_BYTES), seg_id))
+
+    # Return matching records in time order. since/until accept "YYYY-MM-DD" (until is
+    # inclusive of that whole day) or "YYYY-MM-DD HH:MM:SS".
+    def query(self, employee=None, actor=None, action=None, since=None, until=None, limit=None):
+        clauses = []
+        params = []
+        if employee is not None:
+            clauses.append("employee = ?")
+            params.append(employee)
+        if actor is not None:
+            clauses.append("actor = ?")
+            params.append(actor)
+        if action is not None:
+            clauses.append("action = ?")
+            params.append(action)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            if len(until) == 10:
+                until = (datetime.strptime(until, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+                clauses.append("ts < ?")
+            else:
+                clauses.append("ts <= ?")
+            params.append(until)
+        sql = "SELECT e.segment, s.path, e.offset FROM entries e JOIN segments s ON s.id = e.segment"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY e.ts, e.segment, e.offset"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        locations = self.conn.execute(sql, params).fetchall()
+        return self._read_records(locations)
+
+    # Read and parse log lines from [offset, end of complete lines) and add them to the index
+    def _index_segment(self, seg_id, path, offset):
+        rows = []
+        with self._open(path) as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                record = parse_line(line.decode("utf-8", errors="replace"))
+                if record and record.get("ts"):
+                    rows.append((seg_id, offset, record["ts"], record.get("actor"),
+                                 record.get("action"), record.get("employee")))
+                offset += len(line)
+        self.conn.executemany(
+            "INSERT INTO entries (segment, offset, ts, actor, action, employee) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.conn.execute("UPDATE segments SET indexed_bytes = ? WHERE id = ?", (offset, seg_id))
+
+    # Seek to each location and parse the line there, opening every file only once.
+    # Files removed since the last update() are skipped.
+    def _read_records(self, locations):
+        by_segment = {}
+        for position, (seg_id, path, offset) in enumerate(locations):
+            by_segment.setdefault((seg_id, path), []).append((offset, position))
+        records = [None] * len(locations)
+        for (_, path), offsets in by_segment.items():
+            try:
+                f = self._open(path)
+            except FileNotFoundError:
+                continue
+            with f:
+                # Increasing offsets keep gzip seeks moving forward
+                for offset, position in sorted(offsets):
+                    f.seek(offset)
+                    records[position] = parse_line(f.readline().decode("utf-8", errors="replace"))
+        return [r for r in records if r is not None]
+
+    @staticmethod
+    def _read_head(path, size):
+        with open(path, "rb") as f:
+            return f.read(size)
+
+    @staticmethod
+    def _open(path):
+        return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the audit log (system.log) through its on-disk index.")
+    parser.add_argument("--employee", help="only actions on this employee")
+    parser.add_argument("--actor", help="only actions performed by this user")
+    parser.add_argument("--action", help="only this action, e.g. approve, deny, delete_employee")
+    parser.add_argument("--since", help="start date/time, YYYY-MM-DD[ HH:MM:SS]")
+    parser.add_argument("--until", help="end date/time (inclusive), YYYY-MM-DD[ HH:MM:SS]")
+    parser.add_argument("--limit", type=int, help="maximum number of records")
+    parser.add_argument("--json", action="store_true", help="print records as JSON lines")
+    parser.add_argument("--log", default="system.log", help="log file (default: system.log)")
+    parser.add_argument("--index", default="audit_index.db", help="index file (default: audit_index.db)")
+    args = parser.parse_args(argv)
+
+    index = AuditIndex(args.log, args.index)
+    index.update()
+    records = index.query(employee=args.employee, actor=args.actor, action=args.action,
+                          since=args.since, until=args.until, limit=args.limit)
+    index.close()
+    for record in records:
+        if args.json:
+            print(json.dumps(record))
+        else:
+            print(f"[{record['ts']}] {record['message']}")
+
+
+if __name__ == "__main__":
+    main()
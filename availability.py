@@ -0,0 +1,107 @@
+from datetime import date
+from records import APPROVED, PENDING
+from utils import leave_span
+
+class AvailabilityIndex:
+    # Per-day occupancy bitmaps for team availability queries.
+    # Every employee gets a bit slot; days maps a date ordinal to a Python int whose set
+    # bits are the employees off that day (Approved or Pending leave), so the headcount
+    # off is one bit_count() per day no matter how many employees there are. Only days
+    # from first_day on are stored (the build date unless an earlier day is asked for),
+    # as the queries look ahead; days before it count nobody off. Each employee's
+    # indexed days are remembered so a changed record only touches its own bits.
+    STATUSES = (PENDING, APPROVED)
+
+    def __init__(self):
+        self.slots = {}
+        self.free_slots = []
+        self.days = {}
+        self.spans = {}
+        self.first_day = date.today().toordinal()
+
+    def __len__(self):
+        return len(self.slots)
+
+    # Rebuild every bitmap from (name, record) pairs, from first_day (an ordinal, at
+    # most today) on
+    def rebuild(self, employees, first_day=None):
+        self.slots = {}
+        self.free_slots = []
+        self.spans = {}
+        self.first_day = date.today().toordinal()
+        if first_day is not None:
+            self.first_day = min(first_day, self.first_day)
+        # Collect slots per day first and build each bitmap once, instead of
+        # re-creating a large int for every bit set
+        members = {}
+        for name, emp in employees:
+            slot = self._slot(name)
+            for day in self._days_off(name, emp):
+                members.setdefault(day, []).append(slot)
+        self.days = {}
+        for day, slots in members.items():
+            bits = bytearray((len(self.slots) + 7) // 8)
+            for slot in slots:
+                bits[slot >> 3] |= 1 << (slot & 7)
+            self.days[day] = int.from_bytes(bits, "little")
+
+    # Re-index one employee after its record changed
+    def update(self, name, emp):
+        slot = self._slot(name)
+        bit = 1 << slot
+        old = self.spans.pop(name, ())
+        new = self._days_off(name, emp)
+        for day in old:
+            if day not in new:
+                remaining = self.days[day] & ~bit
+                if remaining:
+                    self.days[day] = remaining
+                else:
+                    del self.days[day]
+        for day in new:
+            if day not in old:
+                self.days[day] = self.days.get(day, 0) | bit
+
+    # Drop an employee and free its slot
+    def remove(self, name):
+        if name not in self.slots:
+            return
+        self.update(name, {})
+        self.spans.pop(name, None)
+        self.free_slots.append(self.slots.pop(name))
+
+    # Number of employees off on each of the days [first, first + count)
+    def headcount_off(self, first, count):
+        days = self.days
+        return [days[day].bit_count() if day in days else 0 for day in range(first, first + count)]
+
+    # First ordinal at or after first where at least min_available employees are
+    # available on each of length consecutive days, searching up to horizon days ahead.
+    # Returns None when there is no such range.
+    def first_available_range(self, min_available, length, first, horizon=365):
+        total = len(self.slots)
+        run = 0
+        for offset, off in enumerate(self.headcount_off(first, horizon)):
+            run = run + 1 if total - off >= min_available else 0
+            if run >= length:
+                return first + offset - length + 1
+        return None
+
+    def _slot(self, name):
+        if name not in self.slots:
+            self.slots[name] = self.free_slots.pop() if self.free_slots else len(self.slots)
+        return self.slots[name]
+
+    # Days (from first_day on) the employee is off, remembered for later updates
+    def _days_off(self, name, emp):
+        days = set()
+        for entry in emp.get("leave_history", []):
+            if entry.get("status") not in self.STATUSES:
+                continue
+            span = leave_span(entry)
+            if span is None or span[1] < self.first_day:
+                continue
+            days.update(range(max(span[0], self.first_day), span[1] + 1))
+        if days:
+            self.spans[name] = days
+        return days
@@ -0,0 +1,46 @@
+"""
+Time a yearly accrual run and the following expiry run (accrual.py) over 100k
+synthetic employees, dry and applied.
+"""
+import argparse
+import random
+import time
+from datetime import date
+
+import common
+import accrual
+from database import Database
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--employees", type=int, default=100000)
+    parser.add_argument("--entries", type=int, default=5, help="history entries per employee")
+    parser.add_argument("--year", type=int, default=2027)
+    parser.add_argument("--no-journal", dest="journal", action="store_false",
+                        help="rewrite employees.json on every commit")
+    args = parser.parse_args(argv)
+
+    employees = common.synthetic_employees(args.employees, entries=args.entries)
+    # A third of the employees join during the year, so their grants are pro-rated
+    rng = random.Random(22)
+    first = date(args.year, 1, 1).toordinal()
+    for emp in employees.values():
+        if rng.random() < 1 / 3:
+            emp["joined_on"] = date.fromordinal(first + rng.randrange(365)).isoformat()
+    print(f"{args.employees} employees, {'journal' if args.journal else 'full rewrite'}")
+    with common.workdir():
+        common.write_store("employees.json", employees)
+        del employees
+        db = Database("employees.json", journal=args.journal, compact_threshold=10 ** 9)
+        for kind in ("accrual", "expire"):
+            for dry_run in (True, False):
+                start = time.perf_counter()
+                result = accrual.run(db, kind, args.year, dry_run=dry_run)
+                common.report(f"{kind}{' dry run' if dry_run else ''} ({len(result.diffs)} changes)",
+                              time.perf_counter() - start)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Time loading, reading and saving the store before and after archiving its closed
+history (archive.py), and what reading the archive back costs: the reports over
+live plus archived entries and one page of an employee's archived history.
+"""
+import argparse
+import os
+import time
+
+import common
+import archive
+from database import Database
+from reporting import LeaveColumns
+
+
+# Load the store, read every employee and save it (a full rewrite)
+def measure(label):
+    start = time.perf_counter()
+    db = Database("employees.json")
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in db.iter_employees():
+        pass
+    full_pass = time.perf_counter() - start
+    start = time.perf_counter()
+    db.save()
+    saved = time.perf_counter() - start
+    db.close()
+    print(f"{label}: employees.json {common.file_size('employees.json')}")
+    common.report("  load", loaded)
+    common.report("  full pass over the records", full_pass)
+    common.report("  save", saved)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--employees", type=int, default=100000)
+    parser.add_argument("--entries", type=int, default=13, help="history entries per employee")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="employees archived per commit")
+    args = parser.parse_args(argv)
+
+    # Every synthetic history entry ends before the cutoff, so all Denied and
+    # Cancelled entries (about half) are archived
+    cutoff = f"{common.HISTORY_YEARS[1] + 1}-01-01"
+    with common.workdir():
+        common.write_store("employees.json", common.synthetic_employees(args.employees, entries=args.entries))
+        measure("before")
+        db = Database("employees.json")
+        start = time.perf_counter()
+        cols = LeaveColumns.load(db.iter_employees(), "archive")
+        common.report("report columns before", time.perf_counter() - start, len(cols))
+        db.close()
+
+        db = Database("employees.json", journal=True, compact_threshold=10 ** 9)
+        start = time.perf_counter()
+        result = archive.archive(db, cutoff, directory="archive", chunk_size=args.chunk_size)
+        common.report(f"archive run ({result.entries} entries)", time.perf_counter() - start)
+        db.backend.compact()
+        db.close()
+        size = sum(os.path.getsize(os.path.join("archive", name)) for name in os.listdir("archive"))
+        print(f"archive segments {size / 1e6:.1f} MB")
+        measure("after")
+
+        db = Database("employees.json")
+        start = time.perf_counter()
+        cols = LeaveColumns.load(db.iter_employees(), "archive")
+        common.report("report columns after, with the archive", time.perf_counter() - start, len(cols))
+        name = db.employee_names()[-1]
+        emp = db.get_employee(name)
+        common.report("one page of archived history",
+                      common.best_of(lambda: archive.history_page(name, emp, 1, 20, "archive")))
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
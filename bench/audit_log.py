@@ -0,0 +1,60 @@
+"""
+Time logging actions with the buffered audit logger (audit.py) against the
+previous open/append/close of system.log per action, with and without rotation.
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import common
+from audit import AuditLogger
+
+FIELDS = {"actor": "Admin", "action": "approve", "employee": "Employee000042", "leave_type": "Annual Leave",
+          "start_date": "2031-01-06", "days": 3}
+
+
+# The logger this replaced: Database.log_action opened the file for every line
+def log_action(message):
+    with open("system.log", "a") as log_file:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log_file.write(f"[{timestamp}] {message}\n")
+
+def per_call_appends(count):
+    for i in range(count):
+        log_action(f"Admin approved 3 Annual Leave leave(s) for Employee{i:06d} starting 2031-01-06.")
+
+# Every record is queued and written by the flush thread; close() waits for the last
+# one, so the time covers getting everything to the file
+def buffered(count, **kwargs):
+    logger = AuditLogger("audit.log", **kwargs)
+    for i in range(count):
+        logger.log(f"Admin approved 3 Annual Leave leave(s) for Employee{i:06d} starting 2031-01-06.", **FIELDS)
+    logger.close()
+
+def remove_logs():
+    for name in os.listdir("."):
+        if name.startswith(("system.log", "audit.log")):
+            os.remove(name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--actions", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    with common.workdir():
+        common.report(f"open/append/close per action ({args.actions})",
+                      common.best_of(lambda: (remove_logs(), per_call_appends(args.actions)), 3), args.actions)
+        common.report(f"buffered audit logger ({args.actions})",
+                      common.best_of(lambda: (remove_logs(), buffered(args.actions)), 3), args.actions)
+        # 1 MB files: the run rotates and gzips a file every few thousand records
+        common.report("buffered, rotating every 1 MB",
+                      common.best_of(lambda: (remove_logs(), buffered(args.actions, max_bytes=1024 * 1024)), 3),
+                      args.actions)
+        rotated = sum(1 for name in os.listdir(".") if name.endswith(".gz"))
+        print(f"{rotated} rotated file(s), audit.log {common.file_size('audit.log')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Time bulk import and export (bulk.py) of 100k synthetic employees as CSV rows
+and as JSONL records with leave history, into an empty store.
+"""
+import argparse
+import csv
+import json
+import time
+
+import common
+from bulk import EMPLOYEE_FIELDS, export_employees, import_employees
+from config import BULK_CHUNK_SIZE
+from database import Database
+from records import LEAVE_TYPES
+
+
+def write_inputs(employees):
+    with open("employees.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EMPLOYEE_FIELDS)
+        for name, emp in employees.items():
+            writer.writerow([name, "no"] + [emp["leave_balance"][lt] for lt in LEAVE_TYPES])
+    with open("employees.jsonl", "w") as f:
+        for name, emp in employees.items():
+            f.write(json.dumps({"name": name, **emp}) + "\n")
+
+def run_import(args, fmt):
+    common.write_store(f"{fmt}.json", {})
+    db = Database(f"{fmt}.json", journal=args.journal, compact_threshold=10 ** 9)
+    start = time.perf_counter()
+    with open(f"employees.{fmt}", newline="" if fmt == "csv" else None) as f:
+        result = import_employees(db, f, fmt, chunk_size=args.chunk_size)
+    common.report(f"import {fmt} ({result.summary()})", time.perf_counter() - start, args.rows)
+    return db
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--entries", type=int, default=5, help="leave history entries per JSONL record")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="rows saved per commit")
+    parser.add_argument("--no-journal", dest="journal", action="store_false",
+                        help="rewrite employees.json on every commit")
+    args = parser.parse_args(argv)
+
+    print(f"{args.rows} rows, chunks of {args.chunk_size}, {'journal' if args.journal else 'full rewrite'}")
+    with common.workdir():
+        write_inputs(common.synthetic_employees(args.rows, entries=args.entries))
+        run_import(args, "csv").close()
+        db = run_import(args, "jsonl")
+        for fmt in ("csv", "jsonl"):
+            with open(f"export.{fmt}", "w", newline="" if fmt == "csv" else None) as f:
+                start = time.perf_counter()
+                count = export_employees(db, f, fmt)
+            common.report(f"export {fmt} ({count} rows)", time.perf_counter() - start, count)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
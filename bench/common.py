@@ -0,0 +1,90 @@
+# Shared helpers for the benchmark scripts in this directory. Each script is run
+# from the repository root (python bench/<name>.py), builds its own synthetic
+# data in a temporary directory and prints its timings.
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from records import APPROVED, CANCELLED, DENIED, LEAVE_TYPES, PENDING
+
+# Closed history spreads over these years; Pending requests start after them
+HISTORY_YEARS = (2022, 2025)
+PENDING_YEAR = 2031
+
+
+# Best wall time of repeat runs of func(), in seconds
+def best_of(func, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def report(label, seconds, count=None):
+    line = f"{label:<44} {seconds * 1000:10.2f} ms"
+    if count:
+        line += f"  ({seconds / count * 1e6:.2f} us each)"
+    print(line)
+
+
+# Run the block in a fresh temporary directory: Database opens system.log in the
+# working directory, and the benchmark's files are created next to it
+@contextlib.contextmanager
+def workdir():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="lms-bench-") as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(cwd)
+
+def _day(rng, year):
+    return date(year, 1, 1).toordinal() + rng.randrange(365)
+
+def _entry(rng, leave_type, start, status):
+    days = rng.randint(1, 10)
+    entry = {"type": leave_type, "days": days, "start_date": date.fromordinal(start).isoformat(),
+             "end_date": date.fromordinal(start + days + days // 5 * 2).isoformat(), "status": status,
+             "requested_on": date.fromordinal(start - rng.randint(1, 60)).isoformat()}
+    if status != PENDING:
+        entry["decided_on"] = date.fromordinal(start - rng.randint(0, 5)).isoformat()
+    return entry
+
+# {name: record} for count employees, each with entries closed or Approved history
+# entries and pending Pending requests (non-overlapping, in PENDING_YEAR)
+def synthetic_employees(count, entries=0, pending=0, seed=1):
+    return dict(iter_synthetic_employees(count, entries, pending, seed))
+
+# The same employees as (name, record) pairs, generated one at a time
+def iter_synthetic_employees(count, entries=0, pending=0, seed=1):
+    rng = random.Random(seed)
+    for i in range(count):
+        history = [_entry(rng, rng.choice(LEAVE_TYPES), _day(rng, rng.randint(*HISTORY_YEARS)),
+                          rng.choice((APPROVED, APPROVED, DENIED, CANCELLED)))
+                   for _ in range(entries)]
+        start = date(PENDING_YEAR, 1, 6).toordinal()
+        for _ in range(pending):
+            history.append(_entry(rng, rng.choice(LEAVE_TYPES), start, PENDING))
+            start += 14
+        yield f"Employee{i:06d}", {
+            "leave_balance": {leave_type: rng.randint(10, 30) * (pending + 1) for leave_type in LEAVE_TYPES},
+            "leave_history": history}
+
+# Write an employees.json in the layout JSONStorage writes and return its name
+def write_store(filename, employees, holidays=()):
+    with open(filename, "w") as f:
+        json.dump({"admins": ["Admin"], "employees": employees, "holidays": list(holidays)}, f, indent=4)
+    return filename
+
+def file_size(filename):
+    return f"{os.path.getsize(filename) / 1e6:.1f} MB"
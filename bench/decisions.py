@@ -0,0 +1,60 @@
+"""
+Time batch approval and denial of Pending leave requests (decide_leaves, one
+commit per batch) against deciding them one put_employee commit at a time.
+"""
+import argparse
+
+import common
+from database import Database
+from employee import EmployeeManager
+from records import APPROVED, SICK_LEAVE
+
+
+def open_store(args, employees):
+    common.write_store("employees.json", employees)
+    if args.engine == "sqlite":
+        return Database("employees.db", engine="sqlite", seed_filename="employees.json")
+    return Database("employees.json", journal=args.journal, compact_threshold=10 ** 9)
+
+# Decide each request with its own put_employee commit and log line
+def one_by_one(db, decisions):
+    for item in decisions:
+        emp = db.get_employee(item["employee"])
+        emp["leave_history"][item["position"]]["status"] = APPROVED
+        db.put_employee(item["employee"], emp)
+        db.log_action(f"Admin approved a request for {item['employee']}.", actor="Admin", action="approve")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--pending", type=int, default=5, help="Pending requests per employee")
+    parser.add_argument("--engine", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--no-journal", dest="journal", action="store_false",
+                        help="rewrite employees.json on every commit")
+    parser.add_argument("--one-by-one", type=int, default=200, metavar="N",
+                        help="requests approved one commit at a time for comparison (0 to skip)")
+    args = parser.parse_args(argv)
+
+    employees = common.synthetic_employees(args.employees, entries=5, pending=args.pending)
+    total = args.employees * args.pending
+    print(f"{args.employees} employees, {total} Pending requests, engine {args.engine}"
+          f"{', journal' if args.engine == 'json' and args.journal else ''}")
+    with common.workdir():
+        db = open_store(args, employees)
+        manager = EmployeeManager(db)
+        denials = len(manager._matching_pending("deny", leave_type=SICK_LEAVE)[0])
+        common.report(f"deny {denials} by filter (one commit)",
+                      common.best_of(lambda: manager.decide_leaves(decision="deny", leave_type=SICK_LEAVE), 1), denials)
+        decisions, _ = manager._matching_pending("approve")
+        rest, decisions = decisions[:args.one_by_one], decisions[args.one_by_one:]
+        common.report(f"approve {len(decisions)} explicit decisions (one commit)",
+                      common.best_of(lambda: manager.decide_leaves(decisions), 1), len(decisions))
+        if rest:
+            common.report(f"approve {len(rest)} one commit each",
+                          common.best_of(lambda: one_by_one(db, rest), 1), len(rest))
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
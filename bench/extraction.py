@@ -0,0 +1,57 @@
+"""
+Time the rule-based intent/entity extractor on the golden corpus of
+tests/data/extraction_corpus.json, uncached and cached. With --old OLD_AI_PY
+(the extractor before its matchers were precompiled, see
+tests/data/make_extraction_corpus.py) the old one is timed too; it needs
+dateparser installed. The cached run repeats the first CACHED_PHRASES phrases,
+which fit the extraction cache.
+
+dateparser's date search is replaced by a no-op while timing, so the numbers
+are the cost of the matchers rather than of dateparser.
+"""
+import argparse
+import json
+import sys
+
+import common
+import ai
+
+CACHED_PHRASES = 1000
+
+def load_phrases():
+    with open(f"{common.ROOT}/tests/data/extraction_corpus.json") as f:
+        return [case[0] for case in json.load(f)["cases"]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--old", metavar="OLD_AI_PY", help="also time this old extractor")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    phrases = load_phrases()
+    ai.search_dates_slow = lambda text: None
+    normalized = [" ".join(phrase.lower().split()) for phrase in phrases]
+    print(f"{len(phrases)} phrases")
+
+    new = common.best_of(lambda: [ai._extract_intent_entities(text) for text in normalized], args.repeat)
+    common.report("extractor, uncached", new, len(phrases))
+    repeated = phrases[:CACHED_PHRASES]
+    ai.invalidate_extraction_cache()
+    [ai.extract_intent_entities(phrase) for phrase in repeated]
+    cached = common.best_of(lambda: [ai.extract_intent_entities(phrase) for phrase in repeated], args.repeat)
+    common.report("extractor, cached", cached, len(repeated))
+
+    if args.old:
+        sys.path.insert(0, f"{common.ROOT}/tests/data")
+        import dateparser.search
+        from make_extraction_corpus import load_old_extractor
+        dateparser.search.search_dates = lambda text, settings=None: None
+        old_extract = load_old_extractor(args.old)
+        old = common.best_of(lambda: [old_extract(phrase) for phrase in phrases], args.repeat)
+        common.report("old extractor", old, len(phrases))
+        print(f"speedup, uncached: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Time importing ai and the first offline extraction in fresh interpreters, and
+check that the offline path does not import asyncio, openai or dateparser.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+import common
+
+# Printed by the child: ai import and first extraction times, then the heavy
+# modules that ended up imported
+CHILD = """
+import sys, time
+start = time.perf_counter()
+import ai
+imported = time.perf_counter()
+ai.process_input("I need 2 days of sick leave tomorrow")
+done = time.perf_counter()
+print(imported - start, done - imported)
+print(" ".join(name for name in ("asyncio", "openai", "dateparser") if name in sys.modules))
+"""
+
+
+def run_child():
+    env = dict(os.environ, LMS_OFFLINE="1", PYTHONDONTWRITEBYTECODE="1")
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=common.ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout.splitlines()
+    import_time, first_call = map(float, out[0].split())
+    return import_time, first_call, out[1] if len(out) > 1 else ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [run_child() for _ in range(args.runs)]
+    imports = [run[0] for run in runs]
+    first_calls = [run[1] for run in runs]
+    common.report("import ai (median)", statistics.median(imports))
+    common.report("first offline extraction (median)", statistics.median(first_calls))
+    heavy = {run[2] for run in runs}
+    print(f"heavy modules imported offline: {', '.join(sorted(heavy)) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
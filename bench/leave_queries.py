@@ -0,0 +1,110 @@
+"""
+Time the indexed leave queries (indexes.py, business_calendar.py) on multi-year
+histories against scanning the records and the holidays list: overlapping leave,
+who is off on a date, holiday lookups and working-day counts.
+"""
+import argparse
+import random
+from datetime import date
+
+import common
+from database import Database
+from indexes import LeaveIntervalIndex
+from records import APPROVED, PENDING
+from utils import leave_span, to_ordinal
+
+FIRST = date(common.HISTORY_YEARS[0], 1, 1).toordinal()
+LAST = date(common.HISTORY_YEARS[1], 12, 31).toordinal()
+
+
+def iso(day):
+    return date.fromordinal(day).isoformat()
+
+# About ten holidays a year over the history
+def synthetic_holidays(rng):
+    days = set()
+    for year in range(common.HISTORY_YEARS[0], common.HISTORY_YEARS[1] + 1):
+        days.update(iso(date(year, 1, 1).toordinal() + rng.randrange(365)) for _ in range(10))
+    return sorted(days)
+
+
+# The scans the indexes replace: each query walks the records or the holidays list
+def scan_overlapping(db, name, first, last):
+    found = []
+    for i, entry in enumerate(db.get_employee(name)["leave_history"]):
+        span = leave_span(entry)
+        if entry["status"] in (PENDING, APPROVED) and span[0] <= last and span[1] >= first:
+            found.append(i)
+    return found
+
+def scan_off_on(db, day):
+    return sorted(name for name, emp in db.iter_employees()
+                  if any(entry["status"] == APPROVED and leave_span(entry)[0] <= day <= leave_span(entry)[1]
+                         for entry in emp["leave_history"]))
+
+def scan_working_days(holidays, first, last):
+    return sum(1 for day in range(first, last + 1)
+               if date.fromordinal(day).weekday() < 5 and iso(day) not in holidays)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--entries", type=int, default=40,
+                        help=f"history entries per employee, spread over {common.HISTORY_YEARS[0]}-"
+                             f"{common.HISTORY_YEARS[1]}")
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(13)
+    holidays = synthetic_holidays(rng)
+    print(f"{args.employees} employees, {args.entries} history entries each, {len(holidays)} holidays")
+    with common.workdir():
+        common.write_store("employees.json", common.synthetic_employees(args.employees, entries=args.entries),
+                           holidays)
+        db = Database("employees.json")
+        names = db.employee_names()
+        ranges = []
+        for _ in range(args.queries):
+            first = FIRST + rng.randrange(LAST - FIRST)
+            ranges.append((rng.choice(names), first, first + rng.randrange(15)))
+        days = [FIRST + rng.randrange(LAST - FIRST) for _ in range(args.queries)]
+
+        common.report("build interval index", common.best_of(lambda: LeaveIntervalIndex().rebuild(db.iter_employees()), 1))
+        common.report("build holiday index and calendar",
+                      common.best_of(lambda: (db.holiday_index(), db.business_calendar()), 1))
+        assert all(db.overlapping_leave(name, iso(first), iso(last)) == scan_overlapping(db, name, first, last)
+                   for name, first, last in ranges[:100])
+        common.report(f"overlapping leave, indexed ({args.queries})",
+                      common.best_of(lambda: [db.overlapping_leave(name, iso(first), iso(last))
+                                              for name, first, last in ranges]), args.queries)
+        common.report(f"overlapping leave, scan ({args.queries})",
+                      common.best_of(lambda: [scan_overlapping(db, name, first, last)
+                                              for name, first, last in ranges], 1), args.queries)
+
+        # The scan reads every employee per date, so it gets a handful of dates only
+        few = days[:10]
+        assert all(db.employees_off_on(iso(day)) == scan_off_on(db, day) for day in few[:2])
+        common.report(f"who is off on a date, indexed ({args.queries})",
+                      common.best_of(lambda: [db.employees_off_on(iso(day)) for day in days]), args.queries)
+        common.report(f"who is off on a date, scan ({len(few)})",
+                      common.best_of(lambda: [scan_off_on(db, day) for day in few], 1), len(few))
+
+        common.report(f"is holiday, indexed ({args.queries})",
+                      common.best_of(lambda: [db.is_holiday(iso(day)) for day in days]), args.queries)
+        common.report(f"is holiday, list membership ({args.queries})",
+                      common.best_of(lambda: [iso(day) in holidays for day in days]), args.queries)
+        spans = [(first, first + 30 + rng.randrange(90)) for _, first, _ in ranges]
+        assert all(db.working_days(iso(first), iso(last)) == scan_working_days(holidays, first, last)
+                   for first, last in spans[:100])
+        common.report(f"working days in 1-4 months, calendar ({args.queries})",
+                      common.best_of(lambda: [db.working_days(iso(first), iso(last)) for first, last in spans]),
+                      args.queries)
+        common.report(f"working days in 1-4 months, day by day ({args.queries})",
+                      common.best_of(lambda: [scan_working_days(holidays, first, last) for first, last in spans], 1),
+                      args.queries)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
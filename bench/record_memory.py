@@ -0,0 +1,44 @@
+"""
+Measure with tracemalloc the memory held by employees parsed as plain dicts and
+as the slotted EmployeeRecord objects the JSON store keeps (1M history entries
+by default).
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+
+import common
+from records import EmployeeRecord
+
+
+# Bytes still allocated by build() once it returned, with its result kept alive
+def retained(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--entries", type=int, default=100, help="history entries per employee")
+    args = parser.parse_args(argv)
+
+    text = json.dumps(common.synthetic_employees(args.employees, entries=args.entries))
+    entries = args.employees * args.entries
+    print(f"{args.employees} employees, {entries} history entries, {len(text) / 1e6:.1f} MB of JSON")
+    dicts = retained(lambda: json.loads(text))
+    records = retained(lambda: {name: EmployeeRecord.from_dict(emp) for name, emp in json.loads(text).items()})
+    for label, size in (("parsed dicts", dicts), ("EmployeeRecord objects", records)):
+        print(f"{label:<24} {size / 1e6:8.1f} MB  ({size / entries:.0f} bytes per entry)")
+    print(f"records use {records / dicts:.0%} of the dicts' memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Time the leave analytics reports on a synthetic history (1M entries by
+default): loading the columns from the store, each report, and CSV export.
+"""
+import argparse
+import time
+
+import common
+from database import Database
+from reporting import REPORTS, LeaveColumns, write_csv
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--entries", type=int, default=100, help="history entries per employee")
+    args = parser.parse_args(argv)
+
+    with common.workdir():
+        start = time.perf_counter()
+        common.write_store("employees.json", common.synthetic_employees(args.employees, entries=args.entries))
+        print(f"{args.employees * args.entries} history entries, employees.json "
+              f"{common.file_size('employees.json')}, written in {time.perf_counter() - start:.1f} s")
+        db = Database("employees.json")
+        start = time.perf_counter()
+        cols = LeaveColumns.load(db.iter_employees())
+        common.report("load columns", time.perf_counter() - start, len(cols))
+        for name, report in sorted(REPORTS.items()):
+            common.report(f"report {name}", common.best_of(lambda: report(cols), 3))
+            rows = report(cols)
+            common.report(f"  CSV export ({len(rows)} rows)", common.best_of(lambda: write_csv(rows, f"{name}.csv"), 3))
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
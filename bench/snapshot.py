@@ -0,0 +1,65 @@
+"""
+Compare save time, load time and file size of the indent=4 JSON store and the
+binary snapshot format (snapshot.py) at 1k, 100k and 1M employees.
+"""
+import argparse
+import gc
+import os
+import time
+
+import common
+from records import EmployeeRecord
+from storage import JSONStorage
+
+FORMATS = (("json", "employees.json", False), ("binary", "employees.snap", True))
+
+
+# A store holding count synthetic employees, built record by record so the plain
+# dicts never exist all at once
+def build_store(count, entries):
+    store = JSONStorage("employees.json")
+    store.data = {"admins": ["Admin"], "holidays": [],
+                  "employees": {name: EmployeeRecord.from_dict(emp)
+                                for name, emp in common.iter_synthetic_employees(count, entries)}}
+    return store
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+# Seconds to open the file, and to open it and read every employee as a full scan
+# of the store would
+def load_times(filename, binary):
+    store = JSONStorage(filename, binary=binary)
+    opened = timed(store.load)
+    scanned = opened + timed(lambda: sum(1 for _ in store.iter_employees()))
+    store.close()
+    return opened, scanned
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000",
+                        help="comma-separated employee counts (1M needs about 4 GB of memory)")
+    parser.add_argument("--entries", type=int, default=5, help="history entries per employee")
+    args = parser.parse_args(argv)
+
+    print(f"{'employees':>10} {'format':>7} {'save s':>8} {'open s':>8} {'read all s':>10} {'size MB':>8}")
+    with common.workdir():
+        for count in map(int, args.sizes.split(",")):
+            store = build_store(count, args.entries)
+            for label, filename, binary in FORMATS:
+                store.filename, store.binary = filename, binary
+                save = timed(store._replace_snapshot)
+                gc.collect()
+                opened, scanned = load_times(filename, binary)
+                print(f"{count:>10} {label:>7} {save:8.2f} {opened:8.2f} {scanned:10.2f} "
+                      f"{os.path.getsize(filename) / 1e6:8.1f}")
+                os.remove(filename)
+            del store
+            gc.collect()
+
+
+if __name__ == "__main__":
+    main()
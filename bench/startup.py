@@ -0,0 +1,77 @@
+"""
+Time opening a large employees.json and reading one employee, and report the
+peak RSS, each in a fresh process. For comparison the same is done with a full
+json.load of the file, which is what startup did before the lazy load.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+import common
+
+# Printed by the child: seconds to open the store and read one employee, peak RSS
+# in kB, then the anonymous and file-backed parts of the current RSS in kB where
+# /proc tells them apart
+RSS = """
+import os, resource
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+if os.path.exists("/proc/self/status"):
+    status = dict(line.split(":", 1) for line in open("/proc/self/status"))
+    print(status["RssAnon"].split()[0], status["RssFile"].split()[0])
+"""
+STORE = """
+import sys, time
+sys.path.insert(0, {root!r})
+from database import Database
+start = time.perf_counter()
+db = Database("employees.json", journal=True)
+db.get_employee({name!r})
+print(time.perf_counter() - start)
+""" + RSS
+FULL_LOAD = """
+import json, time
+start = time.perf_counter()
+with open("employees.json") as f:
+    data = json.load(f)
+data["employees"][{name!r}]
+print(time.perf_counter() - start)
+""" + RSS
+
+
+def run_child(code, name):
+    out = subprocess.run([sys.executable, "-c", code.format(root=common.ROOT, name=name)],
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), [int(kb) * 1024 for kb in out[1:]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--entries", type=int, default=100, help="history entries per employee")
+    parser.add_argument("--skip-full-load", action="store_true", help="do not time the full json.load")
+    args = parser.parse_args(argv)
+
+    with common.workdir():
+        employees = common.synthetic_employees(args.employees, entries=args.entries)
+        name = list(employees)[-1]
+        common.write_store("employees.json", employees)
+        del employees
+        print(f"employees.json {common.file_size('employees.json')}")
+        before = os.stat("employees.json")
+        runs = [("lazy load (Database)", STORE)]
+        if not args.skip_full_load:
+            runs.append(("full json.load", FULL_LOAD))
+        for label, code in runs:
+            seconds, rss = run_child(code, name)
+            line = f"{label:<24} {seconds:8.2f} s  peak RSS {rss[0] / 1e6:.0f} MB"
+            if len(rss) == 3:
+                line += f" (now {rss[1] / 1e6:.0f} MB anonymous, {rss[2] / 1e6:.0f} MB file-backed)"
+            print(line)
+        after = os.stat("employees.json")
+        if (before.st_mtime_ns, before.st_size) != (after.st_mtime_ns, after.st_size):
+            print("warning: employees.json was rewritten on load")
+
+
+if __name__ == "__main__":
+    main()
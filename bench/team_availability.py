@@ -0,0 +1,78 @@
+"""
+Time the team availability queries (availability.py) for 50k employees: building
+the day bitmaps, headcount off for the next 90 days, the first range with enough
+people available and re-indexing one changed employee, against walking every
+employee's history.
+"""
+import argparse
+import random
+from datetime import date
+
+import common
+from database import Database
+from employee import EmployeeManager
+from records import APPROVED, PENDING
+from utils import leave_span
+
+
+# Walk every record for each day, as a query without the index has to
+def scan_headcount(db, first, count):
+    counts = [0] * count
+    for _, emp in db.iter_employees():
+        off = set()
+        for entry in emp["leave_history"]:
+            if entry["status"] in (PENDING, APPROVED):
+                span = leave_span(entry)
+                off.update(range(max(span[0], first), min(span[1], first + count - 1) + 1))
+        for day in off:
+            counts[day - first] += 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--employees", type=int, default=50000)
+    parser.add_argument("--upcoming", type=int, default=4, help="Approved/Pending leaves ahead per employee")
+    args = parser.parse_args(argv)
+
+    # Closed history plus leave spread over the next 120 days
+    rng = random.Random(14)
+    today = date.today().toordinal()
+    employees = common.synthetic_employees(args.employees, entries=5)
+    for emp in employees.values():
+        for _ in range(args.upcoming):
+            emp["leave_history"].append({"type": "Annual Leave", "days": rng.randint(1, 10),
+                                         "start_date": date.fromordinal(today + rng.randrange(120)).isoformat(),
+                                         "status": rng.choice((PENDING, APPROVED))})
+    print(f"{args.employees} employees, {args.upcoming} upcoming leaves each")
+    with common.workdir():
+        common.write_store("employees.json", employees)
+        del employees
+        db = Database("employees.json", journal=True, compact_threshold=10 ** 9)
+        manager = EmployeeManager(db)
+        common.report("build day bitmaps", common.best_of(lambda: db.availability_index().rebuild(db.iter_employees()), 1))
+        counts = [off for _, off in manager.team_availability(90)]
+        assert counts == scan_headcount(db, today, 90)
+        common.report("headcount off for the next 90 days", common.best_of(lambda: manager.team_availability(90)))
+        common.report("  walking every record", common.best_of(lambda: scan_headcount(db, today, 90), 1))
+        # Ask for more people than are ever all available, so the search runs to the horizon
+        most = args.employees - min(counts) + 1
+        common.report("first 5-day range, not found in 365 days",
+                      common.best_of(lambda: manager.find_available_range(most, 5, horizon=365)))
+        # As many available as on a median day, so a range is found
+        median = args.employees - sorted(counts)[len(counts) // 2]
+        common.report("first 5-day range, median headcount available",
+                      common.best_of(lambda: manager.find_available_range(median, 5)))
+
+        index = db.availability_index()
+        name = db.employee_names()[0]
+        emp = db.get_employee(name)
+        emp["leave_history"].append({"type": "Annual Leave", "days": 10, "status": PENDING,
+                                     "start_date": date.fromordinal(today + 30).isoformat()})
+        common.report("re-index one employee after a request",
+                      common.best_of(lambda: index.update(name, emp)))
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Time the business calendar (business_calendar.py): counting working days and
+finding the day a leave ends against walking the days, and adding holidays,
+against shifting every count after the new holiday as add() used to.
+"""
+import argparse
+import random
+from datetime import date
+
+import common
+from business_calendar import BusinessCalendar
+
+TODAY = date.today().toordinal()
+
+
+def iso(day):
+    return date.fromordinal(day).isoformat()
+
+def is_working(day, holidays):
+    return date.fromordinal(day).weekday() < 5 and day not in holidays
+
+# The day-by-day loops the calendar replaced
+def loop_count(first, last, holidays):
+    return sum(1 for day in range(first, last + 1) if is_working(day, holidays))
+
+def loop_end_of(start, n, holidays):
+    day = start
+    while True:
+        if is_working(day, holidays):
+            n -= 1
+            if n == 0:
+                return day
+        day += 1
+
+# add() before removed days were kept aside: every count after the holiday shifted in place
+def shifting_add(cal, holiday):
+    day = date.fromisoformat(holiday).toordinal()
+    cal.holidays.add(day)
+    if not cal.first_day <= day <= cal.last_day or date.fromordinal(day).weekday() >= 5:
+        return
+    cumulative = cal.cumulative
+    for j in range(day - cal.first_day + 1, len(cumulative)):
+        cumulative[j] -= 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--holidays", type=int, default=300, help="holidays over the seven-year window")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--adds", type=int, default=100, help="holidays added one at a time")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(24)
+    holidays = {TODAY - 365 + rng.randrange(7 * 365) for _ in range(args.holidays)}
+    names = [iso(day) for day in holidays]
+    queries = [(TODAY + rng.randrange(1500), rng.randint(1, 30)) for _ in range(args.queries)]
+    print(f"{len(holidays)} holidays, {args.queries} queries")
+
+    cal = BusinessCalendar()
+    common.report("build seven-year calendar", common.best_of(lambda: cal.rebuild(names)))
+    assert all(cal.count(start, start + 30) == loop_count(start, start + 30, holidays) for start, _ in queries[:100])
+    assert all(cal.end_of(start, n) == loop_end_of(start, n, holidays) for start, n in queries[:100])
+    common.report(f"working days in a month, calendar ({args.queries})",
+                  common.best_of(lambda: [cal.count(start, start + 30) for start, _ in queries]), args.queries)
+    common.report(f"working days in a month, day by day ({args.queries})",
+                  common.best_of(lambda: [loop_count(start, start + 30, holidays) for start, _ in queries], 3),
+                  args.queries)
+    common.report(f"end of n working days, calendar ({args.queries})",
+                  common.best_of(lambda: [cal.end_of(start, n) for start, n in queries]), args.queries)
+    common.report(f"end of n working days, day by day ({args.queries})",
+                  common.best_of(lambda: [loop_end_of(start, n, holidays) for start, n in queries], 3), args.queries)
+
+    added = [iso(TODAY + rng.randrange(1500)) for _ in range(args.adds)]
+    # Each add is followed by a query, as Database.add_holiday and a leave request are
+    def add_and_query(window_end, add):
+        cal.rebuild(names)
+        cal.count(TODAY, window_end)
+        for holiday in added:
+            add(cal, holiday)
+            cal.count(TODAY, TODAY + 30)
+    for label, window_end in (("7-year window", TODAY), ("window to 2200", date(2200, 1, 1).toordinal())):
+        common.report(f"add + query, {label} ({args.adds})",
+                      common.best_of(lambda: add_and_query(window_end, BusinessCalendar.add), 3), args.adds)
+        common.report("  shifting every later count",
+                      common.best_of(lambda: add_and_query(window_end, shifting_add), 3), args.adds)
+
+
+if __name__ == "__main__":
+    main()
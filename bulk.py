@@ -0,0 +1,352 @@
+import argparse
+import csv
+import json
+import sys
+from contextlib import nullcontext
+from database import ConflictError
+from ledger import GRANTS_KEY, open_ledger, set_balance
+from records import LEAVE_TYPES, STATUSES
+from utils import to_ordinal, validate_date
+
+# Non-interactive bulk import and export of employees and holidays.
+#
+# Formats, chosen by file extension (.csv / .jsonl) or --format:
+#   employees CSV:   name,is_manager,Sick Leave,Annual Leave,Maternity Leave
+#   employees JSONL: {"name": ..., "is_manager": false, "leave_balance": {...}, "leave_history": [...],
+#                     "leave_grants": [...]}
+#   holidays CSV:    date
+#   holidays JSONL:  {"date": "YYYY-MM-DD"}
+# Rows are read one at a time and valid ones are saved in chunks, each chunk with a
+# single put_employees/add_holidays commit and a single audit log write. Invalid rows
+# are reported with their line number and skipped; they never abort the import. That
+# includes leave_history entries without a known type, positive whole days, a valid
+# start_date and a known status, so a bad entry never reaches the indexes.
+# Balances set by an import are recorded in the balance ledger (ledger.py); imported
+# leave_grants are kept as given.
+
+EMPLOYEE_FIELDS = ("name", "is_manager") + LEAVE_TYPES
+TRUE_VALUES = ("yes", "true", "1", "y")
+FALSE_VALUES = ("no", "false", "0", "n", "")
+
+
+class ImportResult:
+    # Outcome of an import: row counts and (line, name, message) for every rejected row
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.errors = []
+
+    def error(self, line, name, message):
+        self.errors.append((line, name, message))
+
+    def summary(self):
+        return f"{self.added} added, {self.updated} updated, {len(self.errors)} rejected."
+
+
+# Yield (line_number, row dict) from a CSV or JSONL file object. Malformed JSON lines
+# are yielded as (line_number, None) so they can be reported.
+def read_rows(f, fmt):
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _parse_manager(value):
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"is_manager must be yes or no, not {value!r}")
+
+
+# Balances from a row: CSV has one column per leave type, JSONL a leave_balance object.
+# Missing or empty values are left out so an update keeps the current balance.
+def _parse_balances(row):
+    if "leave_balance" in row:
+        given = row["leave_balance"]
+        if not isinstance(given, dict):
+            raise ValueError("leave_balance must be an object")
+    else:
+        given = {lt: row[lt] for lt in LEAVE_TYPES if lt in row}
+    balances = {}
+    for ltype, value in given.items():
+        if ltype not in LEAVE_TYPES:
+            raise ValueError(f"unknown leave type {ltype!r}")
+        if value is None or value == "":
+            continue
+        if isinstance(value, bool):
+            raise ValueError(f"{ltype} must be a whole number, not {value!r}")
+        try:
+            num = int(value)
+        except (ValueError, TypeError):
+            raise ValueError(f"{ltype} must be a whole number, not {value!r}")
+        if num < 0 or num != value and not isinstance(value, str):
+            raise ValueError(f"{ltype} must be a non-negative whole number, not {value!r}")
+        balances[ltype] = num
+    return balances
+
+
+# Check every leave_history entry of a row; the message names the first bad entry
+def _parse_history(row):
+    history = row.get("leave_history", [])
+    if not isinstance(history, list):
+        raise ValueError("leave_history must be a list of objects")
+    for i, entry in enumerate(history, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"leave_history entry {i} must be an object")
+        if entry.get("type") not in LEAVE_TYPES:
+            raise ValueError(f"leave_history entry {i}: unknown leave type {entry.get('type')!r}")
+        days = entry.get("days")
+        if type(days) is not int or days <= 0:
+            raise ValueError(f"leave_history entry {i}: days must be a positive whole number, not {days!r}")
+        if entry.get("status") not in STATUSES:
+            raise ValueError(f"leave_history entry {i}: unknown status {entry.get('status')!r}")
+        start = to_ordinal(entry.get("start_date"))
+        if start is None:
+            raise ValueError(f"leave_history entry {i}: start_date must be YYYY-MM-DD")
+        for field in ("end_date", "requested_on", "decided_on"):
+            if field in entry and to_ordinal(entry[field]) is None:
+                raise ValueError(f"leave_history entry {i}: {field} must be YYYY-MM-DD")
+        if "end_date" in entry and to_ordinal(entry["end_date"]) < start:
+            raise ValueError(f"leave_history entry {i}: end_date is before start_date")
+    return history
+
+
+# Import employees from a CSV or JSONL file object. New employees get 0 for any
+# balance not given. Existing employees are rejected unless update is True, in which
+# case the given balances and manager flag replace theirs and the history is kept.
+def import_employees(db, f, fmt, update=False, chunk_size=1000, actor="Admin"):
+    result = ImportResult()
+    seen = set()
+    chunk = {}
+    log_records = []
+    rows = []
+
+    def flush():
+        if not chunk:
+            return
+        try:
+            db.put_employees(chunk)
+        except ConflictError as e:
+            for line, name, _ in rows:
+                result.error(line, name, str(e))
+        else:
+            db.log_actions(log_records)
+            for _, _, existed in rows:
+                if existed:
+                    result.updated += 1
+                else:
+                    result.added += 1
+        chunk.clear()
+        log_records.clear()
+        rows.clear()
+
+    for line, row in read_rows(f, fmt):
+        if row is None:
+            result.error(line, "", "not a JSON object")
+            continue
+        name = str(row.get("name") or "").strip()
+        if not name:
+            result.error(line, "", "name is missing")
+            continue
+        if name in seen:
+            result.error(line, name, "duplicate name in this file")
+            continue
+        try:
+            is_manager = _parse_manager(row.get("is_manager"))
+            balances = _parse_balances(row)
+            history = _parse_history(row)
+            grants = row.get(GRANTS_KEY)
+            if grants is not None and not (isinstance(grants, list) and all(
+                    isinstance(g, dict) and isinstance(g.get("type"), str) and type(g.get("days")) is int for g in grants)):
+                raise ValueError("leave_grants must be a list of objects with a type and whole days")
+        except ValueError as e:
+            result.error(line, name, str(e))
+            continue
+
+        existed = db.employee_exists(name)
+        if existed:
+            if not update:
+                result.error(line, name, "Employee already exists.")
+                continue
+            emp = db.get_employee(name)
+            if row.get("is_manager") not in (None, ""):
+                emp["is_manager"] = is_manager
+            if "leave_history" in row:
+                emp["leave_history"] = history
+                # The imported history replaces the old one, so the ledger restarts from it
+                emp.pop(GRANTS_KEY, None)
+            if grants is not None:
+                emp[GRANTS_KEY] = grants
+            for ltype, days in balances.items():
+                set_balance(emp, ltype, days, "import")
+            log_records.append({
+                "message": f"{actor} edited employee {name} with leave balances {balances}. Manager status: {is_manager}.",
+                "actor": actor, "action": "edit_employee", "employee": name
+            })
+        else:
+            emp = {
+                "leave_balance": {lt: balances.get(lt, 0) for lt in LEAVE_TYPES},
+                "is_manager": is_manager,
+                "leave_history": history
+            }
+            if grants is not None:
+                emp[GRANTS_KEY] = grants
+            else:
+                open_ledger(emp)
+            log_records.append({
+                "message": f"{actor} added employee {name} (Manager: {is_manager}) with leave balances {emp['leave_balance']}.",
+                "actor": actor, "action": "add_employee", "employee": name
+            })
+        seen.add(name)
+        chunk[name] = emp
+        rows.append((line, name, existed))
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+    return result
+
+
+# Import holiday dates; dates already present or repeated in the file are rejected
+def import_holidays(db, f, fmt, chunk_size=1000, actor="Admin"):
+    result = ImportResult()
+    known = set(db.get_holidays())
+    chunk = []
+
+    def flush():
+        if not chunk:
+            return
+        db.add_holidays(list(chunk))
+        db.log_actions([{"message": f"{actor} added holiday {date}.", "actor": actor, "action": "add_holiday", "date": date}
+                        for date in chunk])
+        result.added += len(chunk)
+        chunk.clear()
+
+    for line, row in read_rows(f, fmt):
+        if row is None:
+            result.error(line, "", "not a JSON object")
+            continue
+        date = str(row.get("date") or "").strip()
+        if not validate_date(date):
+            result.error(line, date, "date must be YYYY-MM-DD")
+            continue
+        if date in known:
+            result.error(line, date, "Holiday already exists.")
+            continue
+        known.add(date)
+        chunk.append(date)
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+    return result
+
+
+# Write every employee to a file object, one row at a time. CSV holds name, manager
+# flag and balances; JSONL holds the full record including leave history.
+def export_employees(db, f, fmt):
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(f)
+        writer.writerow(EMPLOYEE_FIELDS)
+        for name, emp in db.iter_employees():
+            balances = emp.get("leave_balance", {})
+            writer.writerow([name, "yes" if emp.get("is_manager") else "no"] + [balances.get(lt, 0) for lt in LEAVE_TYPES])
+            count += 1
+    else:
+        for name, emp in db.iter_employees():
+            f.write(json.dumps({"name": name, **emp}) + "\n")
+            count += 1
+    return count
+
+def export_holidays(db, f, fmt):
+    holidays = db.get_holidays()
+    if fmt == "csv":
+        writer = csv.writer(f)
+        writer.writerow(["date"])
+        writer.writerows([date] for date in holidays)
+    else:
+        f.writelines(json.dumps({"date": date}) + "\n" for date in holidays)
+    return len(holidays)
+
+
+def _format_of(path, fmt):
+    if fmt:
+        return fmt
+    if path.endswith(".csv"):
+        return "csv"
+    if path.endswith(".jsonl"):
+        return "jsonl"
+    sys.exit(f"Error: cannot tell the format of {path}; pass --format csv or --format jsonl")
+
+def write_errors(errors, target):
+    with open(target, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["line", "name", "error"])
+        writer.writerows(errors)
+
+
+def main(argv=None):
+    from config import BULK_CHUNK_SIZE
+    from database import open_database
+
+    parser = argparse.ArgumentParser(description="Bulk import and export of employees and holidays.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in (("import", "import rows from a CSV or JSONL file ('-' for stdin)"),
+                               ("export", "export rows to a CSV or JSONL file ('-' for stdout)")):
+        cmd = sub.add_parser(command, help=help_text)
+        cmd.add_argument("kind", choices=["employees", "holidays"])
+        cmd.add_argument("file")
+        cmd.add_argument("--format", choices=["csv", "jsonl"], help="file format (default: from the extension)")
+    import_cmd = sub.choices["import"]
+    import_cmd.add_argument("--update", action="store_true", help="update existing employees instead of rejecting them")
+    import_cmd.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE, help="rows saved per commit")
+    import_cmd.add_argument("--errors", metavar="FILE", help="write rejected rows to a CSV file")
+    import_cmd.add_argument("--actor", default="Admin", help="name recorded in the audit log")
+    args = parser.parse_args(argv)
+    fmt = _format_of(args.file, args.format)
+
+    db = open_database()
+    try:
+        if args.command == "import":
+            f = nullcontext(sys.stdin) if args.file == "-" else open(args.file, newline="" if fmt == "csv" else None, encoding="utf-8")
+            with f as f:
+                if args.kind == "employees":
+                    result = import_employees(db, f, fmt, update=args.update, chunk_size=args.chunk_size, actor=args.actor)
+                else:
+                    result = import_holidays(db, f, fmt, chunk_size=args.chunk_size, actor=args.actor)
+            print(result.summary())
+            for line, name, message in result.errors[:20]:
+                print(f"  line {line}: {name + ': ' if name else ''}{message}")
+            if len(result.errors) > 20:
+                print(f"  ... and {len(result.errors) - 20} more")
+            if args.errors:
+                write_errors(result.errors, args.errors)
+        else:
+            f = nullcontext(sys.stdout) if args.file == "-" else open(args.file, "w", newline="" if fmt == "csv" else None, encoding="utf-8")
+            with f as f:
+                export = export_employees if args.kind == "employees" else export_holidays
+                count = export(db, f, fmt)
+            if args.file != "-":
+                print(f"Wrote {count} row(s) to {args.file}.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
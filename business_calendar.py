@@ -0,0 +1,113 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from utils import to_ordinal
+
+class BusinessCalendar:
+    # Working days (Monday-Friday and not a holiday) over a window of whole years
+    # around today, precomputed so both questions leave requests ask are O(1):
+    #   count(first, last)   working days in [first, last]
+    #   end_of(start, n)     the day the n-th working day counted from start falls on
+    # cumulative[i] is the number of working days in [first_day, first_day + i), and
+    # working holds the working days' ordinals in order, so a day's rank among working
+    # days is a cumulative lookup and the n-th one after it an index. Queries outside
+    # the window grow it. A holiday added later on a working day is not written into
+    # the arrays: it goes to removed (the day's index in working, kept sorted), which
+    # queries subtract with a bisect, and is folded in by the next build, at the latest
+    # once MAX_REMOVED days are waiting. Days are date ordinals and unparseable holiday
+    # strings are ignored.
+    MAX_REMOVED = 256
+
+    def __init__(self, years_before=1, years_after=5):
+        self.years_before = years_before
+        self.years_after = years_after
+        self.holidays = set()
+        self.first_day = self.last_day = 0
+        self.cumulative = array("i", [0])
+        self.working = array("i")
+        self.removed = []
+
+    def rebuild(self, holidays):
+        self.holidays = {day for day in map(to_ordinal, holidays) if day is not None}
+        year = date.today().year
+        self._build(date(year - self.years_before, 1, 1).toordinal(),
+                    date(year + self.years_after, 12, 31).toordinal())
+
+    def _build(self, first, last):
+        cumulative = array("i", bytes(4 * (last - first + 2)))
+        working = array("i")
+        weekday = date.fromordinal(first).weekday()
+        holidays = self.holidays
+        count = 0
+        for i, day in enumerate(range(first, last + 1), 1):
+            if (weekday + i - 1) % 7 < 5 and day not in holidays:
+                count += 1
+                working.append(day)
+            cumulative[i] = count
+        self.first_day, self.last_day = first, last
+        self.cumulative, self.working = cumulative, working
+        self.removed = []
+
+    # Grow the window by whole years so it covers [first, last]
+    def _cover(self, first, last):
+        if first >= self.first_day and last <= self.last_day:
+            return
+        start = min(first, self.first_day) if self.first_day else first
+        end = max(last, self.last_day)
+        self._build(date(date.fromordinal(start).year, 1, 1).toordinal(),
+                    date(min(date.fromordinal(end).year + self.years_after, 9999), 12, 31).toordinal())
+
+    def add(self, holiday):
+        day = to_ordinal(holiday)
+        if day is None or day in self.holidays:
+            return
+        self.holidays.add(day)
+        if not self.first_day <= day <= self.last_day or date.fromordinal(day).weekday() >= 5:
+            return
+        # The day stops being a working day
+        insort(self.removed, bisect_left(self.working, day))
+        if len(self.removed) > self.MAX_REMOVED:
+            self._build(self.first_day, self.last_day)
+
+    def is_working_day(self, day):
+        self._cover(day, day)
+        i = day - self.first_day
+        rank = self.cumulative[i]
+        return self.cumulative[i + 1] != rank and not self._removed_between(rank, rank)
+
+    # Number of working days in the inclusive range [first, last]
+    def count(self, first, last):
+        if last < first:
+            return 0
+        self._cover(first, last)
+        low = self.cumulative[first - self.first_day]
+        high = self.cumulative[last - self.first_day + 1]
+        return high - low - self._removed_between(low, high - 1)
+
+    # Day of the n-th working day (n >= 1) counting from start, which counts itself
+    # if it is a working day
+    def end_of(self, start, n):
+        self._cover(start, start)
+        rank = self._nth_working(start, n)
+        while rank >= len(self.working):
+            if self.last_day >= date.max.toordinal():
+                raise ValueError("the leave would end after 9999-12-31")
+            # Roughly the calendar days n more working days need, then one spare year
+            self._cover(start, min(self.last_day + (rank - len(self.working) + 1) * 7 // 5 + 366, date.max.toordinal()))
+            rank = self._nth_working(start, n)
+        return self.working[rank]
+
+    # Index in working of the n-th working day from start, skipping removed days: the
+    # smallest index with n days left in [first, index] once removed ones are taken out
+    def _nth_working(self, start, n):
+        first = self.cumulative[start - self.first_day]
+        rank = first + n - 1
+        while True:
+            shifted = first + n - 1 + self._removed_between(first, rank)
+            if shifted == rank:
+                return rank
+            rank = shifted
+
+    # Number of removed days whose index in working is in [low, high]
+    def _removed_between(self, low, high):
+        return bisect_right(self.removed, high) - bisect_left(self.removed, low)
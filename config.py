@@ -1 +1,57 @@
 OPENAI_API_KEY = "sk-proj-..."
+# Optional API base URL, e.g. a local OpenAI-compatible server; None uses the default endpoint
+OPENAI_BASE_URL = None
+# Seconds to wait for the AI answer before using the rule-based result
+LLM_LATENCY_BUDGET = 2.0
+# Run fully offline with only the rule-based extractor (also enabled by LMS_OFFLINE=1)
+OFFLINE_MODE = False
+# Disk cache of AI extraction results: file, entry lifetime in seconds and size limit in bytes
+LLM_CACHE_FILE = "llm_cache.db"
+LLM_CACHE_TTL = 7 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 10 * 1024 * 1024
+
+# Storage engine: "json" (employees.json) or "sqlite" (indexed SQLITE_FILENAME, seeded from employees.json)
+DB_ENGINE = "json"
+SQLITE_FILENAME = "employees.db"
+
+# Append mutations to employees.json.journal instead of rewriting employees.json on every change.
+# employees.json alone then lags behind until the journal is compacted (see DB_COMPACT_THRESHOLD)
+DB_JOURNAL = True
+# Number of journal records after which the journal is folded back into employees.json
+DB_COMPACT_THRESHOLD = 500
+# Snapshot format of the "json" engine: "json" (employees.json) or "binary" (SNAPSHOT_FILENAME,
+# a compact checksummed file seeded from employees.json; convert back with snapshot.py to-json)
+DB_SNAPSHOT_FORMAT = "json"
+SNAPSHOT_FILENAME = "employees.snap"
+
+# Audit log: JSON-lines file, seconds between background flushes, rotation size and number of
+# compressed rotated files to keep (the log also rotates when the day changes). None keeps every
+# rotated file; set a number only if deleting older audit records is acceptable.
+AUDIT_LOG_FILE = "system.log"
+AUDIT_FLUSH_INTERVAL = 1.0
+AUDIT_MAX_BYTES = 5 * 1024 * 1024
+AUDIT_BACKUP_COUNT = None
+
+# Multi-session server (server.py): listen address and seconds to gather writes into one commit
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_COMMIT_DELAY = 0.002
+
+# Rows saved per commit by bulk.py imports
+BULK_CHUNK_SIZE = 1000
+
+# Yearly accrual rules per leave type for accrual.py: days granted each year, whether the grant is
+# pro-rated from an employee's "joined_on" date, most unused days carried over (None = all) and the
+# MM-DD date after which unused carried-over days expire
+ACCRUAL_POLICY = {
+    "Annual Leave": {"grant": 14, "prorate": True, "carry_over": 5, "carry_over_expires": "03-31"},
+    "Sick Leave": {"grant": 7, "prorate": True, "carry_over": 0},
+    "Maternity Leave": {"grant": 84, "prorate": False, "carry_over": 0},
+}
+
+# History archive (archive.py): directory of the per-year segments, days after a Cancelled/Denied
+# leave ends before it is archived, employees archived per commit and archived entries per history page
+ARCHIVE_DIR = "archive"
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_CHUNK_SIZE = 1000
+ARCHIVE_PAGE_SIZE = 20
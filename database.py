@@ -1,27 +1,303 @@
-import json
+from audit import AuditLogger
+from availability import AvailabilityIndex
+from business_calendar import BusinessCalendar
 from datetime import datetime
+from indexes import HolidayIndex, LeaveIntervalIndex
+from storage import JSONStorage, SQLiteStorage
+from utils import to_ordinal
+
+class ConflictError(RuntimeError):
+    # An employee record was written from a copy read before another process changed it
+    pass
+
 
 class Database:
-    # Initialize with the filename of the JSON data store and load existing data
-    def __init__(self, filename):
+    # Initialize with the filename of the data store and load existing data.
+    # engine selects the storage backend: "json" keeps the whole document in memory
+    # (optionally journaled), "sqlite" keeps it in an indexed SQLite file and imports
+    # seed_filename on first use; binary makes the "json" engine write the binary
+    # snapshot format (seeded from seed_filename). Actions are logged through audit (an AuditLogger
+    # writing system.log by default). progress, if given, is called as
+    # progress(done, total) while the data loads.
+    def __init__(self, filename, engine="json", journal=False, compact_threshold=500, seed_filename=None, audit=None,
+                 progress=None, binary=False):
         self.filename = filename
-        self.load()
+        self.audit = audit if audit is not None else AuditLogger("system.log")
+        if engine == "json":
+            self.backend = JSONStorage(filename, journal=journal, compact_threshold=compact_threshold,
+                                       binary=binary, seed_filename=seed_filename)
+        elif engine == "sqlite":
+            self.backend = SQLiteStorage(filename, seed_filename=seed_filename)
+        else:
+            raise ValueError(f"Unknown storage engine: {engine}")
+        # Leave span, availability and holiday indexes and the business calendar are
+        # built on first use and kept current by the writers
+        self._intervals = None
+        self._availability = None
+        self._holidays = None
+        self._calendar = None
+        # Optimistic concurrency: each refresh that picks up changes from other
+        # processes starts a new generation. _read holds the generation in which each
+        # employee was last read and _changed the one in which another process last
+        # changed it; writing an employee changed after it was read is a conflict.
+        self._generation = 0
+        self._read = {}
+        self._changed = {}
+        self.load(progress)
 
-    # Load data from the JSON file; if 'holidays' key is missing, add it and save
-    def load(self):
-        with open(self.filename, "r") as f:
-            self.data = json.load(f)
-        if "holidays" not in self.data:
-            self.data["holidays"] = []
-        self.save()
+    # Load data from the storage backend
+    def load(self, progress=None):
+        self.backend.load(progress)
+        self._intervals = None
+        self._availability = None
+        self._holidays = None
+        self._calendar = None
 
-    # Write the current state of data back to the JSON file with pretty formatting
+    # Persist everything that is still buffered in the backend
     def save(self):
-        with open(self.filename, "w") as f:
-            json.dump(self.data, f, indent=4)
-
-    # Append a log message to the system log file with a timestamp
-    def log_action(self, message):
-        with open("system.log", "a") as log_file:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_file.write(f"[{timestamp}] {message}\n")
+        with self.backend.locked():
+            self.refresh()
+            self.backend.save()
+
+    # Pick up changes other processes made to the store. Changed employees are
+    # re-indexed one by one; after a full reload the indexes are rebuilt on next use,
+    # and so are the holiday index and business calendar after new holidays.
+    def refresh(self):
+        changed, reloaded, holidays_changed = self.backend.refresh(self._read)
+        if holidays_changed:
+            self._holidays = None
+            self._calendar = None
+        if not changed and not reloaded:
+            return
+        self._generation += 1
+        for name in changed:
+            self._changed[name] = self._generation
+        if reloaded:
+            self._intervals = None
+            self._availability = None
+            return
+        for name in changed:
+            emp = self.backend.get_employee(name)
+            for index in (self._intervals, self._availability):
+                if index is not None:
+                    if emp is None:
+                        index.remove(name)
+                    else:
+                        index.update(name, emp)
+
+    # Release files and connections held by the backend and flush the audit log
+    def close(self):
+        self.backend.close()
+        self.audit.flush()
+
+    # Return the employee record dict, or None if the employee does not exist.
+    # Changes made to the returned dict are only persisted by put_employee.
+    def get_employee(self, name):
+        self.refresh()
+        self._read[name] = self._generation
+        return self.backend.get_employee(name)
+
+    def employee_exists(self, name):
+        return self.backend.employee_exists(name)
+
+    def employee_names(self):
+        return self.backend.employee_names()
+
+    # Yield (name, record) pairs for every employee, or only for the given names
+    def iter_employees(self, names=None):
+        return self.backend.iter_employees(names)
+
+    # Store an employee record and persist the change. Raises ConflictError, without
+    # writing anything, if another process changed the employee since it was read.
+    def put_employee(self, name, emp):
+        with self.backend.locked():
+            self._check_conflicts([name])
+            self.backend.put_employee(name, emp)
+        self._update_indexes(name, emp)
+
+    # Store several employee records ({name: record}) as a single commit, together
+    # with the store-wide meta values given
+    def put_employees(self, employees, meta=None):
+        with self.backend.locked():
+            self._check_conflicts(employees)
+            self.backend.put_employees(employees, meta)
+        for name, emp in employees.items():
+            self._update_indexes(name, emp)
+
+    # Apply partial changes to several employees ({name: {key: value}}, see
+    # StorageBackend.update_employees) as a single commit, together with the store-wide
+    # meta values given
+    def update_employees(self, changes, meta=None):
+        with self.backend.locked():
+            self._check_conflicts(changes)
+            self.backend.update_employees(changes, meta)
+        for name, change in changes.items():
+            if "leave_history" in change:
+                self._update_indexes(name, self.backend.get_employee(name))
+
+    # Remove an employee record and persist the change
+    def delete_employee(self, name):
+        with self.backend.locked():
+            self.refresh()
+            self.backend.delete_employee(name)
+        for index in (self._intervals, self._availability):
+            if index is not None:
+                index.remove(name)
+
+    def get_holidays(self):
+        return self.backend.get_holidays()
+
+    # Add a holiday date and persist the change
+    def add_holiday(self, date):
+        with self.backend.locked():
+            self.refresh()
+            self.backend.add_holiday(date)
+        if self._holidays is not None:
+            self._holidays.add(date)
+        if self._calendar is not None:
+            self._calendar.add(date)
+
+    # Add several holiday dates as a single commit
+    def add_holidays(self, dates):
+        with self.backend.locked():
+            self.refresh()
+            self.backend.add_holidays(dates)
+        for date in dates:
+            if self._holidays is not None:
+                self._holidays.add(date)
+            if self._calendar is not None:
+                self._calendar.add(date)
+
+    def is_holiday(self, date):
+        day = to_ordinal(date)
+        return day is not None and self.holiday_index().contains(day)
+
+    # Holidays (YYYY-MM-DD) falling inside the inclusive date range
+    def holidays_between(self, start_date, end_date):
+        return [datetime.fromordinal(day).strftime("%Y-%m-%d")
+                for day in self.holiday_index().between(to_ordinal(start_date), to_ordinal(end_date))]
+
+    # Whether the date (YYYY-MM-DD) is a Monday-Friday non-holiday day
+    def is_working_day(self, date):
+        day = to_ordinal(date)
+        return day is not None and self.business_calendar().is_working_day(day)
+
+    # Number of Monday-Friday non-holiday days in the inclusive date range
+    def working_days(self, start_date, end_date):
+        return self.business_calendar().count(to_ordinal(start_date), to_ordinal(end_date))
+
+    # Last day (YYYY-MM-DD) of a leave of the given number of working days from start_date
+    def leave_end_date(self, start_date, days):
+        return datetime.fromordinal(self.business_calendar().end_of(to_ordinal(start_date), days)).strftime("%Y-%m-%d")
+
+    # Positions in the employee's leave_history of Pending/Approved leave overlapping the range
+    def overlapping_leave(self, name, start_date, end_date):
+        return self.interval_index().overlapping(name, to_ordinal(start_date), to_ordinal(end_date))
+
+    # Names of employees on Approved leave on the given date
+    def employees_off_on(self, date):
+        day = to_ordinal(date)
+        return self.interval_index().off_on(day) if day is not None else []
+
+    def interval_index(self):
+        if self._intervals is None:
+            self._intervals = LeaveIntervalIndex()
+            self._intervals.rebuild(self.backend.iter_employees())
+        return self._intervals
+
+    # The index covers today on, or from first (a date ordinal) on if that is earlier;
+    # an index built for later days is rebuilt to cover first
+    def availability_index(self, first=None):
+        if self._availability is None or (first is not None and first < self._availability.first_day):
+            self._availability = AvailabilityIndex()
+            self._availability.rebuild(self.backend.iter_employees(), first)
+        return self._availability
+
+    def holiday_index(self):
+        if self._holidays is None:
+            self._holidays = HolidayIndex()
+            self._holidays.rebuild(self.backend.get_holidays())
+        return self._holidays
+
+    def business_calendar(self):
+        if self._calendar is None:
+            self._calendar = BusinessCalendar()
+            self._calendar.rebuild(self.backend.get_holidays())
+        return self._calendar
+
+    def get_admins(self):
+        return self.backend.get_admins()
+
+    # Store-wide JSON values by key, e.g. the accrual runs already applied
+    def get_meta(self, key, default=None):
+        return self.backend.get_meta(key, default)
+
+    def set_meta(self, key, value):
+        with self.backend.locked():
+            self.refresh()
+            self.backend.set_meta(key, value)
+
+    # Hold the store's write lock across several reads and writes, so no other process
+    # changes it in between (call refresh() first to start from the latest data)
+    def locked(self):
+        return self.backend.locked()
+
+    # Return the positions in leave_history of the employee's Pending requests
+    def pending_requests(self, name):
+        return self.backend.pending_requests(name)
+
+    # Return the names of employees with Pending requests, earliest start date first
+    def pending_employees(self, offset=0, limit=None):
+        return self.backend.pending_employees(offset, limit)
+
+    # Return (start_date, name, position) for Pending requests in start date order
+    def pending_queue(self, offset=0, limit=None):
+        return self.backend.pending_queue(offset, limit)
+
+    # Record an action in the audit log. message is the human-readable text and the
+    # keyword arguments (actor, action, employee, leave_type, start_date, days) are
+    # stored as structured fields.
+    def log_action(self, message, **fields):
+        self.audit.log(message, **fields)
+
+    # Record several actions at once; each record is a dict with "message" plus fields
+    def log_actions(self, records):
+        for record in records:
+            fields = dict(record)
+            self.audit.log(fields.pop("message"), **fields)
+
+    # Catch up with other processes and return the given employees that one of them
+    # changed after this process read them, i.e. whose write would be a conflict
+    def stale_employees(self, names):
+        self.refresh()
+        return [name for name in names if self._changed.get(name, 0) > self._read.get(name, self._generation)]
+
+    # Catch up with other processes (the caller holds the write lock) and refuse to
+    # overwrite employees they changed after this process read them
+    def _check_conflicts(self, names):
+        stale = self.stale_employees(names)
+        if stale:
+            raise ConflictError(f"{', '.join(stale)} changed in another session; reload and try again.")
+
+    # Re-index a changed employee in every index that has been built
+    def _update_indexes(self, name, emp):
+        for index in (self._intervals, self._availability):
+            if index is not None:
+                index.update(name, emp)
+
+
+# Database constructor arguments for the store configured in config.py (engine, file
+# names, journal, snapshot format)
+def database_settings():
+    from config import DB_ENGINE, DB_JOURNAL, DB_COMPACT_THRESHOLD, DB_SNAPSHOT_FORMAT, SNAPSHOT_FILENAME, SQLITE_FILENAME
+    if DB_ENGINE == "sqlite":
+        # Indexed SQLite file, importing the JSON file on first run
+        return {"filename": SQLITE_FILENAME, "engine": "sqlite", "seed_filename": "employees.json"}
+    if DB_SNAPSHOT_FORMAT == "binary":
+        return {"filename": SNAPSHOT_FILENAME, "journal": DB_JOURNAL, "compact_threshold": DB_COMPACT_THRESHOLD,
+                "seed_filename": "employees.json", "binary": True}
+    return {"filename": "employees.json", "journal": DB_JOURNAL, "compact_threshold": DB_COMPACT_THRESHOLD}
+
+# Open the Database configured in config.py
+def open_database(audit=None, progress=None):
+    return Database(audit=audit, progress=progress, **database_settings())
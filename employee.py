@@ -1,5 +1,7 @@
 from datetime import datetime
-from utils import validate_date
+from ledger import open_ledger, set_balances
+from records import APPROVED, CANCELLED, DENIED, PENDING
+from utils import to_ordinal, validate_date
 
 class EmployeeManager:
     def __init__(self, db):
@@ -8,20 +10,24 @@ class EmployeeManager:
 
     def employee_exists(self, name):
         # Check if an employee exists in the database by their name
-        return name in self.db.data.get("employees", {})
+        return self.db.employee_exists(name)
 
     def is_manager(self, name):
         # Determine if a given employee has manager privileges
-        return self.db.data["employees"].get(name, {}).get("is_manager", False)
+        return (self.db.get_employee(name) or {}).get("is_manager", False)
 
     def handle_intent(self, name, intent, entities):
         # Main method to process an employee's request based on intent and extracted entities
 
         # Confirm the employee exists in the system
-        if name not in self.db.data["employees"]:
+        emp = self.db.get_employee(name)
+        if emp is None:
             return "Employee not found in the system."
 
-        emp = self.db.data["employees"][name]
+        # Availability phrases are only a query for managers; anyone else gets the intent
+        # the rest of the phrase asks for ("who is off" also reads as taking leave)
+        if intent == "team_availability" and not emp.get("is_manager", False):
+            intent = entities.get("fallback_intent", "unknown")
 
         if intent == "check_balance":
             # Handle request to check leave balance
@@ -69,8 +75,23 @@ class EmployeeManager:
                 return "Invalid start date format. Use YYYY-MM-DD."
 
             # Check if requested start date falls on a holiday
-            if start_date in self.db.data["holidays"]:
+            if self.db.is_holiday(start_date):
                 return f"{start_date} is a holiday. Choose another date."
+            if not self.db.is_working_day(start_date):
+                return f"{start_date} is a weekend. Choose a working day."
+
+            # Leave counts working days only, so it ends on the num_days-th working day
+            try:
+                end_date = self.db.leave_end_date(start_date, num_days)
+            except ValueError:
+                return "That leave would end too far in the future."
+
+            # Reject requests overlapping the employee's own Pending or Approved leave
+            overlaps = self.db.overlapping_leave(name, start_date, end_date)
+            if overlaps:
+                clash = emp["leave_history"][overlaps[0]]
+                return (f"This overlaps your {clash['status'].lower()} {clash['type']} leave "
+                        f"starting {clash['start_date']}. Choose other dates.")
 
             # Verify if the employee has enough leave balance
             balance = emp.get("leave_balance", {}).get(leave_type, 0)
@@ -83,7 +104,8 @@ class EmployeeManager:
                 "type": leave_type,
                 "days": num_days,
                 "start_date": start_date,
-                "status": "Pending",
+                "end_date": end_date,
+                "status": PENDING,
                 "requested_on": str(datetime.today().date())
             }
 
@@ -93,11 +115,17 @@ class EmployeeManager:
             emp["leave_history"].append(leave_entry)
 
             # Save changes to database and log the action
-            self.db.data["employees"][name] = emp
-            self.db.save()
-            self.db.log_action(f"{name} requested {num_days} {leave_type} leave(s) from {start_date}. Pending approval.")
-
-            return f"{num_days} {leave_type} leave(s) requested from {start_date}. Pending manager approval."
+            self.db.put_employee(name, emp)
+            self.db.log_action(f"{name} requested {num_days} {leave_type} leave(s) from {start_date}. Pending approval.",
+                               actor=name, action="request_leave", employee=name,
+                               leave_type=leave_type, start_date=start_date, days=num_days)
+
+            response = (f"{num_days} {leave_type} leave(s) requested from {start_date} to {end_date}. "
+                        f"Pending manager approval.")
+            holidays = self.db.holidays_between(start_date, end_date)
+            if holidays:
+                response += f" Note: holiday(s) {', '.join(holidays)} within this leave are not counted."
+            return response
 
         elif intent == "cancel_leave":
             # Handle leave cancellation requests
@@ -121,9 +149,9 @@ class EmployeeManager:
             cancelled_any = False
             # Look for matching leave requests with status Approved or Pending to cancel
             for req in history:
-                if req["status"] in ["Approved", "Pending"]:
+                if req["status"] in (APPROVED, PENDING):
                     if req["start_date"] == date and req["type"] == leave_type:
-                        req["status"] = "Cancelled"
+                        req["status"] = CANCELLED
                         # Restore leave days back to employee's balance
                         emp["leave_balance"][req["type"]] += req["days"]
                         cancelled_any = True
@@ -131,88 +159,233 @@ class EmployeeManager:
 
             # If cancellation successful, save and log; otherwise, notify no match found
             if cancelled_any:
-                self.db.data["employees"][name] = emp
-                self.db.save()
-                self.db.log_action(f"{name} cancelled a leave request for {leave_type} starting on {date}.")
+                self.db.put_employee(name, emp)
+                self.db.log_action(f"{name} cancelled a leave request for {leave_type} starting on {date}.",
+                                   actor=name, action="cancel_leave", employee=name,
+                                   leave_type=leave_type, start_date=date)
                 return "Leave cancelled successfully."
             return "No matching leave found to cancel."
 
         elif intent == "view_history":
-            # Display the employee's leave history
-            history = emp.get("leave_history", [])
-            if not history:
+            # Display the employee's leave history. Page 1 is the history in the record;
+            # old closed entries moved to the archive (archive.py) follow from page 2 on,
+            # read from the archive only when asked for ("show my leave history page 2")
+            from archive import archived_count, history_page
+            from config import ARCHIVE_PAGE_SIZE
+            archived = archived_count(emp)
+            if not emp.get("leave_history") and not archived:
                 return "You have no leave history."
+            try:
+                page = max(int(entities.get("page") or 1), 1)
+            except (ValueError, TypeError):
+                page = 1
+            if page == 1:
+                history = emp.get("leave_history", [])
+            else:
+                history = history_page(name, emp, page - 1, ARCHIVE_PAGE_SIZE)
             # Format the leave records for display
-            return "\n".join([
+            lines = [
                 f"{h['type']} leave on {h['start_date']} for {h['days']} day(s) - {h['status']}"
                 for h in history
-            ])
+            ]
+            if page == 1 and archived:
+                lines.append(f"{archived} older closed leave record(s) are archived; ask for history page 2 to see them.")
+            elif page > 1:
+                if not lines:
+                    return f"There is no history page {page}."
+                if (page - 1) * ARCHIVE_PAGE_SIZE < archived:
+                    lines.append(f"Ask for history page {page + 1} to see older records.")
+            return "\n".join(lines)
 
         elif intent == "approve_leave" and self.is_manager(name):
             # Manager approval for leave requests
 
             target = entities.get("employee_name")
+            emp_target = self.db.get_employee(target) if target else None
             # Check if target employee exists
-            if not target or target not in self.db.data["employees"]:
+            if emp_target is None:
                 return "Employee not found."
 
-            emp_target = self.db.data["employees"][target]
-            # Filter for pending leave requests for the target employee
-            pending = [l for l in emp_target.get("leave_history", []) if l["status"] == "Pending"]
+            # Look up pending leave requests for the target employee
+            pending = [emp_target["leave_history"][i] for i in self.db.pending_requests(target)]
 
             # No pending requests means nothing to approve
             if not pending:
                 return "No pending requests for this employee."
 
             # Approve all pending requests
+            decided_on = str(datetime.today().date())
             for req in pending:
-                req["status"] = "Approved"
+                req["status"] = APPROVED
+                req["decided_on"] = decided_on
 
             # Save changes and log approval action
-            self.db.save()
-            self.db.log_action(f"{name} approved all pending leaves for {target}.")
+            self.db.put_employee(target, emp_target)
+            self.db.log_action(f"{name} approved all pending leaves for {target}.",
+                               actor=name, action="approve_all", employee=target)
             return f"All pending leaves for {target} have been approved."
 
+        elif intent == "team_availability":
+            # Manager view of how many people are off over the coming weeks
+            days = entities.get("num_days") or 90
+            try:
+                days = min(max(int(days), 1), 365)
+            except (ValueError, TypeError):
+                days = 90
+            busy = [(day, off) for day, off in self.team_availability(days) if off]
+            if not busy:
+                return f"Nobody is on leave in the next {days} days."
+            total = len(self.db.availability_index())
+            response_lines = [f"Employees off in the next {days} days (team of {total}):"]
+            for day, off in busy:
+                response_lines.append(f"- {day}: {off} off")
+            return "\n".join(response_lines)
+
         # Return default message if intent not recognized
         return "Sorry, I didn't understand that."
 
-    def add_employee(self, name, leave_balances, is_manager=False):
+    def decide_leaves(self, decisions=None, decision=None, leave_type=None, max_days=None, employee=None, actor="Admin"):
+        # Approve or deny many Pending requests in one go.
+        # decisions is a list of {"employee", "position", "decision"} dicts, where position is the
+        # request's index in leave_history and decision is "approve" or "deny". An optional
+        # "start_date" finds the request again if archiving moved it to another position. Without decisions,
+        # the given decision is applied to every Pending request matching the filters
+        # (leave_type, max_days inclusive, employee). Denial refunds are summed in one pass, then
+        # all changed employees are saved with a single commit and logged with a single write.
+        # Records _matching_pending already read are decided in place instead of read again
+        loaded = {}
+        if decisions is None:
+            decisions, loaded = self._matching_pending(decision, leave_type, max_days, employee)
+
+        changed = {}
+        refunds = {}
+        log_records = []
+        decided_on = str(datetime.today().date())
+        approved = denied = skipped = 0
+        for item in decisions:
+            name = item["employee"]
+            emp = changed.get(name) or loaded.get(name) or self.db.get_employee(name)
+            history = emp.get("leave_history", []) if emp else []
+            pos = item.get("position")
+            start = item.get("start_date")
+            if start is not None and not (pos is not None and 0 <= pos < len(history)
+                                          and history[pos]["start_date"] == start):
+                pos = next((i for i, req in enumerate(history)
+                            if req["status"] == PENDING and req["start_date"] == start), None)
+            if pos is None or not 0 <= pos < len(history) or history[pos]["status"] != PENDING:
+                skipped += 1
+                continue
+            req = history[pos]
+            if item["decision"] == "approve":
+                req["status"] = APPROVED
+                approved += 1
+                verb = "approved"
+            elif item["decision"] == "deny":
+                req["status"] = DENIED
+                refunds[(name, req["type"])] = refunds.get((name, req["type"]), 0) + req["days"]
+                denied += 1
+                verb = "denied"
+            else:
+                skipped += 1
+                continue
+            req["decided_on"] = decided_on
+            changed[name] = emp
+            log_records.append({
+                "message": f"{actor} {verb} {req['days']} {req['type']} leave(s) for {name} starting {req['start_date']}.",
+                "actor": actor, "action": item["decision"], "employee": name,
+                "leave_type": req["type"], "start_date": req["start_date"], "days": req["days"]
+            })
+
+        # Refund denied days back to each employee's balance
+        for (name, ltype), days in refunds.items():
+            balances = changed[name].setdefault("leave_balance", {})
+            balances[ltype] = balances.get(ltype, 0) + days
+
+        # Save all changes at once and log every decision in one write
+        if changed:
+            self.db.put_employees(changed)
+            self.db.log_actions(log_records)
+        return f"{approved} request(s) approved, {denied} denied (balance refunded), {skipped} skipped."
+
+    def _matching_pending(self, decision, leave_type=None, max_days=None, employee=None):
+        # Build decision dicts for every Pending request matching the filters. Returns them
+        # with the employee records read to find them ({name: record})
+        if employee is not None:
+            keys = [(None, employee, pos) for pos in self.db.pending_requests(employee)]
+        else:
+            keys = self.db.pending_queue()
+        employees = {}
+        decisions = []
+        for _, name, pos in keys:
+            if name not in employees:
+                employees[name] = self.db.get_employee(name)
+            req = employees[name]["leave_history"][pos]
+            if leave_type and req["type"] != leave_type:
+                continue
+            if max_days is not None and req["days"] > max_days:
+                continue
+            decisions.append({"employee": name, "position": pos, "start_date": req["start_date"], "decision": decision})
+        return decisions, employees
+
+    def team_availability(self, days=90, start_date=None):
+        # Number of employees off (Approved or Pending leave) per day for the next days
+        # days, as a list of (YYYY-MM-DD, headcount off) starting at start_date or today
+        first = to_ordinal(start_date) if start_date else datetime.today().toordinal()
+        counts = self.db.availability_index(first).headcount_off(first, days)
+        return [(datetime.fromordinal(first + i).strftime("%Y-%m-%d"), off) for i, off in enumerate(counts)]
+
+    def find_available_range(self, min_available, length, start_date=None, horizon=365):
+        # First (start, end) dates of length consecutive days on which at least
+        # min_available employees are not on leave, or None within horizon days
+        first = to_ordinal(start_date) if start_date else datetime.today().toordinal()
+        found = self.db.availability_index(first).first_available_range(min_available, length, first, horizon)
+        if found is None:
+            return None
+        return (datetime.fromordinal(found).strftime("%Y-%m-%d"),
+                datetime.fromordinal(found + length - 1).strftime("%Y-%m-%d"))
+
+    def who_is_off(self, date):
+        # Names of employees on approved leave on the given date (YYYY-MM-DD)
+        return self.db.employees_off_on(date)
+
+    def add_employee(self, name, leave_balances, is_manager=False, actor="Admin"):
         # Add a new employee record with leave balances and optional manager status
-        if name in self.db.data["employees"]:
+        if self.db.employee_exists(name):
             return "Employee already exists."
-        self.db.data["employees"][name] = {
+        emp = {
             "leave_balance": leave_balances,
             "is_manager": is_manager,
             "leave_history": []
         }
+        open_ledger(emp)  # The initial balances are the opening grants
         # Save changes and log the addition
-        self.db.save()
-        self.db.log_action(f"Admin added new employee {name}.")
+        self.db.put_employee(name, emp)
+        self.db.log_action(f"Admin added employee {name} (Manager: {is_manager}) with leave balances {leave_balances}.",
+                           actor=actor, action="add_employee", employee=name)
         return f"Employee {name} added successfully."
 
-    def edit_employee(self, name, leave_balances=None, is_manager=None):
+    def edit_employee(self, name, leave_balances=None, is_manager=None, actor="Admin"):
         # Edit existing employee's leave balances and/or manager status
-        if name not in self.db.data["employees"]:
+        emp = self.db.get_employee(name)
+        if emp is None:
             return "Employee not found."
-        emp = self.db.data["employees"][name]
 
         if leave_balances is not None:
-            emp["leave_balance"] = leave_balances
+            set_balances(emp, leave_balances, "edit")  # Recorded in the ledger as grants
         if is_manager is not None:
             emp["is_manager"] = is_manager
 
         # Save changes and log the edit
-        self.db.data["employees"][name] = emp
-        self.db.save()
-        self.db.log_action(f"Admin edited employee {name}.")
+        self.db.put_employee(name, emp)
+        self.db.log_action(f"Admin edited employee {name} with leave balances {leave_balances}. Manager status: {is_manager}.",
+                           actor=actor, action="edit_employee", employee=name)
         return f"Employee {name} updated successfully."
 
-    def add_holiday(self, date):
+    def add_holiday(self, date, actor="Admin"):
         # Add a new holiday date to the system to block leave requests on that date
-        if date in self.db.data["holidays"]:
+        if date in self.db.get_holidays():
             return "Holiday already exists."
-        self.db.data["holidays"].append(date)
         # Save changes and log the new holiday
-        self.db.save()
-        self.db.log_action(f"Admin added holiday {date}.")
+        self.db.add_holiday(date)
+        self.db.log_action(f"Admin added holiday {date}.", actor=actor, action="add_holiday", date=date)
         return f"Holiday {date} added."
@@ -0,0 +1,190 @@
+from bisect import bisect_left, bisect_right, insort
+from records import APPROVED, PENDING
+from utils import leave_span, to_ordinal
+
+class PendingIndex:
+    # In-memory index of Pending leave requests, keyed by employee and by start date.
+    # Every Pending request has one (start_date, name, position) key, where position is
+    # its place in the employee's leave_history. by_employee holds each employee's keys
+    # in history order and by_date holds all keys sorted, so the approval queue can be
+    # read and paged without touching any leave history.
+    def __init__(self):
+        self.by_employee = {}
+        self.by_date = []
+
+    def __len__(self):
+        return len(self.by_date)
+
+    # Rebuild the whole index from (name, record) pairs
+    def rebuild(self, employees):
+        self.by_employee = {}
+        for name, emp in employees:
+            keys = self._pending_keys(name, emp)
+            if keys:
+                self.by_employee[name] = keys
+        self.by_date = sorted(key for keys in self.by_employee.values() for key in keys)
+
+    # Re-index one employee after its record changed
+    def update(self, name, emp):
+        self.remove(name)
+        keys = self._pending_keys(name, emp)
+        if keys:
+            self.by_employee[name] = keys
+            for key in keys:
+                insort(self.by_date, key)
+
+    # Drop every key belonging to one employee
+    def remove(self, name):
+        for key in self.by_employee.pop(name, []):
+            idx = bisect_left(self.by_date, key)
+            if idx < len(self.by_date) and self.by_date[idx] == key:
+                del self.by_date[idx]
+
+    # Positions in leave_history of the employee's Pending requests
+    def positions(self, name):
+        return [key[2] for key in self.by_employee.get(name, [])]
+
+    # Names with Pending requests, ordered by their earliest pending start date
+    def employees(self, offset=0, limit=None):
+        names = []
+        seen = set()
+        for _, name, _ in self.by_date:
+            if name in seen:
+                continue
+            seen.add(name)
+            names.append(name)
+            if limit is not None and len(names) >= offset + limit:
+                break
+        return names[offset:]
+
+    # (start_date, name, position) keys in start date order
+    def page(self, offset=0, limit=None):
+        end = None if limit is None else offset + limit
+        return self.by_date[offset:end]
+
+    @staticmethod
+    def _pending_keys(name, emp):
+        return [(entry.get("start_date") or "", name, i)
+                for i, entry in enumerate(emp.get("leave_history", []))
+                if entry.get("status") == PENDING]
+
+
+class LeaveIntervalIndex:
+    # In-memory interval index over Pending and Approved leave spans.
+    # Spans are inclusive (first_day, last_day) date ordinals (see utils.leave_span).
+    # Each employee's spans are kept sorted by first day together with a running maximum
+    # of last days, so "does [a, b] overlap any of this employee's leave" is one bisect:
+    # among the spans starting on or before b, the latest ending one decides. All
+    # Approved spans are also kept in one list sorted by first day; because no span is
+    # longer than max_length days, the employees off on a date are found by bisecting
+    # to the window of spans that start within max_length days before it.
+    STATUSES = (PENDING, APPROVED)
+
+    def __init__(self):
+        self.by_employee = {}
+        self.approved = []
+        self.max_length = 1
+
+    # Rebuild the whole index from (name, record) pairs
+    def rebuild(self, employees):
+        self.by_employee = {}
+        self.approved = []
+        for name, emp in employees:
+            self._add(name, emp)
+        self.approved.sort()
+
+    # Re-index one employee after its record changed
+    def update(self, name, emp):
+        self.remove(name)
+        self._add(name, emp, keep_sorted=True)
+
+    # Drop every span belonging to one employee
+    def remove(self, name):
+        entry = self.by_employee.pop(name, None)
+        if entry is None:
+            return
+        for span in entry[0]:
+            if span[3] != APPROVED:
+                continue
+            key = (span[0], span[1], name, span[2])
+            idx = bisect_left(self.approved, key)
+            if idx < len(self.approved) and self.approved[idx] == key:
+                del self.approved[idx]
+
+    # Positions in leave_history of the employee's Pending/Approved leave overlapping
+    # the inclusive ordinal range [first, last]
+    def overlapping(self, name, first, last):
+        entry = self.by_employee.get(name)
+        if entry is None:
+            return []
+        spans, starts, max_ends = entry
+        idx = bisect_right(starts, last)
+        found = []
+        # Walk back only while some earlier span still reaches the range
+        while idx > 0 and max_ends[idx - 1] >= first:
+            idx -= 1
+            if spans[idx][1] >= first:
+                found.append(spans[idx][2])
+        return sorted(found)
+
+    # Names of employees with Approved leave covering the date ordinal
+    def off_on(self, day):
+        lo = bisect_left(self.approved, (day - self.max_length + 1,))
+        hi = bisect_right(self.approved, (day, float("inf")))
+        return sorted({name for _, last, name, _ in self.approved[lo:hi] if last >= day})
+
+    def _add(self, name, emp, keep_sorted=False):
+        spans = []
+        for i, entry in enumerate(emp.get("leave_history", [])):
+            if entry.get("status") not in self.STATUSES:
+                continue
+            span = leave_span(entry)
+            if span is None:
+                continue
+            spans.append((span[0], span[1], i, entry["status"]))
+            self.max_length = max(self.max_length, span[1] - span[0] + 1)
+            if entry["status"] == APPROVED:
+                key = (span[0], span[1], name, i)
+                if keep_sorted:
+                    insort(self.approved, key)
+                else:
+                    self.approved.append(key)
+        if not spans:
+            return
+        spans.sort()
+        max_ends = []
+        latest = spans[0][1]
+        for span in spans:
+            latest = max(latest, span[1])
+            max_ends.append(latest)
+        self.by_employee[name] = (spans, [span[0] for span in spans], max_ends)
+
+
+class HolidayIndex:
+    # Sorted date ordinals of the holidays, so membership and holidays inside a span
+    # are bisects (working-day counts live in business_calendar.py). Unparseable
+    # holiday strings are ignored.
+    def __init__(self):
+        self.days = []
+
+    def rebuild(self, holidays):
+        self.days = []
+        for holiday in holidays:
+            self.add(holiday)
+
+    def add(self, holiday):
+        day = to_ordinal(holiday)
+        if day is None:
+            return
+        idx = bisect_left(self.days, day)
+        if idx < len(self.days) and self.days[idx] == day:
+            return
+        self.days.insert(idx, day)
+
+    def contains(self, day):
+        idx = bisect_left(self.days, day)
+        return idx < len(self.days) and self.days[idx] == day
+
+    # Holiday ordinals inside the inclusive range [first, last]
+    def between(self, first, last):
+        return self.days[bisect_left(self.days, first):bisect_right(self.days, last)]
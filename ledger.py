@@ -0,0 +1,235 @@
+import argparse
+import os
+import sys
+from datetime import date
+from records import APPROVED, GRANTS_KEY, PENDING
+from reporting import format_table, write_csv
+
+# Balance ledger. Every employee record carries "leave_grants", a list of
+# {"type", "days", "date", "reason"} events for everything that adds to or takes from a
+# balance other than leave itself: the opening balance, admin edits, accrual grants,
+# carry-over caps and expiry. leave_balance is the materialized view of the ledger,
+# kept up to date event by event:
+#
+#   leave_balance[type] == sum of the type's grants - days of its Pending/Approved leave
+#
+# request_leave, cancellations and denials keep this true by adjusting the balance
+# together with the leave status; every other balance change goes through
+# set_balance/set_balances so it is recorded as a grant. check() recomputes every
+# balance from the ledger in parallel and reports where the stored value differs.
+
+CONSUMING = (PENDING, APPROVED)
+
+
+# Start the ledger of an employee without one: one "opening" grant per leave type,
+# equal to the current balance plus the leave already taken against it, so the
+# current balance is what the ledger yields
+def open_ledger(emp, on=None):
+    if GRANTS_KEY in emp:
+        return
+    emp[GRANTS_KEY] = _opening_grants(emp, on or date.today().isoformat())
+
+def record_grant(emp, leave_type, days, reason, on=None):
+    open_ledger(emp, on)
+    if days:
+        emp[GRANTS_KEY].append({"type": leave_type, "days": days, "date": on or date.today().isoformat(),
+                                "reason": reason})
+
+# Set one balance, recording the difference as a grant
+def set_balance(emp, leave_type, balance, reason, on=None):
+    open_ledger(emp, on)
+    balances = emp.setdefault("leave_balance", {})
+    record_grant(emp, leave_type, balance - balances.get(leave_type, 0), reason, on)
+    balances[leave_type] = balance
+
+# Replace all balances ({leave_type: days}); types left out go to zero and are dropped
+def set_balances(emp, balances, reason, on=None):
+    open_ledger(emp, on)
+    current = emp.get("leave_balance", {})
+    for ltype in set(current) | set(balances):
+        record_grant(emp, ltype, balances.get(ltype, 0) - current.get(ltype, 0), reason, on)
+    emp["leave_balance"] = dict(balances)
+
+# Set several balances ({leave_type: days}, other types are kept) like set_balance, but
+# return the partial change for Database.update_employees instead of changing emp:
+# {"leave_balance": all balances, "leave_grants": the grants to append}
+def balance_change(emp, balances, reason, on=None):
+    on = on or date.today().isoformat()
+    current = emp.get("leave_balance", {})
+    grants = [] if GRANTS_KEY in emp else _opening_grants(emp, on)
+    for ltype, days in balances.items():
+        if days != current.get(ltype, 0):
+            grants.append({"type": ltype, "days": days - current.get(ltype, 0), "date": on, "reason": reason})
+    return {"leave_balance": {**current, **balances}, GRANTS_KEY: grants}
+
+
+def _opening_grants(emp, on):
+    totals = dict(emp.get("leave_balance", {}))
+    for ltype, days in _consumed(emp).items():
+        totals[ltype] = totals.get(ltype, 0) + days
+    return [{"type": ltype, "days": days, "date": on, "reason": "opening"} for ltype, days in totals.items() if days]
+
+
+def _consumed(emp):
+    consumed = {}
+    for entry in emp.get("leave_history", []):
+        days = entry.get("days")
+        if entry.get("status") in CONSUMING and isinstance(days, int):
+            consumed[entry.get("type")] = consumed.get(entry.get("type"), 0) + days
+    return consumed
+
+# Balances the ledger yields, or None if the employee has no ledger yet
+def expected_balances(emp):
+    grants = emp.get(GRANTS_KEY)
+    if grants is None:
+        return None
+    expected = {}
+    for grant in grants:
+        expected[grant["type"]] = expected.get(grant["type"], 0) + grant["days"]
+    for ltype, days in _consumed(emp).items():
+        expected[ltype] = expected.get(ltype, 0) - days
+    return expected
+
+# (leave_type, stored, expected) for every balance that differs from the ledger
+def mismatches(emp):
+    expected = expected_balances(emp)
+    if expected is None:
+        return None
+    stored = emp.get("leave_balance", {})
+    return [(ltype, stored.get(ltype, 0), expected.get(ltype, 0))
+            for ltype in sorted(set(stored) | set(expected)) if stored.get(ltype, 0) != expected.get(ltype, 0)]
+
+
+class CheckResult:
+    def __init__(self):
+        self.checked = 0
+        self.without_ledger = []
+        self.mismatches = []
+
+    def merge(self, other):
+        self.checked += other.checked
+        self.without_ledger.extend(other.without_ledger)
+        self.mismatches.extend(other.mismatches)
+
+    def rows(self):
+        return [{"employee": name, "leave_type": ltype, "stored": stored, "expected": expected,
+                 "drift": stored - expected} for name, ltype, stored, expected in self.mismatches]
+
+    def summary(self):
+        return (f"{self.checked} employee(s) checked: {len(self.mismatches)} mismatched balance(s), "
+                f"{len(self.without_ledger)} employee(s) without a ledger.")
+
+
+# Check every shards-th employee starting at shard. Runs in a worker process, which
+# opens the store itself: the JSON engine only parses the employees it is given.
+def _check_shard(settings, shard, shards):
+    from database import Database
+    db = Database(**settings)
+    result = CheckResult()
+    try:
+        for name, emp in db.iter_employees(db.employee_names()[shard::shards]):
+            found = mismatches(emp)
+            result.checked += 1
+            if found is None:
+                result.without_ledger.append(name)
+            else:
+                result.mismatches.extend((name,) + m for m in found)
+    finally:
+        db.close()
+    return result
+
+# Recompute every balance from its ledger, split over workers processes
+def check(settings, workers=None):
+    workers = workers or os.cpu_count() or 1
+    result = CheckResult()
+    if workers == 1:
+        result.merge(_check_shard(settings, 0, 1))
+        return result
+    from concurrent.futures import ProcessPoolExecutor  # Only the checker needs it
+    with ProcessPoolExecutor(workers) as pool:
+        for part in pool.map(_check_shard, [settings] * workers, range(workers), [workers] * workers):
+            result.merge(part)
+    return result
+
+
+# Open a ledger for the named employees (default: everyone without one) in one commit
+def bootstrap(db, names=None, actor="Admin"):
+    with db.locked():
+        db.refresh()
+        changed = {}
+        for name in names if names is not None else db.employee_names():
+            emp = db.get_employee(name)
+            if emp is not None and GRANTS_KEY not in emp:
+                open_ledger(emp)
+                changed[name] = emp
+        db.put_employees(changed)
+    if changed:
+        db.log_action(f"{actor} opened the balance ledger of {len(changed)} employee(s).", actor=actor,
+                      action="ledger_bootstrap")
+    return len(changed)
+
+# Reset the named employees' stored balances to what their ledger yields, in one commit
+def fix(db, names, actor="Admin"):
+    with db.locked():
+        db.refresh()
+        changed = {}
+        log_records = []
+        for name in names:
+            emp = db.get_employee(name)
+            found = mismatches(emp) if emp is not None else None
+            if not found:
+                continue
+            for ltype, stored, expected in found:
+                emp["leave_balance"][ltype] = expected
+                log_records.append({"message": f"{actor} corrected {name}'s {ltype} balance from {stored} to {expected}.",
+                                    "actor": actor, "action": "ledger_fix", "employee": name, "leave_type": ltype})
+            changed[name] = emp
+        db.put_employees(changed)
+    db.log_actions(log_records)
+    return len(changed)
+
+
+def main(argv=None):
+    from database import database_settings, open_database
+
+    parser = argparse.ArgumentParser(description="Check leave balances against the balance ledger.")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--csv", metavar="FILE", help="write every mismatch as CSV ('-' for stdout)")
+    parser.add_argument("--bootstrap", action="store_true",
+                        help="open a ledger from the current balances for employees without one")
+    parser.add_argument("--fix", action="store_true", help="reset mismatched balances to the ledger's value")
+    parser.add_argument("--actor", default="Admin", help="name recorded in the audit log")
+    args = parser.parse_args(argv)
+
+    settings = database_settings()
+    if args.bootstrap:
+        db = open_database()
+        try:
+            print(f"Opened the ledger of {bootstrap(db, actor=args.actor)} employee(s).")
+        finally:
+            db.close()
+
+    result = check(settings, args.workers)
+    rows = result.rows()
+    if args.csv == "-":
+        write_csv(rows, sys.stdout)
+        return
+    if args.csv:
+        write_csv(rows, args.csv)
+    elif rows:
+        print(format_table(rows[:20]))
+        if len(rows) > 20:
+            print(f"... and {len(rows) - 20} more (use --csv for all)")
+    print(result.summary())
+
+    if args.fix and result.mismatches:
+        db = open_database()
+        try:
+            fixed = fix(db, sorted({name for name, _, _, _ in result.mismatches}), actor=args.actor)
+        finally:
+            db.close()
+        print(f"Corrected the balances of {fixed} employee(s).")
+
+
+if __name__ == "__main__":
+    main()
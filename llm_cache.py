@@ -0,0 +1,156 @@
+import json
+import sqlite3
+import threading
+import time
+
+class LLMResponseCache:
+    # Disk-backed cache of AI extraction results: normalized utterance -> (intent, entities).
+    # Entries expire after ttl seconds, and once the stored entries exceed max_bytes the
+    # least recently used ones are evicted. Hit/miss counts and the tokens saved by hits
+    # are persisted alongside the entries so they survive restarts.
+    #
+    # A start_date is never stored as a resolved date. The caller passes a resolver
+    # (utterance -> (found, date)) that understands the date phrasing in the utterance;
+    # such entries are stored without start_date and re-resolved on every hit, so
+    # "tomorrow" always means tomorrow. Results whose start_date the resolver cannot
+    # reproduce are not cached at all.
+    #
+    # The cache may be used from worker threads (the async AI path reads it off the
+    # event loop), so the connection is shared across threads behind a lock.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            intent TEXT NOT NULL,
+            entities TEXT NOT NULL,
+            has_date INTEGER NOT NULL,
+            tokens INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used);
+        CREATE INDEX IF NOT EXISTS idx_responses_created ON responses (created);
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, filename, date_resolver, ttl=7 * 24 * 3600, max_bytes=10 * 1024 * 1024):
+        self.filename = filename
+        self.date_resolver = date_resolver
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.executescript(self.SCHEMA)
+        # Running total of stored entry sizes, so eviction does not re-sum the table
+        self._bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    # Normalize an utterance into a cache key (case and whitespace insensitive)
+    @staticmethod
+    def normalize(utterance):
+        return " ".join(utterance.lower().split())
+
+    # Return (intent, entities) for a cached utterance, or None on a miss
+    def get(self, utterance):
+        with self._lock:
+            key = self.normalize(utterance)
+            row = self.conn.execute(
+                "SELECT intent, entities, has_date, tokens, created FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or now - row[4] > self.ttl:
+                self._bump("misses")
+                return None
+            intent, entities, has_date, tokens, _ = row
+            entities = json.loads(entities)
+            if has_date:
+                found, date = self.date_resolver(key)
+                if not found:
+                    self._bump("misses")
+                    return None
+                entities["start_date"] = date.strftime("%Y-%m-%d") if date else None
+            with self.conn:
+                self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self._bump("hits", commit=False)
+                self._bump("tokens_saved", tokens, commit=False)
+            return intent, entities
+
+    # Store an AI result for an utterance; tokens is the usage the call cost
+    def put(self, utterance, intent, entities, tokens=0):
+        with self._lock:
+            key = self.normalize(utterance)
+            entities = dict(entities)
+            has_date = 0
+            if entities.get("start_date"):
+                found, _ = self.date_resolver(key)
+                if not found:
+                    # The date came from a phrasing we cannot re-resolve later, so do not cache it
+                    return False
+                entities.pop("start_date")
+                has_date = 1
+            payload = json.dumps(entities)
+            size = len(key) + len(intent) + len(payload)
+            now = time.time()
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, intent, entities, has_date, tokens, size, created, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, intent, payload, has_date, tokens or 0, size, now, now))
+                self._bytes += size - (old[0] if old else 0)
+                self._evict()
+            return True
+
+    # Hit/miss counters, hit rate and tokens saved by cache hits
+    def stats(self):
+        with self._lock:
+            counters = dict(self.conn.execute("SELECT name, value FROM counters"))
+            hits = counters.get("hits", 0)
+            misses = counters.get("misses", 0)
+            entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "tokens_saved": counters.get("tokens_saved", 0),
+                "entries": entries,
+                "bytes": self._bytes,
+            }
+
+    # Remove every cached entry and reset the counters
+    def clear(self):
+        with self._lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM responses")
+                self.conn.execute("DELETE FROM counters")
+            self._bytes = 0
+
+    def close(self):
+        self.conn.close()
+
+    # Drop expired entries, then the least recently used ones until under max_bytes
+    def _evict(self):
+        cutoff = time.time() - self.ttl
+        expired = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses WHERE created < ?", (cutoff,)).fetchone()[0]
+        if expired:
+            self.conn.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+            self._bytes -= expired
+        if self._bytes <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            victims.append((key,))
+            self._bytes -= size
+            if self._bytes <= self.max_bytes:
+                break
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def _bump(self, name, amount=1, commit=True):
+        sql = ("INSERT INTO counters (name, value) VALUES (?, ?) "
+               "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value")
+        if commit:
+            with self.conn:
+                self.conn.execute(sql, (name, amount))
+        else:
+            self.conn.execute(sql, (name, amount))
@@ -1,14 +1,22 @@
 from employee import EmployeeManager
-from ai import process_input
-from database import Database
+from database import ConflictError, open_database
 from admin import admin_mode  
+from audit import AuditLogger
+from config import AUDIT_LOG_FILE, AUDIT_FLUSH_INTERVAL, AUDIT_MAX_BYTES, AUDIT_BACKUP_COUNT
+
+def show_progress(done, total):
+    # Progress line for loading large data files; small files load too fast to need one
+    if total >= 10 * 1024 * 1024:
+        print(f"\rLoading data... {done * 100 // total}%", end="\n" if done >= total else "", flush=True)
 
 def main():
     print("Welcome to the Leave Management System!")  
-    db = Database("employees.json")  # Load employee data from JSON file
+    audit = AuditLogger(AUDIT_LOG_FILE, max_bytes=AUDIT_MAX_BYTES, flush_interval=AUDIT_FLUSH_INTERVAL,
+                        backup_count=AUDIT_BACKUP_COUNT)  # Buffered audit log, flushed in the background and on exit
+    db = open_database(audit=audit, progress=show_progress)  # Load employee data with the engine chosen in config.py
     emp_manager = EmployeeManager(db)  # Initialize employee manager with database
 
-    admins = db.data.get("admins", ["AdminUser"])  # Get list of admins, default to ["AdminUser"]
+    admins = db.get_admins()  # Get list of admins, default to ["AdminUser"]
     
     while True:
         user_type = input("Are you an 'admin' or 'user'? (type 'quit' to exit): ").strip().lower()  
@@ -16,6 +24,7 @@ def main():
         
         if user_type in ['quit', 'exit']:  # Exit program on 'quit' or 'exit'
             print("Exiting the system. Goodbye!")
+            db.close()
             break
         
         if user_type not in ["admin", "user"]:  # Validate input
@@ -28,13 +37,15 @@ def main():
             if name not in admins:  # Check if name is in admins list
                 print("Admin not found. Try again.")
                 continue
-            admin_mode(emp_manager, db)  # Enter admin mode if valid admin
+            admin_mode(emp_manager, db, actor=name)  # Enter admin mode if valid admin
 
         elif user_type == "user":
             if not emp_manager.employee_exists(name):  # Check if user exists
                 print("User not found. Try again.")
                 continue
 
+            from ai import process_input  # Imported on first user login so admin-only sessions skip it
+
             print(f"\nHello {name}! You are now logged in.")  # Greeting message
             print("Type your request. Type 'quit' to log out and return to main menu.")
 
@@ -45,7 +56,10 @@ def main():
                     break
 
                 intent, entities = process_input(user_input)  # Extract intent and entities using AI
-                response = emp_manager.handle_intent(name, intent, entities)  # Process intent via EmployeeManager
+                try:
+                    response = emp_manager.handle_intent(name, intent, entities)  # Process intent via EmployeeManager
+                except ConflictError as e:
+                    response = str(e)  # Another session changed the record first; nothing was saved
                 print(response)  # Output the response
 
 
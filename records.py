@@ -0,0 +1,203 @@
+import copy
+import sys
+from datetime import date
+
+# Leave statuses and types. They are interned, so every record shares one string
+# object per value and comparisons against these constants are cheap.
+PENDING = sys.intern("Pending")
+APPROVED = sys.intern("Approved")
+DENIED = sys.intern("Denied")
+CANCELLED = sys.intern("Cancelled")
+STATUSES = (PENDING, APPROVED, DENIED, CANCELLED)
+
+SICK_LEAVE = sys.intern("Sick Leave")
+ANNUAL_LEAVE = sys.intern("Annual Leave")
+MATERNITY_LEAVE = sys.intern("Maternity Leave")
+LEAVE_TYPES = (SICK_LEAVE, ANNUAL_LEAVE, MATERNITY_LEAVE)
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+# YYYY-MM-DD strings are kept as date ordinals; anything else is kept as given so
+# that writing the record back reproduces the original value. The same dates recur
+# across records, so each one is converted once in either direction.
+_ordinals = {}
+_isodates = {}
+
+def _date_in(value):
+    if not isinstance(value, str):
+        return value
+    day = _ordinals.get(value)
+    if day is None:
+        if len(value) != 10 or value[4] != "-" or value[7] != "-":
+            return value
+        try:
+            day = _ordinals[value] = date.fromisoformat(value).toordinal()
+        except ValueError:
+            return value
+    return day
+
+def _date_out(value):
+    if not isinstance(value, int):
+        return value
+    text = _isodates.get(value)
+    if text is None:
+        text = _isodates[value] = date.fromordinal(value).isoformat()
+    return text
+
+
+class LeaveRecord:
+    # One leave_history entry. Dates are ordinals, status and type are interned
+    # strings, and keys this class does not know are kept in extra so they survive a
+    # round trip through from_dict/to_dict.
+    __slots__ = ("type", "days", "start", "status", "requested", "decided", "end", "extra")
+
+    def __init__(self, type, days, start, status, requested=None, decided=None, end=None, extra=None):
+        self.type = type
+        self.days = days
+        self.start = start
+        self.status = status
+        self.requested = requested
+        self.decided = decided
+        self.end = end
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, entry):
+        extra = None
+        if not entry.keys() <= _LEAVE_KEYS:
+            extra = {k: copy.deepcopy(v) for k, v in entry.items() if k not in _LEAVE_KEYS}
+        return cls(_intern(entry.get("type")), entry.get("days"), _date_in(entry.get("start_date")),
+                   _intern(entry.get("status")), _date_in(entry.get("requested_on")),
+                   _date_in(entry.get("decided_on")), _date_in(entry.get("end_date")), extra or None)
+
+    # The entry as stored in employees.json
+    def to_dict(self):
+        entry = {
+            "type": self.type,
+            "days": self.days,
+            "start_date": _date_out(self.start),
+            "status": self.status,
+        }
+        if self.requested is not None:
+            entry["requested_on"] = _date_out(self.requested)
+        if self.decided is not None:
+            entry["decided_on"] = _date_out(self.decided)
+        if self.end is not None:
+            entry["end_date"] = _date_out(self.end)
+        if self.extra:
+            entry.update(copy.deepcopy(self.extra))
+        return entry
+
+_LEAVE_KEYS = frozenset(("type", "days", "start_date", "status", "requested_on", "decided_on", "end_date"))
+
+
+class EmployeeRecord:
+    # One employee: balances per leave type, manager flag, LeaveRecord history and the
+    # balance ledger (see ledger.py). is_manager is None when the stored record has no
+    # such key. The ledger's grants are held as immutable (type, days, date, reason)
+    # tuples, with the date as an ordinal, so records are copied in and out without
+    # deep-copying them; leave_grants is None when the record has no ledger. A ledger
+    # with grants of any other shape, and all unknown keys, are kept in extra, as for
+    # LeaveRecord.
+    __slots__ = ("leave_balance", "is_manager", "leave_history", "leave_grants", "extra")
+
+    def __init__(self, leave_balance, is_manager=None, leave_history=None, extra=None, leave_grants=None):
+        self.leave_balance = leave_balance
+        self.is_manager = is_manager
+        self.leave_history = leave_history if leave_history is not None else []
+        self.leave_grants = leave_grants
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, emp):
+        grants = _grants_in(emp.get(GRANTS_KEY))
+        extra = {k: copy.deepcopy(v) for k, v in emp.items()
+                 if k not in _EMPLOYEE_KEYS and (k != GRANTS_KEY or grants is None)}
+        balances = {_intern(k): v for k, v in emp.get("leave_balance", {}).items()}
+        history = [LeaveRecord.from_dict(entry) for entry in emp.get("leave_history", [])]
+        return cls(balances, emp.get("is_manager"), history, extra or None, grants)
+
+    # The employee as stored in employees.json; the result shares nothing with the record
+    def to_dict(self):
+        emp = {"leave_balance": dict(self.leave_balance)}
+        if self.is_manager is not None:
+            emp["is_manager"] = self.is_manager
+        emp["leave_history"] = [entry.to_dict() for entry in self.leave_history]
+        if self.leave_grants is not None:
+            emp[GRANTS_KEY] = self.grants()
+        if self.extra:
+            emp.update(copy.deepcopy(self.extra))
+        return emp
+
+    # The ledger's grants as the list of dicts stored in employees.json
+    def grants(self):
+        return [{"type": ltype, "days": days, "date": _date_out(on), "reason": reason}
+                for ltype, days, on, reason in self.leave_grants]
+
+    # Apply a partial change (see update_employee): every key replaces the record's
+    # value, except leave_grants, whose grants are appended to the ledger
+    def update(self, changes):
+        for key, value in changes.items():
+            if key == "leave_balance":
+                self.leave_balance = {_intern(k): v for k, v in value.items()}
+            elif key == "is_manager":
+                self.is_manager = value
+            elif key == "leave_history":
+                self.leave_history = [LeaveRecord.from_dict(entry) for entry in value]
+            elif key == GRANTS_KEY:
+                self._add_grants(value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = copy.deepcopy(value)
+
+    def _add_grants(self, grants):
+        added = _grants_in(grants)
+        ledger_in_extra = self.extra is not None and GRANTS_KEY in self.extra
+        if added is not None and not ledger_in_extra:
+            self.leave_grants = (self.leave_grants or ()) + added
+            return
+        # Either side has grants of another shape: keep the whole ledger as dicts
+        ledger = self.grants() if self.leave_grants is not None else (self.extra or {}).get(GRANTS_KEY, [])
+        self.leave_grants = None
+        if self.extra is None:
+            self.extra = {}
+        self.extra[GRANTS_KEY] = ledger + copy.deepcopy(grants)
+
+_EMPLOYEE_KEYS = frozenset(("leave_balance", "is_manager", "leave_history"))
+
+# The same partial change applied to an employee dict
+def update_employee(emp, changes):
+    for key, value in changes.items():
+        if key == GRANTS_KEY:
+            emp.setdefault(GRANTS_KEY, []).extend(_json_copy(value))
+        else:
+            emp[key] = _json_copy(value)
+
+# Copy of a JSON value: several times faster than copy.deepcopy, which has to track
+# shared and cyclic objects that JSON cannot contain
+def _json_copy(value):
+    if isinstance(value, dict):
+        return {k: _json_copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_json_copy(v) for v in value]
+    return value
+
+GRANTS_KEY = "leave_grants"
+_GRANT_KEYS = frozenset(("type", "days", "date", "reason"))
+_SCALARS = (str, int, float, bool, type(None))
+
+# The ledger as a tuple of grant tuples, or None when there is no ledger or a grant is
+# not a {"type", "days", "date", "reason"} dict of plain values
+def _grants_in(grants):
+    if not isinstance(grants, list):
+        return None
+    compact = []
+    for grant in grants:
+        if not (isinstance(grant, dict) and grant.keys() == _GRANT_KEYS and isinstance(grant["date"], str)
+                and isinstance(grant["days"], _SCALARS) and isinstance(grant["type"], _SCALARS)
+                and isinstance(grant["reason"], _SCALARS)):
+            return None
+        compact.append((_intern(grant["type"]), grant["days"], _date_in(grant["date"]), _intern(grant["reason"])))
+    return tuple(compact)
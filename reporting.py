@@ -0,0 +1,244 @@
+import argparse
+import csv
+import sys
+from array import array
+from archive import HISTORY_KEY, iter_batches
+from records import APPROVED, CANCELLED, DENIED, PENDING, STATUSES
+from utils import to_ordinal
+
+class LeaveColumns:
+    # leave_history of every employee loaded into parallel typed arrays in one pass.
+    # Row i of every column describes one leave entry; strings (employee, leave type,
+    # status) are stored as small integer codes into the names/types/statuses lists,
+    # and dates as ordinals (-1 when missing). Month columns hold year * 12 + month - 1
+    # of the request date. Current balances are kept per (employee code, type code).
+    def __init__(self):
+        self.names = []
+        self.types = []
+        self.statuses = []
+        self.employee = array("i")
+        self.leave_type = array("i")
+        self.status = array("i")
+        self.days = array("i")
+        self.start = array("i")
+        self.requested = array("i")
+        self.decided = array("i")
+        self.month = array("i")
+        self.balances = {}
+
+    def __len__(self):
+        return len(self.days)
+
+    # Build the columns from (name, record) pairs, e.g. Database.iter_employees(). With
+    # archive_dir, the entries archive.py moved out of the records into the archive
+    # there are loaded too, so archiving does not change the reports.
+    @classmethod
+    def load(cls, employees, archive_dir=None):
+        cols = cls()
+        type_codes = {}
+        status_codes = {}
+        # Bound appends keep the per-row cost down for large histories
+        add_employee = cols.employee.append
+        add_type = cols.leave_type.append
+        add_status = cols.status.append
+        add_days = cols.days.append
+        add_start = cols.start.append
+        add_requested = cols.requested.append
+        add_decided = cols.decided.append
+        add_month = cols.month.append
+        # Dates repeat a lot across entries, so each distinct string is parsed once
+        ordinals = {None: -1}
+        def ordinal(value):
+            day = ordinals.get(value)
+            if day is None:
+                day = ordinals[value] = to_ordinal(value) or -1
+            return day
+        def add_entries(code, entries):
+            for entry in entries:
+                ltype = entry.get("type")
+                if ltype not in type_codes:
+                    type_codes[ltype] = len(cols.types)
+                    cols.types.append(ltype)
+                status = entry.get("status")
+                if status not in status_codes:
+                    status_codes[status] = len(cols.statuses)
+                    cols.statuses.append(status)
+                requested = entry.get("requested_on")
+                requested_day = ordinal(requested)
+                add_employee(code)
+                add_type(type_codes[ltype])
+                add_status(status_codes[status])
+                add_days(int(entry.get("days") or 0))
+                add_start(ordinal(entry.get("start_date")))
+                add_requested(requested_day)
+                add_decided(ordinal(entry.get("decided_on")))
+                add_month(int(requested[:4]) * 12 + int(requested[5:7]) - 1 if requested_day >= 0 else -1)
+        # Archived entries of every employee, by gzip member: {(year, offset): {name: count}}
+        batches = {}
+        codes = {}
+        for name, emp in employees:
+            code = codes[name] = len(cols.names)
+            cols.names.append(name)
+            for ltype, balance in emp.get("leave_balance", {}).items():
+                if ltype not in type_codes:
+                    type_codes[ltype] = len(cols.types)
+                    cols.types.append(ltype)
+                cols.balances[(code, type_codes[ltype])] = balance
+            add_entries(code, emp.get("leave_history", []))
+            if archive_dir is not None:
+                for year, members in emp.get(HISTORY_KEY, {}).items():
+                    for offset, count in members.items():
+                        batches.setdefault((year, int(offset)), {})[name] = count
+        # Each member is read once for all of its employees
+        for name, entry in iter_batches(batches, archive_dir):
+            add_entries(codes[name], (entry,))
+        return cols
+
+    # Code of a status name, or -1 if no entry has it
+    def status_code(self, status):
+        return self.statuses.index(status) if status in self.statuses else -1
+
+
+def utilization_by_type(cols):
+    # Requests and days per leave type and status, and the share of each type's
+    # allowance (remaining balance + Approved + Pending days) already approved
+    n_types = len(cols.types)
+    requests = [0] * n_types
+    days_by_status = {status: [0] * n_types for status in STATUSES}
+    columns = [days_by_status.get(status) for status in cols.statuses]
+    for ltype, status, days in zip(cols.leave_type, cols.status, cols.days):
+        requests[ltype] += 1
+        column = columns[status]
+        if column is not None:
+            column[ltype] += days
+    remaining = [0] * n_types
+    for (_, ltype), balance in cols.balances.items():
+        remaining[ltype] += balance
+    rows = []
+    for code, ltype in enumerate(cols.types):
+        approved = days_by_status[APPROVED][code]
+        pending = days_by_status[PENDING][code]
+        allowance = remaining[code] + approved + pending
+        rows.append({
+            "leave_type": ltype,
+            "requests": requests[code],
+            "approved_days": approved,
+            "pending_days": pending,
+            "denied_days": days_by_status[DENIED][code],
+            "cancelled_days": days_by_status[CANCELLED][code],
+            "remaining_days": remaining[code],
+            "utilization": round(approved / allowance, 4) if allowance else 0.0,
+        })
+    return rows
+
+
+def approval_latency(cols):
+    # Days from requested_on to the decision for decided requests, per leave type.
+    # Only entries with a recorded decided_on date are counted.
+    approved = cols.status_code(APPROVED)
+    denied = cols.status_code(DENIED)
+    latencies = [[] for _ in cols.types]
+    for ltype, status, requested, decided in zip(cols.leave_type, cols.status, cols.requested, cols.decided):
+        if decided >= 0 and requested >= 0 and (status == approved or status == denied):
+            latencies[ltype].append(decided - requested)
+    rows = []
+    for code, ltype in enumerate(cols.types):
+        values = sorted(latencies[code])
+        if not values:
+            continue
+        rows.append({
+            "leave_type": ltype,
+            "decided": len(values),
+            "mean_days": round(sum(values) / len(values), 2),
+            "median_days": values[len(values) // 2],
+            "max_days": values[-1],
+        })
+    return rows
+
+
+def denial_rate_by_month(cols):
+    # Share of decided (Approved or Denied) requests that were denied, by request month
+    approved = cols.status_code(APPROVED)
+    denied = cols.status_code(DENIED)
+    decided_counts = {}
+    denied_counts = {}
+    for status, month in zip(cols.status, cols.month):
+        if month < 0 or (status != approved and status != denied):
+            continue
+        decided_counts[month] = decided_counts.get(month, 0) + 1
+        if status == denied:
+            denied_counts[month] = denied_counts.get(month, 0) + 1
+    rows = []
+    for month in sorted(decided_counts):
+        total = decided_counts[month]
+        count = denied_counts.get(month, 0)
+        rows.append({
+            "month": f"{month // 12:04d}-{month % 12 + 1:02d}",
+            "decided": total,
+            "denied": count,
+            "denial_rate": round(count / total, 4),
+        })
+    return rows
+
+
+# Report name -> function taking LeaveColumns and returning a list of row dicts
+REPORTS = {
+    "utilization": utilization_by_type,
+    "latency": approval_latency,
+    "denials": denial_rate_by_month,
+}
+
+# Run a report over the whole leave history, archived entries included (from
+# archive_dir, default ARCHIVE_DIR)
+def run_report(db, report, archive_dir=None):
+    if archive_dir is None:
+        from config import ARCHIVE_DIR
+        archive_dir = ARCHIVE_DIR
+    return REPORTS[report](LeaveColumns.load(db.iter_employees(), archive_dir))
+
+# Write report rows as CSV to a file name or an open text stream
+def write_csv(rows, target):
+    if isinstance(target, str):
+        with open(target, "w", newline="") as f:
+            write_csv(rows, f)
+        return
+    if not rows:
+        return
+    writer = csv.DictWriter(target, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+
+# Render report rows as an aligned text table
+def format_table(rows):
+    if not rows:
+        return "No data."
+    headers = list(rows[0])
+    widths = [max(len(h), *(len(str(row[h])) for row in rows)) for h in headers]
+    lines = ["  ".join(h.ljust(w) for h, w in zip(headers, widths)).rstrip()]
+    for row in rows:
+        lines.append("  ".join(str(row[h]).ljust(w) for h, w in zip(headers, widths)).rstrip())
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    from database import open_database
+
+    parser = argparse.ArgumentParser(description="Leave analytics reports.")
+    parser.add_argument("report", choices=sorted(REPORTS), help="report to run")
+    parser.add_argument("--csv", metavar="FILE", help="write the report as CSV ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    db = open_database()
+    rows = run_report(db, args.report)
+    db.close()
+    if args.csv == "-":
+        write_csv(rows, sys.stdout)
+    elif args.csv:
+        write_csv(rows, args.csv)
+        print(f"Wrote {len(rows)} row(s) to {args.csv}.")
+    else:
+        print(format_table(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import json
+import time
+from database import ConflictError
+from employee import EmployeeManager
+
+# Multi-session server: one process keeps the Database in memory and serves many
+# clients over TCP. The protocol is JSON lines; every request is one JSON object and
+# gets one JSON object back, echoing the request's "id":
+#   {"op": "login", "employee": "Alice"}                 -> remembered for the session
+#   {"op": "text", "text": "how many sick leaves do I have"}
+#   {"op": "intent", "intent": "request_leave", "entities": {...}}
+#   {"op": "ping"}
+# Replies are {"id": ..., "ok": true, "response": "..."} or {"id": ..., "ok": false,
+# "error": "..."}. "employee" may also be given on each request instead of logging in.
+
+
+class _StagedWrites:
+    # Database stand-in handed to EmployeeManager while one request is handled. Reads go
+    # to the real Database; employee writes and audit records are collected so the
+    # server can commit them together with other requests' writes.
+    def __init__(self, db):
+        self._db = db
+        self.employees = {}
+        self.log_records = []
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    def get_employee(self, name):
+        if name in self.employees:
+            return self.employees[name]
+        return self._db.get_employee(name)
+
+    def put_employee(self, name, emp):
+        self.employees[name] = emp
+
+    def put_employees(self, employees):
+        self.employees.update(employees)
+
+    def log_action(self, message, **fields):
+        self.log_records.append(dict(fields, message=message))
+
+    def log_actions(self, records):
+        self.log_records.extend(records)
+
+
+class LeaveServer:
+    # Requests for the same employee are serialized by a per-employee asyncio.Lock that
+    # is held until the request's writes are on disk; requests for different employees
+    # run concurrently. Writes are group-committed: the committer waits commit_delay
+    # seconds after the first queued write, then saves every queued employee with one
+    # put_employees call (one journal append and fsync) and releases all the waiting
+    # requests at once.
+    def __init__(self, db, commit_delay=0.002):
+        self.db = db
+        self.commit_delay = commit_delay
+        self._locks = {}
+        self._queue = []
+        self._queued = None
+        self._committer = None
+        self.commits = 0
+        self.committed_writes = 0
+
+    async def start(self, host, port):
+        self._queued = asyncio.Event()
+        self._committer = asyncio.create_task(self._commit_loop())
+        return await asyncio.start_server(self._serve_client, host, port)
+
+    async def stop(self):
+        if self._committer is not None:
+            self._committer.cancel()
+            try:
+                await self._committer
+            except asyncio.CancelledError:
+                pass
+        self._commit()
+
+    # Handle one request dict and return the reply dict (without the id)
+    async def handle(self, request, session):
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "response": "pong"}
+        employee = request.get("employee") or session.get("employee")
+        if op == "login":
+            if not employee or not self.db.employee_exists(employee):
+                return {"ok": False, "error": "Employee not found in the system."}
+            session["employee"] = employee
+            return {"ok": True, "response": f"Hello {employee}! You are now logged in."}
+        if not employee:
+            return {"ok": False, "error": "Log in first or pass 'employee'."}
+        if op == "text":
+            intent, entities = await self._extract(str(request.get("text", "")))
+        elif op == "intent":
+            intent, entities = request.get("intent"), request.get("entities") or {}
+            if not isinstance(entities, dict):
+                return {"ok": False, "error": "'entities' must be an object."}
+        else:
+            return {"ok": False, "error": f"Unknown op: {op}"}
+
+        # Lock every employee the request may write, in a fixed order to avoid deadlocks
+        names = {employee}
+        if intent == "approve_leave" and entities.get("employee_name"):
+            names.add(entities["employee_name"])
+        locks = [self._locks.setdefault(name, asyncio.Lock()) for name in sorted(names)]
+        for lock in locks:
+            await lock.acquire()
+        try:
+            staged = _StagedWrites(self.db)
+            response = EmployeeManager(staged).handle_intent(employee, intent, entities)
+            if staged.employees or staged.log_records:
+                done = asyncio.get_running_loop().create_future()
+                self._queue.append((staged, done))
+                self._queued.set()
+                await done
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        return {"ok": True, "response": response}
+
+    async def _extract(self, text):
+        import ai
+        if ai.is_offline() or ai.get_async_client() is None:
+            return ai.extract_intent_entities(text)
+        return await ai.process_input_async(text)
+
+    async def _serve_client(self, reader, writer):
+        session = {}
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    reply = {"ok": False, "error": f"Bad request: {e}"}
+                    request = {}
+                else:
+                    try:
+                        reply = await self.handle(request, session)
+                    except Exception as e:
+                        reply = {"ok": False, "error": f"Server error: {e}"}
+                reply["id"] = request.get("id")
+                writer.write((json.dumps(reply) + "\n").encode("utf-8"))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _commit_loop(self):
+        while True:
+            await self._queued.wait()
+            # Let other requests queue their writes before committing them together
+            await asyncio.sleep(self.commit_delay)
+            self._queued.clear()
+            self._commit()
+
+    # Save and log everything queued so far, then wake the waiting requests. If another
+    # process changed some of the employees, only the requests that wrote those fail
+    # with the ConflictError and the rest of the batch is committed without them.
+    def _commit(self):
+        batch, self._queue = self._queue, []
+        while batch:
+            employees = {}
+            log_records = []
+            for staged, _ in batch:
+                employees.update(staged.employees)
+                log_records.extend(staged.log_records)
+            try:
+                if employees:
+                    self.db.put_employees(employees)
+                if log_records:
+                    self.db.log_actions(log_records)
+            except ConflictError as e:
+                stale = set(self.db.stale_employees(employees))
+                failed = [item for item in batch if stale.intersection(item[0].employees)]
+                self._fail(failed or batch, e)
+                batch = [item for item in batch if item not in failed] if failed else []
+                continue
+            except Exception as e:
+                self._fail(batch, e)
+                return
+            self.commits += 1
+            self.committed_writes += len(employees)
+            for _, done in batch:
+                if not done.done():
+                    done.set_result(None)
+            return
+
+    @staticmethod
+    def _fail(batch, error):
+        for _, done in batch:
+            if not done.done():
+                done.set_exception(error)
+
+
+def serve(host, port, commit_delay):
+    from audit import AuditLogger
+    from config import AUDIT_LOG_FILE, AUDIT_FLUSH_INTERVAL, AUDIT_MAX_BYTES, AUDIT_BACKUP_COUNT
+    from database import open_database
+
+    audit = AuditLogger(AUDIT_LOG_FILE, max_bytes=AUDIT_MAX_BYTES, flush_interval=AUDIT_FLUSH_INTERVAL,
+                        backup_count=AUDIT_BACKUP_COUNT)
+    db = open_database(audit=audit)
+    server = LeaveServer(db, commit_delay=commit_delay)
+
+    async def run():
+        tcp = await server.start(host, port)
+        print(f"Leave Management server listening on {host}:{port}")
+        try:
+            async with tcp:
+                await tcp.serve_forever()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Server stopped.")
+    finally:
+        db.close()
+
+
+# Load test: clients concurrent connections, each logging in as one of the given
+# employees and sending requests check_balance/request_leave/cancel_leave intents.
+# Returns throughput and latency percentiles.
+async def load_test(host, port, employees, clients=20, requests=100, start_date="2030-01-01"):
+    latencies = []
+
+    async def client(index):
+        reader, writer = await asyncio.open_connection(host, port)
+        name = employees[index % len(employees)]
+
+        async def call(request):
+            start = time.perf_counter()
+            writer.write((json.dumps(request) + "\n").encode("utf-8"))
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            return reply
+
+        await call({"op": "login", "employee": name})
+        for i in range(requests):
+            kind = i % 3
+            if kind == 0:
+                await call({"op": "intent", "intent": "check_balance", "entities": {}})
+            elif kind == 1:
+                await call({"op": "intent", "intent": "request_leave",
+                            "entities": {"leave_type": "Sick Leave", "num_days": 1, "start_date": start_date}})
+            else:
+                await call({"op": "intent", "intent": "cancel_leave",
+                            "entities": {"leave_type": "Sick Leave", "start_date": start_date}})
+        writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(0.50), 2),
+        "p99_ms": round(percentile(0.99), 2),
+    }
+
+
+def main(argv=None):
+    from config import SERVER_HOST, SERVER_PORT, SERVER_COMMIT_DELAY
+
+    parser = argparse.ArgumentParser(description="Leave Management multi-session server.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = sub.add_parser("serve", help="run the server")
+    serve_cmd.add_argument("--host", default=SERVER_HOST)
+    serve_cmd.add_argument("--port", type=int, default=SERVER_PORT)
+    serve_cmd.add_argument("--commit-delay", type=float, default=SERVER_COMMIT_DELAY,
+                           help="seconds to gather writes into one commit")
+    load_cmd = sub.add_parser("loadtest", help="measure throughput and latency of a running server")
+    load_cmd.add_argument("employees", nargs="+", help="employees the clients log in as")
+    load_cmd.add_argument("--host", default=SERVER_HOST)
+    load_cmd.add_argument("--port", type=int, default=SERVER_PORT)
+    load_cmd.add_argument("--clients", type=int, default=20)
+    load_cmd.add_argument("--requests", type=int, default=100, help="requests per client")
+    load_cmd.add_argument("--start-date", default="2030-01-01",
+                          help="date requested and cancelled by the load test (pick one with no existing leave)")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.commit_delay)
+    else:
+        result = asyncio.run(load_test(args.host, args.port, args.employees, args.clients, args.requests,
+                                       args.start_date))
+        print(", ".join(f"{k}: {v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
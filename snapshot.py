@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from records import GRANTS_KEY, EmployeeRecord, LeaveRecord
+
+# Binary snapshot of the whole store, an alternative to the indent=4 employees.json.
+#
+# File layout: a fixed header, then the payload.
+#   header  = magic b"LMSSNAP\0", u16 version, u16 flags (0), u32 CRC32 of payload,
+#             u64 payload length (all little-endian)
+#   payload = a sequence of sections, each a u32 byte length followed by its bytes:
+#     0  string table: JSON array of every distinct string (names, leave types,
+#        statuses, and JSON text of values that do not fit the columns)
+#     1  the top-level document without "employees", as JSON (admins, holidays, ...)
+#     2+ one section per column below, as little-endian int32 arrays
+#
+# Employees are stored column-wise. Per employee: name, manager flag (-1 when the key
+# is missing), number of balances and of history entries, and an extra reference. Per
+# balance: leave type and value. Per history entry: type, days, start, status,
+# requested, decided, end and extra. Dates are ordinals with 0 for "no date"; string
+# references are indexes into the string table, with extra references offset by one
+# so 0 means "none". Anything that is not an int where the column expects one (an
+# unparseable date, a non-integer balance) is moved into the extra JSON instead.
+
+MAGIC = b"LMSSNAP\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQ")
+SECTION = struct.Struct("<I")
+
+EMPLOYEE_COLUMNS = ("emp_name", "emp_manager", "emp_balances", "emp_history", "emp_extra")
+BALANCE_COLUMNS = ("bal_type", "bal_value")
+ENTRY_COLUMNS = ("type", "days", "start", "status", "requested", "decided", "end", "extra")
+COLUMNS = EMPLOYEE_COLUMNS + BALANCE_COLUMNS + ENTRY_COLUMNS
+
+INT32_MIN = -2 ** 31
+INT32_MAX = 2 ** 31 - 1
+
+
+class SnapshotError(ValueError):
+    # The file is not a snapshot, has an unsupported version or fails its checksum
+    pass
+
+
+def is_snapshot(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _is_int(value):
+    return type(value) is int and INT32_MIN <= value <= INT32_MAX
+
+
+# Serialize a document whose "employees" values are EmployeeRecord objects or dicts
+def dumps(document):
+    strings = []
+    string_index = {}
+    def ref(value):
+        idx = string_index.get(value)
+        if idx is None:
+            idx = string_index[value] = len(strings)
+            strings.append(value)
+        return idx
+    def extra_ref(extra):
+        return ref(json.dumps(extra, separators=(",", ":"))) + 1 if extra else 0
+
+    cols = {name: array("i") for name in COLUMNS}
+    for name, emp in document.get("employees", {}).items():
+        if not isinstance(emp, EmployeeRecord):
+            emp = EmployeeRecord.from_dict(emp)
+        emp_extra = dict(emp.extra) if emp.extra else {}
+        if emp.leave_grants is not None:
+            emp_extra[GRANTS_KEY] = emp.grants()
+        balances = emp.leave_balance
+        if all(isinstance(k, str) and _is_int(v) for k, v in balances.items()):
+            for ltype, value in balances.items():
+                cols["bal_type"].append(ref(ltype))
+                cols["bal_value"].append(value)
+        else:
+            emp_extra["leave_balance"] = balances
+            balances = ()
+        manager = emp.is_manager
+        if manager is not None and type(manager) is not bool:
+            emp_extra["is_manager"] = manager
+            manager = None
+        cols["emp_name"].append(ref(name))
+        cols["emp_manager"].append(-1 if manager is None else int(manager))
+        cols["emp_balances"].append(len(balances))
+        cols["emp_history"].append(len(emp.leave_history))
+        cols["emp_extra"].append(extra_ref(emp_extra))
+        for entry in emp.leave_history:
+            extra = dict(entry.extra) if entry.extra else {}
+            values = {}
+            for column, key, value in (("start", "start_date", entry.start), ("requested", "requested_on", entry.requested),
+                                       ("decided", "decided_on", entry.decided), ("end", "end_date", entry.end)):
+                if value is None or (_is_int(value) and value > 0):
+                    values[column] = value or 0
+                else:
+                    extra[key] = value
+                    values[column] = 0
+            days = entry.days
+            if not _is_int(days):
+                extra["days"] = days
+                days = 0
+            for column, key, value in (("type", "type", entry.type), ("status", "status", entry.status)):
+                if isinstance(value, str):
+                    cols[column].append(ref(value))
+                else:
+                    extra[key] = value
+                    cols[column].append(-1)
+            cols["days"].append(days)
+            cols["start"].append(values["start"])
+            cols["requested"].append(values["requested"])
+            cols["decided"].append(values["decided"])
+            cols["end"].append(values["end"])
+            cols["extra"].append(extra_ref(extra))
+
+    rest = {k: v for k, v in document.items() if k != "employees"}
+    sections = [json.dumps(strings).encode("utf-8"), json.dumps(rest).encode("utf-8")]
+    for name in COLUMNS:
+        column = cols[name]
+        if sys.byteorder == "big":
+            column.byteswap()
+        sections.append(column.tobytes())
+    payload = b"".join(SECTION.pack(len(section)) + section for section in sections)
+    return HEADER.pack(MAGIC, VERSION, 0, zlib.crc32(payload), len(payload)) + payload
+
+
+# Parse a snapshot into a document whose "employees" values are EmployeeRecord objects
+def loads(data):
+    if len(data) < HEADER.size:
+        raise SnapshotError("file too short for a snapshot header")
+    magic, version, _, checksum, length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("not a snapshot file")
+    if version != VERSION:
+        raise SnapshotError(f"unsupported snapshot version {version}")
+    payload = memoryview(data)[HEADER.size:HEADER.size + length]
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        raise SnapshotError("snapshot checksum mismatch (file is truncated or corrupted)")
+
+    sections = []
+    pos = 0
+    while pos < length:
+        (size,) = SECTION.unpack_from(payload, pos)
+        sections.append(payload[pos + SECTION.size:pos + SECTION.size + size])
+        pos += SECTION.size + size
+    if len(sections) != 2 + len(COLUMNS):
+        raise SnapshotError("snapshot has an unexpected number of sections")
+    strings = json.loads(bytes(sections[0]))
+    document = json.loads(bytes(sections[1]))
+    cols = {}
+    for name, section in zip(COLUMNS, sections[2:]):
+        column = array("i")
+        column.frombytes(section)
+        if sys.byteorder == "big":
+            column.byteswap()
+        cols[name] = column
+
+    employees = {}
+    entry_cols = [cols[name] for name in ENTRY_COLUMNS]
+    entries = zip(*entry_cols)
+    balances = zip(cols["bal_type"], cols["bal_value"])
+    for name_ref, manager, n_balances, n_history, extra_ref in zip(*(cols[name] for name in EMPLOYEE_COLUMNS)):
+        leave_balance = {strings[t]: v for t, v in (next(balances) for _ in range(n_balances))}
+        history = []
+        for ltype, days, start, status, requested, decided, end, extra in (next(entries) for _ in range(n_history)):
+            record = LeaveRecord(strings[ltype] if ltype >= 0 else None, days, start or None,
+                                 strings[status] if status >= 0 else None, requested or None,
+                                 decided or None, end or None)
+            if extra:
+                # Rebuild through the dict form so moved fields land in their slots
+                entry = record.to_dict()
+                entry.update(json.loads(strings[extra - 1]))
+                record = LeaveRecord.from_dict(entry)
+            history.append(record)
+        emp = EmployeeRecord(leave_balance, None if manager < 0 else bool(manager), history)
+        if extra_ref:
+            emp_dict = emp.to_dict()
+            emp_dict.update(json.loads(strings[extra_ref - 1]))
+            emp = EmployeeRecord.from_dict(emp_dict)
+        employees[strings[name_ref]] = emp
+    document["employees"] = employees
+    return document
+
+
+def save(document, filename):
+    with open(filename, "wb") as f:
+        f.write(dumps(document))
+        f.flush()
+        os.fsync(f.fileno())
+
+def load(filename):
+    with open(filename, "rb") as f:
+        return loads(f.read())
+
+# Two-way conversion between employees.json and a binary snapshot. The source is
+# read with its journal, which may hold changes not folded into the file yet.
+def json_to_snapshot(json_filename, snapshot_filename):
+    from storage import JSONStorage  # storage imports this module
+    source = JSONStorage(json_filename, journal=True)
+    source.load()
+    try:
+        save(source._document(), snapshot_filename)
+    finally:
+        source.close()
+
+def snapshot_to_json(snapshot_filename, json_filename):
+    from storage import JSONStorage  # storage imports this module
+    if not is_snapshot(snapshot_filename):
+        raise SnapshotError("not a snapshot file")
+    source = JSONStorage(snapshot_filename, journal=True, binary=True)
+    source.load()
+    try:
+        document = source._document()
+    finally:
+        source.close()
+    with open(json_filename, "w") as f:
+        json.dump(document, f, indent=4)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert between employees.json and the binary snapshot format.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    to_binary = sub.add_parser("to-binary", help="convert a JSON data file to a snapshot")
+    to_binary.add_argument("source")
+    to_binary.add_argument("target")
+    to_json = sub.add_parser("to-json", help="convert a snapshot to a JSON data file")
+    to_json.add_argument("source")
+    to_json.add_argument("target")
+    verify = sub.add_parser("verify", help="check a snapshot's version and checksum")
+    verify.add_argument("source")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "to-binary":
+            json_to_snapshot(args.source, args.target)
+        elif args.command == "to-json":
+            snapshot_to_json(args.source, args.target)
+        else:
+            document = load(args.source)
+            print(f"{args.source}: version {VERSION}, {len(document['employees'])} employee(s), checksum OK")
+            return
+    except (OSError, SnapshotError) as e:
+        sys.exit(f"Error: {e}")
+    print(f"Wrote {args.target}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,850 @@
+import copy
+import json
+import mmap
+import os
+import sqlite3
+from contextlib import contextmanager
+from indexes import PendingIndex
+from records import EmployeeRecord, update_employee
+import snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, writers are not coordinated across processes
+    fcntl = None
+
+class StorageBackend:
+    # Interface implemented by every storage engine behind Database.
+    # Employee records are exchanged as plain dicts with the same shape as in employees.json:
+    # {"leave_balance": {...}, "is_manager": bool, "leave_history": [{...}, ...]}
+
+    # progress, if given, is called as progress(done, total) while loading
+    def load(self, progress=None):
+        raise NotImplementedError
+
+    # Persist everything that is still buffered
+    def save(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    # Pick up changes other processes made to the store since it was loaded or last
+    # refreshed. Returns (changed, reloaded, holidays_changed): the names of employees
+    # known to have changed, whether the whole store was reloaded and whether holidays
+    # were added. watched names the employees whose changes must be reported even when
+    # the whole store is reloaded.
+    def refresh(self, watched=()):
+        return set(), False, False
+
+    # Context manager holding the store's write lock across processes
+    @contextmanager
+    def locked(self):
+        yield
+
+    def get_employee(self, name):
+        raise NotImplementedError
+
+    def employee_exists(self, name):
+        return self.get_employee(name) is not None
+
+    def employee_names(self):
+        raise NotImplementedError
+
+    # Yield (name, record) pairs for every employee, or only for the given names
+    def iter_employees(self, names=None):
+        for name in self.employee_names() if names is None else names:
+            emp = self.get_employee(name)
+            if emp is not None:
+                yield name, emp
+
+    def put_employee(self, name, emp):
+        raise NotImplementedError
+
+    # Store several employee records as a single commit. meta, if given, is a dict of
+    # store-wide values (see set_meta) saved in the same commit.
+    def put_employees(self, employees, meta=None):
+        for name, emp in employees.items():
+            self.put_employee(name, emp)
+        for key, value in (meta or {}).items():
+            self.set_meta(key, value)
+
+    # Apply partial changes to several employees ({name: {key: value}}) as a single
+    # commit: every key replaces the employee's value, except leave_grants, whose grants
+    # are appended to the ledger. Employees that do not exist are skipped.
+    def update_employees(self, changes, meta=None):
+        employees = {}
+        for name, change in changes.items():
+            emp = self.get_employee(name)
+            if emp is not None:
+                update_employee(emp, change)
+                employees[name] = emp
+        self.put_employees(employees, meta)
+
+    def delete_employee(self, name):
+        raise NotImplementedError
+
+    def get_holidays(self):
+        raise NotImplementedError
+
+    def add_holiday(self, date):
+        raise NotImplementedError
+
+    # Add several holiday dates as a single commit
+    def add_holidays(self, dates):
+        for date in dates:
+            self.add_holiday(date)
+
+    def get_admins(self):
+        raise NotImplementedError
+
+    # Store-wide JSON values by key (e.g. the record of accrual runs)
+    def get_meta(self, key, default=None):
+        raise NotImplementedError
+
+    def set_meta(self, key, value):
+        raise NotImplementedError
+
+    # Return the positions in leave_history of the employee's Pending requests
+    def pending_requests(self, name):
+        raise NotImplementedError
+
+    # Return the names of employees with Pending requests, earliest start date first
+    def pending_employees(self, offset=0, limit=None):
+        raise NotImplementedError
+
+    # Return (start_date, name, position) for Pending requests in start date order
+    def pending_queue(self, offset=0, limit=None):
+        raise NotImplementedError
+
+
+class JSONStorage(StorageBackend):
+    # The original single-file JSON store.
+    # Employees are held in memory as EmployeeRecord objects (see records.py) and
+    # converted to and from plain dicts at the StorageBackend boundary and when the
+    # file is written, so employees.json keeps its format.
+    # When journal is True, mutations are appended to "<filename>.journal" instead of
+    # rewriting the whole file, and the journal is folded into the snapshot once it
+    # holds compact_threshold records.
+    # With binary=True the file is written in the binary snapshot format (snapshot.py)
+    # instead of JSON. Either format is recognized on load, and if filename does not
+    # exist yet the data is read from seed_filename until the first save.
+    # Several processes can share the files: writers hold an exclusive lock on
+    # "<filename>.lock" and readers a shared one, the snapshot is always replaced by
+    # renaming a complete temporary file, and refresh() notices other writers by the
+    # snapshot's inode/size/mtime and the journal's length.
+    def __init__(self, filename, journal=False, compact_threshold=500, binary=False, seed_filename=None):
+        self.filename = filename
+        self.binary = binary
+        self.seed_filename = seed_filename
+        self.journal = journal
+        self.journal_filename = filename + ".journal"
+        self.compact_threshold = compact_threshold
+        self.data = None
+        self.pending = PendingIndex()
+        self._pending_ready = False
+        self._source = None
+        self._source_file = None
+        self._journal_file = None
+        self._journal_records = 0
+        self.lock_filename = filename + ".lock"
+        self._lock_file = None
+        self._lock_depth = 0
+        # Version of the files the in-memory data reflects
+        self._snapshot_version = None
+        self._journal_offset = 0
+
+    # Load data from the JSON file without writing to it. Employees are not parsed up
+    # front: the file is scanned once for the byte range of each employee, and a record
+    # is only materialized when that employee is first read. progress, if given, is
+    # called as progress(bytes_scanned, total_bytes) while scanning.
+    # In journal mode the snapshot is loaded first and the journal is replayed on top.
+    def load(self, progress=None):
+        with self.locked(shared=True):
+            self._load(progress)
+
+    def _load(self, progress):
+        self._close_source(materialize=False)
+        self._snapshot_version = self._file_version(self.filename)
+        self._journal_offset = 0
+        source = self.filename
+        if not os.path.exists(source) and self.seed_filename and os.path.exists(self.seed_filename):
+            source = self.seed_filename
+        if snapshot.is_snapshot(source):
+            self.data = snapshot.load(source)
+            if progress:
+                size = os.path.getsize(source)
+                progress(size, size)
+        else:
+            self.data = self._scan(source, progress)
+        if "holidays" not in self.data:
+            self.data["holidays"] = []
+        if source != self.filename:
+            self._replay_seed_journal()
+        if self.journal:
+            self._journal_records = self._replay_journal()
+        # Built on the first pending query, so startup does not parse every employee
+        self._pending_ready = False
+
+    # Write the current state of data back to the file (pretty-printed JSON or snapshot)
+    def save(self):
+        with self.locked():
+            if self.journal:
+                self.compact()
+                return
+            self._replace_snapshot()
+
+    def close(self):
+        self._close_journal()
+        self._close_source(materialize=False)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    # Compare the files with the version loaded. A replaced snapshot (another process
+    # saved or compacted) means a full reload; otherwise only the journal records
+    # appended since are applied.
+    def refresh(self, watched=()):
+        with self.locked(shared=True):
+            journal_size = os.path.getsize(self.journal_filename) if self.journal and os.path.exists(self.journal_filename) else 0
+            if self._file_version(self.filename) != self._snapshot_version or journal_size < self._journal_offset:
+                return self._reload(watched), True, True
+            if journal_size == self._journal_offset:
+                return set(), False, False
+            changed, holidays_changed = self._read_journal_tail()
+            return changed, False, holidays_changed
+
+    # Hold the lock file for the duration of the block: exclusive for writers, shared
+    # for readers. Nested use keeps the outer lock (a shared lock is not upgraded, so
+    # writes must not happen inside a shared block).
+    @contextmanager
+    def locked(self, shared=False):
+        if self._lock_depth == 0:
+            self._acquire_lock(shared)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0 and self._lock_file is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _acquire_lock(self, shared):
+        if fcntl is None:
+            return
+        if self._lock_file is None:
+            try:
+                self._lock_file = open(self.lock_filename, "a")
+            except OSError:
+                # Read-only location: nobody can write here, so there is nothing to coordinate
+                return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+    def get_employee(self, name):
+        emp = self._record(name)
+        return emp.to_dict() if emp is not None else None
+
+    def employee_exists(self, name):
+        return name in self.data.get("employees", {})
+
+    def employee_names(self):
+        return list(self.data.get("employees", {}).keys())
+
+    # Unread employees are parsed for the caller but not kept, so a full pass (e.g.
+    # building an index) does not materialize the whole store
+    def iter_employees(self, names=None):
+        employees = self.data.get("employees", {})
+        items = list(employees.items()) if names is None else [(n, employees[n]) for n in names if n in employees]
+        for name, emp in items:
+            if isinstance(emp, tuple):
+                yield name, self._parse(emp)
+            else:
+                yield name, emp.to_dict()
+
+    def put_employee(self, name, emp):
+        self.data["employees"][name] = EmployeeRecord.from_dict(emp)
+        if self._pending_ready:
+            self.pending.update(name, emp)
+        self._commit({"op": "put_employee", "name": name, "value": emp})
+
+    def put_employees(self, employees, meta=None):
+        for name, emp in employees.items():
+            self.data["employees"][name] = EmployeeRecord.from_dict(emp)
+            if self._pending_ready:
+                self.pending.update(name, emp)
+        record = {"op": "put_employees", "values": employees}
+        if meta:
+            self.data.setdefault("meta", {}).update(copy.deepcopy(meta))
+            record["meta"] = meta
+        self._commit(record)
+
+    # Only the changes are converted and journaled, not the whole records. A change to
+    # an employee not read yet is queued behind the byte range and applied when the
+    # employee is parsed, so the store takes ownership of the change dicts: callers must
+    # not modify them afterwards.
+    def update_employees(self, changes, meta=None):
+        for name, change in changes.items():
+            if self._update(name, change) and self._pending_ready and "leave_history" in change:
+                self.pending.update(name, self.get_employee(name))
+        record = {"op": "update_employees", "values": changes}
+        if meta:
+            self.data.setdefault("meta", {}).update(copy.deepcopy(meta))
+            record["meta"] = meta
+        self._commit(record)
+
+    def delete_employee(self, name):
+        self.data["employees"].pop(name, None)
+        if self._pending_ready:
+            self.pending.remove(name)
+        self._commit({"op": "delete_employee", "name": name})
+
+    def get_holidays(self):
+        return self.data["holidays"]
+
+    def add_holiday(self, date):
+        self.data["holidays"].append(date)
+        self._commit({"op": "add_holiday", "date": date})
+
+    def add_holidays(self, dates):
+        self.data["holidays"].extend(dates)
+        self._commit({"op": "add_holidays", "dates": dates})
+
+    def get_admins(self):
+        return self.data.get("admins", ["AdminUser"])
+
+    def get_meta(self, key, default=None):
+        return copy.deepcopy(self.data.get("meta", {}).get(key, default))
+
+    def set_meta(self, key, value):
+        self.data.setdefault("meta", {})[key] = copy.deepcopy(value)
+        self._commit({"op": "set_meta", "key": key, "value": value})
+
+    def pending_requests(self, name):
+        return self._pending_index().positions(name)
+
+    def pending_employees(self, offset=0, limit=None):
+        return self._pending_index().employees(offset, limit)
+
+    def pending_queue(self, offset=0, limit=None):
+        return self._pending_index().page(offset, limit)
+
+    # Fold the journal into a fresh snapshot. The snapshot is renamed into place before
+    # the journal is truncated, so a crash at any point leaves either the old snapshot
+    # plus the full journal or the new snapshot plus a journal whose records are
+    # already applied (replaying them is harmless).
+    def compact(self):
+        with self.locked():
+            self._replace_snapshot()
+            self._close_journal()
+            with open(self.journal_filename, "w") as f:
+                os.fsync(f.fileno())
+            self._journal_records = 0
+            self._journal_offset = 0
+
+    # Write the whole store to a temporary file and rename it over the snapshot, so
+    # readers and a crash only ever see a complete file
+    def _replace_snapshot(self):
+        tmp_filename = self.filename + ".tmp"
+        self._close_source()
+        self._write_snapshot(tmp_filename)
+        os.replace(tmp_filename, self.filename)
+        self._snapshot_version = self._file_version(self.filename)
+
+    # Persist a single mutation: append it to the journal in journal mode, otherwise
+    # fall back to rewriting the whole file
+    def _commit(self, record):
+        with self.locked():
+            if not self.journal:
+                self.save()
+                return
+            if self._journal_file is None:
+                self._journal_file = open(self.journal_filename, "a")
+            line = json.dumps(record) + "\n"
+            self._journal_file.write(line)
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+            # json.dumps output is ASCII, so characters and bytes agree
+            self._journal_offset += len(line)
+            self._journal_records += 1
+            if self._journal_records >= self.compact_threshold:
+                self.compact()
+
+    # Write the whole store to filename in the configured format and sync it to disk
+    def _write_snapshot(self, filename):
+        if self.binary:
+            with open(filename, "wb") as f:
+                f.write(snapshot.dumps(self.data))
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            with open(filename, "w") as f:
+                json.dump(self._document(), f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+
+    # The whole store as the dict written to employees.json
+    def _document(self):
+        document = dict(self.data)
+        document["employees"] = dict(self.iter_employees())
+        return document
+
+    def _pending_index(self):
+        if not self._pending_ready:
+            self.pending.rebuild(self.iter_employees())
+            self._pending_ready = True
+        return self.pending
+
+    # The employee's record, parsing it from the file on first access
+    def _record(self, name):
+        emp = self.data["employees"].get(name)
+        if isinstance(emp, tuple):
+            emp = EmployeeRecord.from_dict(self._parse(emp))
+            self.data["employees"][name] = emp
+        return emp
+
+    # The employee dict at a (start, end, *changes) entry of an employee not read yet:
+    # the bytes of the file with the changes queued by update_employees applied
+    def _parse(self, entry):
+        emp = json.loads(self._source[entry[0]:entry[1]])
+        for change in entry[2:]:
+            update_employee(emp, change)
+        return emp
+
+    # Apply a partial change to an employee, or queue it if the employee was not read
+    # yet. Returns whether the employee exists.
+    def _update(self, name, change):
+        employees = self.data["employees"]
+        emp = employees.get(name)
+        if emp is None:
+            return False
+        if isinstance(emp, tuple):
+            employees[name] = emp + (change,)
+        else:
+            emp.update(change)
+        return True
+
+    # Read the top-level document. Employees are returned as (start, end) byte ranges
+    # into self._source, a read-only memory map of the file, when the file has the
+    # indent=4 layout this class writes; any other layout is decoded one employee at a
+    # time into records.
+    def _scan(self, filename, progress):
+        self._source_file = open(filename, "rb")
+        size = os.fstat(self._source_file.fileno()).st_size
+        if size == 0:
+            raise ValueError(f"{filename} is empty")
+        self._source = mmap.mmap(self._source_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return self._scan_indented(self._source, progress)
+        except ValueError:
+            return self._scan_decoded(self._source, progress)
+
+    # Fast path for json.dump(..., indent=4) output (with \n or \r\n line ends). Each
+    # employee is a member of the "employees" object at indent 8, so its value ends at
+    # the first line consisting of eight spaces and "}" (JSON strings cannot contain
+    # raw newlines).
+    @staticmethod
+    def _scan_indented(buf, progress):
+        nl = b"\r\n" if buf.find(b"\r\n", 0, 64) >= 0 else b"\n"
+        marker = nl + b'    "employees": {'
+        open_at = buf.find(marker)
+        if open_at < 0:
+            raise ValueError("not an indent=4 document")
+        member = nl + b'        "'
+        member_close = nl + b"        }"
+        pos = open_at + len(marker)
+        employees = {}
+        total = len(buf)
+        reported = 0
+        if buf[pos:pos + 1] == b"}":
+            close_at = pos + 1
+        else:
+            while True:
+                if buf[pos:pos + len(member)] != member:
+                    raise ValueError("unexpected layout")
+                name_at = pos + len(member) - 1
+                line = buf[name_at:buf.find(nl, name_at)].decode("utf-8")
+                name, name_end = json.decoder.scanstring(line, 1)
+                if not line.startswith(": {", name_end):
+                    raise ValueError("unexpected layout")
+                start = name_at + len(line[:name_end + 2].encode("utf-8"))
+                if line.startswith(": {}", name_end):
+                    end = start + 2
+                else:
+                    end = buf.find(member_close, start)
+                    if end < 0:
+                        raise ValueError("unterminated employee")
+                    end += len(member_close)
+                employees[name] = (start, end)
+                if progress and end - reported >= total // 100:
+                    progress(end, total)
+                    reported = end
+                if buf[end:end + 1] != b",":
+                    break
+                pos = end + 1
+            if buf[end:end + len(nl) + 5] != nl + b"    }":
+                raise ValueError("unexpected layout")
+            close_at = end + len(nl) + 5
+        # Everything except the employees member is small: parse it normally
+        data = json.loads(buf[:open_at] + marker + b"}" + buf[close_at:])
+        data["employees"] = employees
+        if progress:
+            progress(total, total)
+        return data
+
+    # General path: decode the document and turn employees into records one at a time,
+    # dropping each parsed dict as soon as its record exists
+    @staticmethod
+    def _scan_decoded(buf, progress):
+        data = json.loads(buf[:])
+        employees = data.get("employees", {})
+        count = len(employees)
+        records = {}
+        for done, name in enumerate(list(employees), 1):
+            records[name] = EmployeeRecord.from_dict(employees.pop(name))
+            if progress and (done % 1000 == 0 or done == count):
+                # Reported in bytes like the fast path, estimated from the share converted
+                progress(len(buf) * done // count, len(buf))
+        data["employees"] = records
+        return data
+
+    # Release the memory map of the file, first materializing every employee not read
+    # yet unless the data is being discarded anyway
+    def _close_source(self, materialize=True):
+        if self._source is None:
+            return
+        if materialize and self.data is not None:
+            for name, emp in list(self.data.get("employees", {}).items()):
+                if isinstance(emp, tuple):
+                    self._record(name)
+        self._source.close()
+        self._source_file.close()
+        self._source = None
+        self._source_file = None
+
+    # (inode, size, mtime) of a file, or None if it does not exist
+    @staticmethod
+    def _file_version(filename):
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    # Reload everything and return the watched employees whose record changed
+    def _reload(self, watched):
+        before = {}
+        for name in watched:
+            emp = self._record(name)
+            before[name] = emp.to_dict() if emp is not None else None
+        self._load(None)
+        return {name for name, emp in before.items() if self.get_employee(name) != emp}
+
+    # Apply the journal records appended since the last load or refresh and return the
+    # names of the employees they changed and whether any added holidays
+    def _read_journal_tail(self):
+        changed = set()
+        holidays_changed = False
+        with open(self.journal_filename, "rb") as f:
+            f.seek(self._journal_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._apply(record)
+                self._journal_offset += len(line)
+                self._journal_records += 1
+                op = record.get("op")
+                if op in ("put_employee", "delete_employee"):
+                    changed.add(record["name"])
+                elif op in ("put_employees", "update_employees"):
+                    changed.update(record["values"])
+                elif op in ("add_holiday", "add_holidays"):
+                    holidays_changed = True
+        if self._pending_ready:
+            for name in changed:
+                emp = self._record(name)
+                if emp is None:
+                    self.pending.remove(name)
+                else:
+                    self.pending.update(name, emp.to_dict())
+        return changed, holidays_changed
+
+    # Apply a single journal record to the in-memory data
+    def _apply(self, record):
+        op = record.get("op")
+        if op == "put_employee":
+            self.data["employees"][record["name"]] = EmployeeRecord.from_dict(record["value"])
+        elif op == "put_employees":
+            for name, emp in record["values"].items():
+                self.data["employees"][name] = EmployeeRecord.from_dict(emp)
+            if "meta" in record:
+                self.data.setdefault("meta", {}).update(record["meta"])
+        elif op == "update_employees":
+            for name, change in record["values"].items():
+                self._update(name, change)
+            if "meta" in record:
+                self.data.setdefault("meta", {}).update(record["meta"])
+        elif op == "set_meta":
+            self.data.setdefault("meta", {})[record["key"]] = record["value"]
+        elif op == "delete_employee":
+            self.data["employees"].pop(record["name"], None)
+        elif op == "add_holiday":
+            if record["date"] not in self.data["holidays"]:
+                self.data["holidays"].append(record["date"])
+        elif op == "add_holidays":
+            holidays = set(self.data["holidays"])
+            self.data["holidays"].extend(d for d in record["dates"] if d not in holidays)
+
+    # Replay every complete journal record and return how many were applied.
+    # A torn final line left by a crash mid-append is ignored and cut off so that
+    # new records are not appended after it.
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_filename):
+            return 0
+        applied = 0
+        valid_bytes = 0
+        with open(self.journal_filename, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._apply(record)
+                applied += 1
+                valid_bytes += len(line)
+        if valid_bytes != os.path.getsize(self.journal_filename):
+            with open(self.journal_filename, "r+b") as f:
+                f.truncate(valid_bytes)
+        self._journal_offset = valid_bytes
+        return applied
+
+    # Apply the complete records of the seed file's own journal (changes made in JSON
+    # journal mode that are not folded into the seed yet), leaving that file untouched
+    def _replay_seed_journal(self):
+        seed_journal = self.seed_filename + ".journal"
+        if not os.path.exists(seed_journal):
+            return
+        with open(seed_journal, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._apply(record)
+
+    def _close_journal(self):
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+
+
+class SQLiteStorage(StorageBackend):
+    # Indexed SQLite engine. Employees, balances, leave history and holidays live in
+    # their own tables, so lookups and status scans are index queries instead of walks
+    # over the whole document. If the database is empty and seed_filename points to an
+    # employees.json file, its contents are imported on first load. Employee keys other
+    # than balances, manager flag and history are kept as JSON in employees.extra.
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS employees (
+            name TEXT PRIMARY KEY,
+            is_manager INTEGER,
+            extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS balances (
+            employee TEXT NOT NULL,
+            leave_type TEXT NOT NULL,
+            days INTEGER NOT NULL,
+            PRIMARY KEY (employee, leave_type)
+        );
+        CREATE TABLE IF NOT EXISTS leave_history (
+            id INTEGER PRIMARY KEY,
+            employee TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            type TEXT,
+            days INTEGER,
+            start_date TEXT,
+            status TEXT,
+            requested_on TEXT,
+            extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS holidays (
+            date TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS admins (
+            name TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_employee ON leave_history (employee, seq);
+        CREATE INDEX IF NOT EXISTS idx_history_status ON leave_history (status);
+        CREATE INDEX IF NOT EXISTS idx_history_start_date ON leave_history (start_date);
+    """
+    HISTORY_COLUMNS = ("type", "days", "start_date", "status", "requested_on")
+
+    def __init__(self, filename, seed_filename=None):
+        self.filename = filename
+        self.seed_filename = seed_filename
+        self.conn = None
+
+    # progress reports the scan of the seed file when it is imported
+    def load(self, progress=None):
+        self.conn = sqlite3.connect(self.filename)
+        self.conn.executescript(self.SCHEMA)
+        # Databases created before employees.extra existed
+        if "extra" not in [row[1] for row in self.conn.execute("PRAGMA table_info(employees)")]:
+            with self.conn:
+                self.conn.execute("ALTER TABLE employees ADD COLUMN extra TEXT")
+        empty = self.conn.execute("SELECT 1 FROM employees LIMIT 1").fetchone() is None
+        if empty and self.seed_filename and os.path.exists(self.seed_filename):
+            # Stream the seed file so only one employee is parsed at a time. Its journal
+            # is replayed too: recent changes may not be folded into the file yet.
+            seed = JSONStorage(self.seed_filename, journal=True)
+            seed.load(progress)
+            self.import_data(seed.data, seed.iter_employees())
+            seed.close()
+
+    # Bulk-load a whole employees.json document in one transaction. employees, if
+    # given, is an iterable of (name, record) pairs used instead of data["employees"].
+    def import_data(self, data, employees=None):
+        if employees is None:
+            employees = data.get("employees", {}).items()
+        with self.conn:
+            for name, emp in employees:
+                self._write_employee(name, emp)
+            self.conn.executemany("INSERT OR IGNORE INTO holidays (date) VALUES (?)",
+                                  [(d,) for d in data.get("holidays", [])])
+            self.conn.executemany("INSERT OR IGNORE INTO admins (name) VALUES (?)",
+                                  [(a,) for a in data.get("admins", [])])
+            self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                  [(k, json.dumps(v)) for k, v in data.get("meta", {}).items()])
+
+    def save(self):
+        self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def get_employee(self, name):
+        row = self.conn.execute("SELECT is_manager, extra FROM employees WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        emp = {"leave_balance": {}, "leave_history": []}
+        if row[0] is not None:
+            emp["is_manager"] = bool(row[0])
+        if row[1]:
+            emp.update(json.loads(row[1]))
+        for leave_type, days in self.conn.execute(
+                "SELECT leave_type, days FROM balances WHERE employee = ? ORDER BY rowid", (name,)):
+            emp["leave_balance"][leave_type] = days
+        for row in self.conn.execute(
+                "SELECT type, days, start_date, status, requested_on, extra FROM leave_history "
+                "WHERE employee = ? ORDER BY seq", (name,)):
+            emp["leave_history"].append(self._row_to_entry(row))
+        return emp
+
+    def employee_exists(self, name):
+        return self.conn.execute("SELECT 1 FROM employees WHERE name = ?", (name,)).fetchone() is not None
+
+    def employee_names(self):
+        return [row[0] for row in self.conn.execute("SELECT name FROM employees ORDER BY rowid")]
+
+    def put_employee(self, name, emp):
+        with self.conn:
+            self._write_employee(name, emp)
+
+    def put_employees(self, employees, meta=None):
+        with self.conn:
+            for name, emp in employees.items():
+                self._write_employee(name, emp)
+            for key, value in (meta or {}).items():
+                self._write_meta(key, value)
+
+    def delete_employee(self, name):
+        with self.conn:
+            self._delete_rows(name)
+            self.conn.execute("DELETE FROM employees WHERE name = ?", (name,))
+
+    def get_holidays(self):
+        return [row[0] for row in self.conn.execute("SELECT date FROM holidays ORDER BY rowid")]
+
+    def add_holiday(self, date):
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO holidays (date) VALUES (?)", (date,))
+
+    def add_holidays(self, dates):
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO holidays (date) VALUES (?)", [(d,) for d in dates])
+
+    def get_admins(self):
+        admins = [row[0] for row in self.conn.execute("SELECT name FROM admins ORDER BY rowid")]
+        return admins or ["AdminUser"]
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else default
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self._write_meta(key, value)
+
+    def pending_requests(self, name):
+        return [row[0] for row in self.conn.execute(
+            "SELECT seq FROM leave_history WHERE employee = ? AND status = 'Pending' ORDER BY seq", (name,))]
+
+    def pending_employees(self, offset=0, limit=None):
+        return [row[0] for row in self.conn.execute(
+            "SELECT employee FROM leave_history WHERE status = 'Pending' "
+            "GROUP BY employee ORDER BY MIN(start_date), employee LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset))]
+
+    def pending_queue(self, offset=0, limit=None):
+        return [tuple(row) for row in self.conn.execute(
+            "SELECT COALESCE(start_date, ''), employee, seq FROM leave_history WHERE status = 'Pending' "
+            "ORDER BY start_date, employee, seq LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset))]
+
+    def _write_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    # Replace every row belonging to one employee (caller owns the transaction)
+    def _write_employee(self, name, emp):
+        is_manager = emp.get("is_manager")
+        extra = {k: v for k, v in emp.items() if k not in ("leave_balance", "is_manager", "leave_history")}
+        self.conn.execute(
+            "INSERT INTO employees (name, is_manager, extra) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET is_manager = excluded.is_manager, extra = excluded.extra",
+            (name, None if is_manager is None else int(is_manager), json.dumps(extra) if extra else None))
+        self._delete_rows(name)
+        self.conn.executemany(
+            "INSERT INTO balances (employee, leave_type, days) VALUES (?, ?, ?)",
+            [(name, lt, days) for lt, days in emp.get("leave_balance", {}).items()])
+        self.conn.executemany(
+            "INSERT INTO leave_history (employee, seq, type, days, start_date, status, requested_on, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(name, seq) + self._entry_to_row(entry) for seq, entry in enumerate(emp.get("leave_history", []))])
+
+    def _delete_rows(self, name):
+        self.conn.execute("DELETE FROM balances WHERE employee = ?", (name,))
+        self.conn.execute("DELETE FROM leave_history WHERE employee = ?", (name,))
+
+    # Split a history entry into its indexed columns plus a JSON blob for any other keys
+    def _entry_to_row(self, entry):
+        extra = {k: v for k, v in entry.items() if k not in self.HISTORY_COLUMNS}
+        return tuple(entry.get(col) for col in self.HISTORY_COLUMNS) + (json.dumps(extra) if extra else None,)
+
+    def _row_to_entry(self, row):
+        entry = dict(zip(self.HISTORY_COLUMNS, row[:-1]))
+        if row[-1]:
+            entry.update(json.loads(row[-1]))
+        return entry
@@ -0,0 +1,27 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root and are imported by their plain names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Run each test in its own directory: Database opens system.log in the working
+# directory, and the stores under test are created next to it
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def write_store(path, employees=None, holidays=None):
+    with open(path, "w") as f:
+        json.dump({"employees": employees or {}, "holidays": holidays or []}, f, indent=4)
+    return str(path)
+
+
+def employee(history=None, **balances):
+    return {"leave_balance": balances or {"Annual Leave": 10, "Sick Leave": 5},
+            "leave_history": history or []}
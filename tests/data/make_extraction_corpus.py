@@ -0,0 +1,102 @@
+"""
+Build extraction_corpus.json, the golden cases for test_extraction.py, from the
+rule-based extractor as it was before its matchers were precompiled:
+
+    git show <commit>:ai.py > old_ai.py
+    python tests/data/make_extraction_corpus.py old_ai.py
+
+The old extractor needs dateparser. Only its is_valid_date, get_next_weekday
+and extract_intent_entities functions are loaded, so openai is not needed.
+Dates are resolved against the day the corpus is built on, which is stored
+with the cases so the test can resolve them against the same day.
+"""
+import ast
+import json
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+import dateparser
+import dateparser.search
+
+SEED = 6
+RANDOM_CASES = 3000
+OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "extraction_corpus.json")
+
+# Sentences users typically type
+TYPICAL = [
+    "I want to take 2 days of sick leave from 2031-08-10",
+    "How many annual leaves do I have left?",
+    "Show my leave history",
+    "show my leave history page 2",
+    "cancel my annual leave starting 2031-03-05",
+    "I need 3 days off next monday",
+    "request 1 day sick leave tomorrow",
+    "can I take maternity leave for 30 days from the day after tomorrow",
+    "what is my sick leave balance",
+    "what leaves have I taken",
+    "please cancel the sick leave on 2031-11-20",
+    "I'd like 5 days annual leave starting june 10",
+    "need leave in 3 days",
+    "take 2 days off this friday",
+    "hello",
+]
+
+# Fragments combined at random. Keywords of every intent are mixed so their
+# precedence is exercised; the manager-only availability keywords added later
+# are left out because the old extractor did not know them.
+OPENERS = ["", "i want to", "please", "can i", "i need to", "could you", "hey,"]
+VERBS = ["take", "request", "cancel", "check", "show", "view", "book", "get", ""]
+KEYWORDS = ["history", "show all my previous", "what leaves have i taken", "leave record",
+            "display my leave", "past leave", "previous leave request", "what is my past leave",
+            "all my previous leave", "cancel", "balance", "how many", "do i have", "remaining",
+            "left", "take", "request", "need", "off", "leave", "days", "day", ""]
+LEAVE_WORDS = ["sick", "annual", "maternity", "Sick", "ANNUAL", "sickness", "annually",
+               "sick and annual", "maternity/sick", ""]
+NUMBERS = ["1", "2", "3", "10", "14", "30", "0", "2.5", "three", ""]
+DATES = ["tomorrow", "day after tomorrow", "the day after tomorrow", "next monday", "next friday",
+         "next sunday", "2031-03-05", "2031-12-24", "2030-1-2", "june 10", "10 june", "march 3rd",
+         "1st of july", "dec 24, 2031", "15/08", "15/08/2031", "this friday", "this monday",
+         "in 3 days", "in 2 weeks", "next week", "end of month", "end of the month", "page 3", ""]
+TAILS = ["", "please", "thanks", "?", "!", "for my trip", "page 2"]
+
+
+def load_old_extractor(path):
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    wanted = {"is_valid_date", "get_next_weekday", "extract_intent_entities"}
+    module = ast.Module(body=[node for node in tree.body
+                              if isinstance(node, ast.FunctionDef) and node.name in wanted], type_ignores=[])
+    namespace = {"re": re, "dateparser": dateparser, "datetime": datetime, "timedelta": timedelta}
+    exec(compile(module, path, "exec"), namespace)
+    return namespace["extract_intent_entities"]
+
+def random_phrase(rng):
+    parts = [rng.choice(OPENERS), rng.choice(VERBS), rng.choice(NUMBERS), rng.choice(LEAVE_WORDS),
+             rng.choice(KEYWORDS), rng.choice(["from", "on", "starting", ""]), rng.choice(DATES),
+             rng.choice(TAILS)]
+    return " ".join(part for part in parts if part)
+
+
+def main(argv):
+    if len(argv) != 2:
+        sys.exit("usage: make_extraction_corpus.py OLD_AI_PY")
+    extract = load_old_extractor(argv[1])
+    rng = random.Random(SEED)
+    phrases = list(dict.fromkeys(TYPICAL + [random_phrase(rng) for _ in range(RANDOM_CASES)]))
+    today = datetime.now().date().isoformat()
+    cases = [[phrase, *extract(phrase)] for phrase in phrases]
+    if datetime.now().date().isoformat() != today:
+        sys.exit("the day changed while building the corpus; run it again")
+    # One case per line, so a rebuilt corpus diffs readably
+    with open(OUTPUT, "w") as f:
+        f.write('{"today": %s, "cases": [\n' % json.dumps(today))
+        f.write(",\n".join(json.dumps(case) for case in cases))
+        f.write("\n]}\n")
+    print(f"{len(cases)} cases written to {OUTPUT}")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,65 @@
+import pytest
+
+import accrual
+import ledger
+from conftest import employee, write_store
+from database import Database
+
+POLICY = {
+    "Annual Leave": {"grant": 12, "carry_over": 5, "carry_over_expires": "03-31"},
+    "Sick Leave": {"grant": 6, "carry_over": 0},
+}
+
+def store(workdir):
+    taken = {"type": "Annual Leave", "days": 2, "start_date": "2027-02-01", "status": "Approved"}
+    return write_store(workdir / "employees.json", {
+        "Alice": employee(history=[taken], **{"Annual Leave": 10, "Sick Leave": 5}),
+        "Bob": employee(**{"Annual Leave": 3}),
+    })
+
+def open_db(filename, engine):
+    if engine == "sqlite":
+        return Database("employees.db", engine="sqlite", seed_filename=filename)
+    return Database(filename, journal=True)
+
+def check(db, balances):
+    for name, expected in balances.items():
+        emp = db.get_employee(name)
+        assert emp["leave_balance"] == expected
+        assert ledger.mismatches(emp) == []
+
+
+# Alice is read before the runs in one case, so the changes are applied both to a
+# materialized record and to an employee that is still an unread byte range
+@pytest.mark.parametrize("engine, read_first", [("json", False), ("json", True), ("sqlite", False)])
+def test_accrual_and_expiry_keep_the_ledger_consistent(workdir, engine, read_first):
+    filename = store(workdir)
+    db = open_db(filename, engine)
+    if read_first:
+        db.get_employee("Alice")
+    result = accrual.run(db, "accrual", 2027, POLICY)
+    assert len(result.diffs) == 4 and len(result.changes) == 2
+    assert accrual.run(db, "accrual", 2027, POLICY).already_applied
+    # The days the expiry run looks at are kept per employee, not in the store-wide runs
+    assert db.get_employee("Alice")[accrual.CARRIED_KEY] == {"year": 2027, "days": {"Annual Leave": 5}}
+    assert db.get_meta(accrual.RUNS_KEY)["accrual-2027"]["employees"] == 2
+    accrual.run(db, "expire", 2027, POLICY)
+    # Alice used 2 of her 5 carried-over days by the deadline, Bob none of his 3
+    after = {"Alice": {"Annual Leave": 14, "Sick Leave": 6}, "Bob": {"Annual Leave": 12, "Sick Leave": 6}}
+    check(db, after)
+    db.close()
+
+    db = open_db(filename, engine)
+    check(db, after)
+    assert [g["reason"] for g in db.get_employee("Bob")["leave_grants"]] == ["opening", "accrual-2027",
+                                                                              "accrual-2027", "expire-2027"]
+    db.close()
+
+def test_dry_run_saves_nothing(workdir):
+    filename = store(workdir)
+    db = open_db(filename, "json")
+    result = accrual.run(db, "accrual", 2027, POLICY, dry_run=True)
+    assert len(result.changes) == 2
+    assert db.get_employee("Bob") == employee(**{"Annual Leave": 3})
+    assert db.get_meta(accrual.RUNS_KEY) is None
+    db.close()
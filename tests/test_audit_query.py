@@ -0,0 +1,88 @@
+import glob
+
+from audit import AuditLogger
+from audit_query import AuditIndex, parse_line
+
+
+def messages(records):
+    return [record["message"] for record in records]
+
+def log(logger, message, **fields):
+    logger.log(message, **fields)
+    logger.flush()
+
+
+def test_legacy_lines_are_parsed():
+    assert parse_line("[2025-06-02 15:23:10] Admin denied 5 Annual Leave leave(s) for Tharushi starting 2025-06-10.") == {
+        "ts": "2025-06-02 15:23:10", "action": "deny", "actor": "Admin", "days": 5, "leave_type": "Annual Leave",
+        "employee": "Tharushi", "start_date": "2025-06-10",
+        "message": "Admin denied 5 Annual Leave leave(s) for Tharushi starting 2025-06-10."}
+    # Employees acting on their own records are also the employee
+    record = parse_line("[2025-06-02 09:00:00] Alice requested 2 Sick Leave leave(s) from 2025-06-05.")
+    assert (record["action"], record["actor"], record["employee"], record["days"]) == ("request_leave", "Alice", "Alice", 2)
+    record = parse_line("[2025-06-02 09:01:00] Alice cancelled a leave request.")
+    assert (record["action"], record["employee"], "leave_type" in record) == ("cancel_leave", "Alice", False)
+    record = parse_line("[2025-06-02 09:02:00] Alice cancelled a leave request for Sick Leave starting on 2025-06-05.")
+    assert (record["leave_type"], record["start_date"]) == ("Sick Leave", "2025-06-05")
+    assert parse_line("[2025-06-02 09:03:00] Admin approved all pending leaves for Bob.")["action"] == "approve_all"
+    assert parse_line("[2025-06-02 15:12:20] Admin added new employee Menasha.")["employee"] == "Menasha"
+    assert parse_line("[2025-06-02 15:12:45] Admin added holiday 2025-10-16.")["date"] == "2025-10-16"
+    # Unknown messages still carry their actor
+    record = parse_line("[2025-06-02 16:00:00] Admin restarted the server.")
+    assert (record["actor"], "action" in record) == ("Admin", False)
+
+def test_structured_and_unreadable_lines():
+    assert parse_line('{"ts": "2025-06-02 09:00:00", "actor": "Admin", "message": "hi"}')["actor"] == "Admin"
+    assert parse_line('{"ts": "2025-06-02') is None
+    assert parse_line("no timestamp here") is None
+    assert parse_line("  \n") is None
+
+
+def test_update_indexes_only_new_complete_lines(workdir):
+    with open("system.log", "w") as f:
+        f.write("[2025-06-02 09:00:00] Alice requested 2 Sick Leave leave(s) from 2025-06-05.\n")
+        f.write("[2025-06-02 10:00:00] Admin approved 2 Sick Leave leave(s) for Alice starting 2025-06-05.\n")
+    index = AuditIndex()
+    index.update()
+    assert [r["action"] for r in index.query(employee="Alice")] == ["request_leave", "approve"]
+
+    # A line still being written is left for the next update
+    with open("system.log", "a") as f:
+        f.write('{"ts": "2025-06-03 09:00:00", "actor": "Bob", "action": "request_leave", "employee": "Bob", '
+                '"message": "Bob requested leave."}\n')
+        f.write('{"ts": "2025-06-03 10:00:00", "actor": "Admin", "action": "deny", ')
+    index.update()
+    assert messages(index.query(since="2025-06-03")) == ["Bob requested leave."]
+    with open("system.log", "a") as f:
+        f.write('"employee": "Bob", "message": "Admin denied Bob."}\n')
+    index.update()
+    index.update()
+    assert messages(index.query(employee="Bob")) == ["Bob requested leave.", "Admin denied Bob."]
+    assert len(index.query()) == 4
+    assert messages(index.query(actor="Admin", until="2025-06-02")) == [
+        "Admin approved 2 Sick Leave leave(s) for Alice starting 2025-06-05."]
+    index.close()
+
+def test_rotated_segments_are_re_pointed_and_pruned(workdir):
+    # max_bytes=1 rotates the file before every flush that finds it non-empty
+    logger = AuditLogger(max_bytes=1, flush_interval=3600, backup_count=2)
+    index = AuditIndex()
+    log(logger, "first", actor="Admin", action="add_employee", employee="Alice")
+    index.update()
+    log(logger, "second", actor="Admin", action="add_employee", employee="Bob")
+    assert len(glob.glob("system.log.*.gz")) == 1
+    # The indexed live file is now the rotated file; its rows are kept, not indexed twice
+    index.update()
+    assert messages(index.query()) == ["first", "second"]
+    assert [path.endswith(".gz") for path, in index.conn.execute("SELECT path FROM segments ORDER BY id")] == [True, False]
+
+    # Rotated twice between updates: the older file takes over the live segment,
+    # the newer one becomes a segment of its own
+    log(logger, "third", actor="Admin", action="add_employee", employee="Carol")
+    log(logger, "fourth", actor="Admin", action="delete_employee", employee="Alice")
+    index.update()
+    # backup_count=2 pruned the file holding "first"
+    assert messages(index.query()) == ["second", "third", "fourth"]
+    assert messages(index.query(employee="Alice")) == ["fourth"]
+    logger.close()
+    index.close()
@@ -0,0 +1,94 @@
+import random
+from datetime import date
+
+from availability import AvailabilityIndex
+from conftest import employee, write_store
+from database import Database
+from employee import EmployeeManager
+from records import APPROVED, CANCELLED, DENIED, PENDING
+from utils import leave_span
+
+TODAY = date.today().toordinal()
+
+
+# Leave from 60 days ago to 60 days ahead, so some spans start before the index window
+def random_employee(rng, entries):
+    history = []
+    for _ in range(entries):
+        start = TODAY - 60 + rng.randrange(120)
+        history.append({"type": "Annual Leave", "days": rng.randint(1, 10),
+                        "start_date": date.fromordinal(start).isoformat(),
+                        "status": rng.choice((PENDING, APPROVED, CANCELLED, DENIED))})
+    return employee(history=history)
+
+def brute_headcount(employees, first, count):
+    counts = []
+    for day in range(first, first + count):
+        counts.append(sum(1 for emp in employees.values()
+                          if any(entry["status"] in (PENDING, APPROVED)
+                                 and leave_span(entry)[0] <= day <= leave_span(entry)[1]
+                                 for entry in emp["leave_history"])))
+    return counts
+
+def brute_available_range(employees, min_available, length, first, horizon):
+    counts = brute_headcount(employees, first, horizon)
+    for start in range(horizon - length + 1):
+        if all(len(employees) - off >= min_available for off in counts[start:start + length]):
+            return first + start
+    return None
+
+def check(index, employees, rng):
+    assert index.headcount_off(TODAY, 90) == brute_headcount(employees, TODAY, 90)
+    for _ in range(20):
+        min_available = rng.randrange(len(employees) + 2)
+        length = rng.randint(1, 10)
+        assert index.first_available_range(min_available, length, TODAY, 90) == \
+            brute_available_range(employees, min_available, length, TODAY, 90)
+
+
+def test_availability_index_matches_brute_force():
+    rng = random.Random(14)
+    employees = {f"E{i}": random_employee(rng, rng.randrange(8)) for i in range(30)}
+    index = AvailabilityIndex()
+    index.rebuild(employees.items())
+    check(index, employees, rng)
+
+    # Requests, cancellations and decisions only re-index the employee they change
+    for name in rng.sample(sorted(employees), 12):
+        employees[name] = random_employee(rng, rng.randrange(8))
+        index.update(name, employees[name])
+    for name in rng.sample(sorted(employees), 4):
+        del employees[name]
+        index.remove(name)
+    employees["New"] = random_employee(rng, 5)
+    index.update("New", employees["New"])
+    check(index, employees, rng)
+
+def test_queries_before_the_index_window_match_brute_force(workdir):
+    rng = random.Random(41)
+    employees = {f"E{i}": random_employee(rng, rng.randrange(8)) for i in range(30)}
+    db = Database(write_store(workdir / "employees.json", employees))
+    manager = EmployeeManager(db)
+    # Built from today on first, then asked about the past
+    assert [off for _, off in manager.team_availability(30)] == brute_headcount(employees, TODAY, 30)
+    start = date.fromordinal(TODAY - 45).isoformat()
+    assert [off for _, off in manager.team_availability(90, start)] == brute_headcount(employees, TODAY - 45, 90)
+    for min_available in range(25, 31):
+        found = brute_available_range(employees, min_available, 3, TODAY - 45, 90)
+        expected = None if found is None else (date.fromordinal(found).isoformat(),
+                                               date.fromordinal(found + 2).isoformat())
+        assert manager.find_available_range(min_available, 3, start, horizon=90) == expected
+    db.close()
+
+
+def test_availability_phrases_fall_through_for_non_managers(workdir):
+    db = Database(write_store(workdir / "employees.json", {"Alice": employee(), "Boss": employee()}))
+    boss = db.get_employee("Boss")
+    boss["is_manager"] = True
+    db.put_employee("Boss", boss)
+    manager = EmployeeManager(db)
+    entities = {"fallback_intent": "check_balance", "leave_type": "Annual Leave"}
+    assert manager.handle_intent("Alice", "team_availability", entities) == "You have 10 Annual Leave remaining."
+    assert manager.handle_intent("Boss", "team_availability", entities).startswith("Nobody is on leave")
+    assert manager.handle_intent("Alice", "team_availability", {}) == "Sorry, I didn't understand that."
+    db.close()
@@ -0,0 +1,99 @@
+import random
+from datetime import date
+
+import pytest
+
+from business_calendar import BusinessCalendar
+from conftest import write_store
+from database import Database
+
+TODAY = date.today().toordinal()
+
+
+def random_holidays(rng, count):
+    return {TODAY - 400 + rng.randrange(2500) for _ in range(count)}
+
+def is_working(day, holidays):
+    return date.fromordinal(day).weekday() < 5 and day not in holidays
+
+def naive_count(first, last, holidays):
+    return sum(1 for day in range(first, last + 1) if is_working(day, holidays))
+
+def naive_end_of(start, n, holidays):
+    day = start
+    while True:
+        if is_working(day, holidays):
+            n -= 1
+            if n == 0:
+                return day
+        day += 1
+
+def build(holidays):
+    cal = BusinessCalendar()
+    cal.rebuild([date.fromordinal(day).isoformat() for day in holidays])
+    return cal
+
+
+def test_count_and_end_of_match_day_by_day_loop():
+    rng = random.Random(24)
+    holidays = random_holidays(rng, 300)
+    cal = build(holidays)
+    for _ in range(2000):
+        first = TODAY - 400 + rng.randrange(2500)
+        last = first + rng.randrange(-3, 40)
+        assert cal.count(first, last) == naive_count(first, last, holidays)
+        n = rng.randint(1, 30)
+        assert cal.end_of(first, n) == naive_end_of(first, n, holidays)
+        assert cal.is_working_day(first) == is_working(first, holidays)
+
+def test_weekend_and_holiday_spans():
+    # 2031-12-24 is a Wednesday: the 25th and 26th are holidays, then a weekend
+    holidays = {date(2031, 12, 25).toordinal(), date(2031, 12, 26).toordinal()}
+    cal = build(holidays)
+    wednesday = date(2031, 12, 24).toordinal()
+    assert cal.count(wednesday, wednesday + 5) == 2
+    assert cal.end_of(wednesday, 2) == date(2031, 12, 29).toordinal()
+    # A start on a non-working day does not count itself
+    assert cal.end_of(wednesday + 1, 1) == date(2031, 12, 29).toordinal()
+    assert cal.count(wednesday + 1, wednesday + 4) == 0
+    assert not cal.is_working_day(wednesday + 3)
+
+# MAX_REMOVED=8 folds the added holidays into the arrays several times along the way
+@pytest.mark.parametrize("max_removed", [None, 8])
+def test_incremental_add_matches_rebuild(max_removed):
+    rng = random.Random(7)
+    holidays = random_holidays(rng, 100)
+    cal = build(holidays)
+    if max_removed is not None:
+        cal.MAX_REMOVED = max_removed
+    for _ in range(50):
+        day = TODAY - 400 + rng.randrange(2500)
+        holidays.add(day)
+        cal.add(date.fromordinal(day).isoformat())
+        first = TODAY - 400 + rng.randrange(2500)
+        assert cal.count(first, first + 60) == naive_count(first, first + 60, holidays)
+        assert cal.end_of(first, 20) == naive_end_of(first, 20, holidays)
+    # The whole window, grown by the queries above, agrees with the holidays added
+    days = range(cal.first_day, cal.last_day + 1)
+    assert [cal.is_working_day(day) for day in days] == [is_working(day, holidays) for day in days]
+    working = [day for day in days if is_working(day, holidays)]
+    assert [cal.end_of(cal.first_day, n) for n in range(1, len(working) + 1)] == working
+
+def test_window_grows_for_far_queries():
+    rng = random.Random(3)
+    holidays = random_holidays(rng, 50)
+    cal = build(holidays)
+    before = cal.first_day - 1000
+    assert cal.count(before, before + 20) == naive_count(before, before + 20, holidays)
+    # A leave long enough to run past the window's end
+    assert cal.end_of(TODAY, 5000) == naive_end_of(TODAY, 5000, holidays)
+
+def test_database_uses_calendar_for_holidays_added_later(workdir):
+    db = Database(write_store(workdir / "employees.json", holidays=["2031-12-25"]))
+    assert db.working_days("2031-12-22", "2031-12-28") == 4
+    assert db.leave_end_date("2031-12-24", 2) == "2031-12-26"
+    db.add_holiday("2031-12-26")
+    assert db.working_days("2031-12-22", "2031-12-28") == 3
+    assert db.leave_end_date("2031-12-24", 2) == "2031-12-29"
+    assert not db.is_working_day("2031-12-26")
+    db.close()
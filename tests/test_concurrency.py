@@ -0,0 +1,80 @@
+import multiprocessing
+from datetime import date, timedelta
+
+from conftest import employee, write_store
+from database import ConflictError, Database
+from employee import EmployeeManager
+from records import CANCELLED, PENDING
+
+WORKERS = 4
+ROUNDS = 12
+EMPLOYEES = ["Alice", "Bob", "Carol"]
+BALANCE = 1000
+
+
+def working_days(count, first=date(2031, 1, 6)):
+    days = []
+    day = first
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+# Handle one intent, starting over from a fresh read whenever another process
+# changed the employee in between
+def handle(manager, name, intent, entities):
+    while True:
+        try:
+            return manager.handle_intent(name, intent, entities)
+        except ConflictError:
+            continue
+
+# Request one-day leaves on this worker's own dates, spread over the shared
+# employees, and cancel every other one. Returns {(employee, date): cancelled}.
+def worker(filename, dates):
+    db = Database(filename, journal=True, compact_threshold=7)
+    manager = EmployeeManager(db)
+    outcome = {}
+    try:
+        for i, start_date in enumerate(dates):
+            name = EMPLOYEES[i % len(EMPLOYEES)]
+            entities = {"leave_type": "Annual Leave", "num_days": 1, "start_date": start_date}
+            response = handle(manager, name, "request_leave", entities)
+            assert "requested" in response, response
+            outcome[(name, start_date)] = False
+            if i % 2:
+                response = handle(manager, name, "cancel_leave", entities)
+                assert response == "Leave cancelled successfully.", response
+                outcome[(name, start_date)] = True
+        db.audit.flush()
+    finally:
+        db.close()
+    return outcome
+
+
+def test_concurrent_request_and_cancel(workdir):
+    filename = write_store(workdir / "employees.json",
+                           {name: employee(**{"Annual Leave": BALANCE}) for name in EMPLOYEES})
+    dates = working_days(WORKERS * ROUNDS)
+    with multiprocessing.Pool(WORKERS) as pool:
+        outcomes = pool.starmap(worker, [(filename, dates[i::WORKERS]) for i in range(WORKERS)])
+    expected = {}
+    for outcome in outcomes:
+        expected.update(outcome)
+    assert len(expected) == WORKERS * ROUNDS
+
+    db = Database(filename, journal=True)
+    for name in EMPLOYEES:
+        emp = db.get_employee(name)
+        history = {entry["start_date"]: entry["status"] for entry in emp["leave_history"]}
+        # No request was lost or written twice
+        assert len(history) == len(emp["leave_history"])
+        assert history == {start_date: CANCELLED if cancelled else PENDING
+                           for (owner, start_date), cancelled in expected.items() if owner == name}
+        active = sum(1 for status in history.values() if status == PENDING)
+        assert emp["leave_balance"]["Annual Leave"] == BALANCE - active
+        # The pending index agrees with the records
+        assert sorted(emp["leave_history"][i]["start_date"] for i in db.pending_requests(name)) \
+            == sorted(start_date for start_date, status in history.items() if status == PENDING)
+    db.close()
@@ -0,0 +1,170 @@
+import json
+import os
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+import ai
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CORPUS = os.path.join(DATA, "extraction_corpus.json")
+# Corpus cases whose start_date changed on purpose: [text, date phrase, old date, new date].
+# The old extractor took the first thing dateparser recognized, often a number ("2 days")
+# or a word ("on"); the fast date resolver reads the date phrase written in the text.
+DATE_CHANGES = os.path.join(DATA, "extraction_date_changes.json")
+# Dates the old extractor resolved itself rather than through dateparser. These are
+# still resolved for every intent; other phrasings only for the intents that use a date.
+RELATIVE_DATE_RE = re.compile(r'tomorrow|next\s+(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)')
+DATED_INTENTS = ("request_leave", "cancel_leave")
+
+
+class NeedsDateparser(Exception):
+    pass
+
+def load_corpus():
+    with open(CORPUS) as f:
+        corpus = json.load(f)
+    return datetime.fromisoformat(corpus["today"]), corpus["cases"]
+
+def load_date_changes():
+    with open(DATE_CHANGES) as f:
+        return json.load(f)["cases"]
+
+# Resolve dates against the day the corpus was built on, in dateparser too
+@pytest.fixture
+def corpus(monkeypatch):
+    today, cases = load_corpus()
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(today.year, today.month, today.day, 12)
+
+    class FrozenSearch:
+        @staticmethod
+        def search_dates(text, settings):
+            import dateparser.search
+            results = dateparser.search.search_dates(text, settings=dict(settings, RELATIVE_BASE=FrozenDatetime.now()))
+            return results and [(found, FrozenDatetime.combine(dt.date(), dt.time())) for found, dt in results]
+
+    monkeypatch.setattr(ai, "datetime", FrozenDatetime)
+    monkeypatch.setattr(ai, "_dateparser_search", FrozenSearch)
+    ai.invalidate_extraction_cache()
+    yield cases
+    ai.invalidate_extraction_cache()
+
+def check(case, changes):
+    text, intent, entities = case
+    got_intent, got = ai.extract_intent_entities(text)
+    assert (got_intent, got.get("leave_type"), got.get("num_days")) == \
+        (intent, entities.get("leave_type"), entities.get("num_days")), text
+    # History pages are the one entity added since
+    if got.pop("page", None) is not None:
+        assert got_intent == "view_history" and re.search(r'\bpage\s+\d+\b', text.lower()), text
+    if got_intent in DATED_INTENTS or RELATIVE_DATE_RE.search(text.lower()):
+        assert got["start_date"] == changes.get(text, entities["start_date"]), text
+    else:
+        # Intents that do not use a start date skip date resolution
+        assert got["start_date"] is None, text
+
+# A clock the test moves forward: ai.datetime.now() returns clock.now
+@pytest.fixture
+def clock(monkeypatch):
+    class Clock:
+        now = datetime(2031, 3, 4, 23, 59)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.combine(Clock.now.date(), Clock.now.time())
+
+    monkeypatch.setattr(ai, "datetime", FrozenDatetime)
+    ai.invalidate_extraction_cache()
+    yield Clock
+    ai.invalidate_extraction_cache()
+
+# Split the cases by whether extracting them reaches the dateparser fallback
+def split_cases(cases, monkeypatch):
+    def slow(text):
+        raise NeedsDateparser
+    local, slow_cases = [], []
+    with monkeypatch.context() as m:
+        m.setattr(ai, "search_dates_slow", slow)
+        for case in cases:
+            try:
+                ai._extract_intent_entities(" ".join(case[0].lower().split()))
+                local.append(case)
+            except NeedsDateparser:
+                slow_cases.append(case)
+    return local, slow_cases
+
+
+def test_corpus_matches_old_extractor(corpus, monkeypatch):
+    local, _ = split_cases(corpus, monkeypatch)
+    assert len(local) > 1000
+    changes = {text: new for text, _, _, new in load_date_changes()}
+    for case in local:
+        check(case, changes)
+
+def test_corpus_matches_old_extractor_with_dateparser(corpus, monkeypatch):
+    pytest.importorskip("dateparser")
+    _, slow_cases = split_cases(corpus, monkeypatch)
+    for case in slow_cases:
+        check(case, {})
+
+def test_date_changes_are_the_date_written_in_the_text(corpus):
+    old_dates = {text: entities["start_date"] for text, _, entities in corpus}
+    changes = load_date_changes()
+    assert changes
+    for text, phrase, old, new in changes:
+        # Each listed change is still a change, and the new date is the phrase's own date
+        assert old_dates[text] == old != new, text
+        assert phrase in " ".join(text.lower().split()), text
+        found, date = ai.resolve_date_fast(phrase)
+        assert found and date.strftime("%Y-%m-%d") == new, text
+
+def test_cached_results_are_copies(corpus):
+    text, _, _ = corpus[0]
+    first = ai.extract_intent_entities(text)[1]
+    first["leave_type"] = "changed"
+    assert ai.extract_intent_entities(text)[1]["leave_type"] != "changed"
+    assert ai.extraction_cache_info().hits == 1
+
+def test_cached_results_copy_nested_values(corpus, monkeypatch):
+    monkeypatch.setattr(ai, "_extract_intent_entities",
+                        lambda text: ("request_leave", {"dates": ["2026-10-19"], "extra": {"half_day": False}}))
+    first = ai.extract_intent_entities("nested")[1]
+    first["dates"].append("2026-10-20")
+    first["extra"]["half_day"] = True
+    assert ai.extract_intent_entities("nested")[1] == {"dates": ["2026-10-19"], "extra": {"half_day": False}}
+
+def test_cache_hits_and_misses(clock):
+    ai.extract_intent_entities("I need 2 days of sick leave tomorrow")
+    # Case and spacing do not matter; other text does
+    ai.extract_intent_entities("  i need 2 DAYS of sick leave   tomorrow ")
+    ai.extract_intent_entities("I need 3 days of sick leave tomorrow")
+    info = ai.extraction_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+def test_relative_dates_are_resolved_again_after_midnight(clock):
+    text = "cancel my annual leave tomorrow"
+    assert ai.extract_intent_entities(text)[1]["start_date"] == "2031-03-05"
+    clock.now += timedelta(minutes=1)
+    assert ai.extract_intent_entities(text)[1]["start_date"] == "2031-03-06"
+    # The day change emptied the cache, so the second call was a miss
+    info = ai.extraction_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (0, 1, 1)
+    assert ai.extract_intent_entities(text)[1]["start_date"] == "2031-03-06"
+    assert ai.extraction_cache_info().hits == 1
+
+def test_availability_phrases_carry_the_intent_for_non_managers():
+    intent, entities = ai.extract_intent_entities("I need 2 days of annual leave, who is off next monday?")
+    assert intent == "team_availability"
+    assert entities["fallback_intent"] == "request_leave"
+    # The request's entities are extracted as for request_leave
+    assert (entities["leave_type"], entities["num_days"]) == ("Annual Leave", 2)
+    assert entities["start_date"] is not None
+    intent, entities = ai.extract_intent_entities("team coverage and my leave history page 3")
+    assert (intent, entities["fallback_intent"], entities["page"]) == ("team_availability", "view_history", 3)
+    assert "fallback_intent" not in ai.extract_intent_entities("show my leave history")[1]
@@ -0,0 +1,154 @@
+import random
+from datetime import date
+
+from conftest import employee, write_store
+from database import Database
+from employee import EmployeeManager
+from indexes import HolidayIndex, LeaveIntervalIndex
+from records import APPROVED, CANCELLED, DENIED, PENDING
+from utils import leave_span, to_ordinal
+
+BASE = date(2031, 1, 1).toordinal()
+
+
+def random_employee(rng, entries):
+    history = []
+    for _ in range(entries):
+        start = BASE + rng.randrange(365)
+        entry = {"type": "Annual Leave", "days": rng.randint(1, 10),
+                 "start_date": date.fromordinal(start).isoformat(),
+                 "status": rng.choice((PENDING, APPROVED, CANCELLED, DENIED))}
+        # Some entries carry an end date past weekends and holidays, others only days
+        if rng.random() < 0.5:
+            entry["end_date"] = date.fromordinal(start + rng.randint(0, 14)).isoformat()
+        history.append(entry)
+    return {"leave_history": history}
+
+def brute_overlapping(emp, first, last):
+    found = []
+    for i, entry in enumerate(emp["leave_history"]):
+        span = leave_span(entry)
+        if entry["status"] in (PENDING, APPROVED) and span[0] <= last and span[1] >= first:
+            found.append(i)
+    return found
+
+def brute_off_on(employees, day):
+    return sorted(name for name, emp in employees.items()
+                  if any(entry["status"] == APPROVED and leave_span(entry)[0] <= day <= leave_span(entry)[1]
+                         for entry in emp["leave_history"]))
+
+def check_against_brute_force(index, employees, rng):
+    for _ in range(300):
+        first = BASE - 20 + rng.randrange(400)
+        last = first + rng.randrange(30)
+        for name, emp in employees.items():
+            assert index.overlapping(name, first, last) == brute_overlapping(emp, first, last)
+    for day in range(BASE - 20, BASE + 400):
+        assert index.off_on(day) == brute_off_on(employees, day)
+
+
+def test_leave_interval_index_matches_brute_force():
+    rng = random.Random(13)
+    employees = {f"E{i}": random_employee(rng, rng.randrange(12)) for i in range(40)}
+    index = LeaveIntervalIndex()
+    index.rebuild(employees.items())
+    check_against_brute_force(index, employees, rng)
+
+    # Incremental changes keep the index equal to a brute-force scan
+    for name in rng.sample(sorted(employees), 15):
+        employees[name] = random_employee(rng, rng.randrange(12))
+        index.update(name, employees[name])
+    for name in rng.sample(sorted(employees), 5):
+        del employees[name]
+        index.remove(name)
+    check_against_brute_force(index, employees, rng)
+    assert index.overlapping("Nobody", BASE, BASE + 10) == []
+
+
+def test_holiday_index_matches_brute_force():
+    rng = random.Random(24)
+    holidays = [date.fromordinal(BASE + rng.randrange(730)).isoformat() for _ in range(60)]
+    # Duplicates and unparseable strings are ignored
+    index = HolidayIndex()
+    index.rebuild(holidays + holidays[:5] + ["not a date"])
+    days = {to_ordinal(h) for h in holidays}
+    assert index.days == sorted(days)
+
+    for day in range(BASE - 10, BASE + 740):
+        assert index.contains(day) == (day in days)
+    for _ in range(500):
+        first = BASE - 10 + rng.randrange(740)
+        last = first + rng.randrange(-2, 60)
+        assert index.between(first, last) == sorted(day for day in days if first <= day <= last)
+
+    new_day = max(days) + 1
+    index.add(date.fromordinal(new_day).isoformat())
+    assert index.contains(new_day) and index.days[-1] == new_day
+
+
+# The approval queue read by scanning every leave history
+def scan_pending(db):
+    return sorted((entry.get("start_date") or "", name, i) for name, emp in db.iter_employees()
+                  for i, entry in enumerate(emp["leave_history"]) if entry["status"] == PENDING)
+
+def check_pending(db):
+    queue = scan_pending(db)
+    assert db.pending_queue() == queue
+    assert db.pending_queue(3, 5) == queue[3:8]
+    names = list(dict.fromkeys(name for _, name, _ in queue))
+    assert db.pending_employees() == names
+    assert db.pending_employees(2, 3) == names[2:5]
+    for name in db.employee_names() + ["Nobody"]:
+        assert db.pending_requests(name) == [i for _, n, i in sorted(queue, key=lambda key: key[2]) if n == name]
+
+
+def test_pending_index_matches_scan_after_each_change(workdir):
+    rng = random.Random(3)
+    employees = {f"E{i}": employee(**{"Annual Leave": 500, "Sick Leave": 500}) for i in range(12)}
+    employees["Boss"] = dict(employee(), is_manager=True)
+    filename = write_store(workdir / "employees.json", employees)
+    db = Database(filename, journal=True)
+    manager = EmployeeManager(db)
+    check_pending(db)
+
+    def submit():
+        day = date.fromordinal(BASE + rng.randrange(365))
+        while day.weekday() >= 5:
+            day = date.fromordinal(day.toordinal() + 1)
+        manager.handle_intent(rng.choice(db.employee_names()), "request_leave",
+                              {"leave_type": rng.choice(("Annual Leave", "Sick Leave")),
+                               "num_days": rng.randint(1, 5), "start_date": day.isoformat()})
+
+    def decide():
+        queue = db.pending_queue()
+        picked = rng.sample(queue, min(len(queue), 3))
+        manager.decide_leaves([{"employee": name, "position": pos, "decision": rng.choice(("approve", "deny"))}
+                               for _, name, pos in picked])
+
+    def cancel():
+        name = rng.choice(db.employee_names())
+        active = [entry for entry in db.get_employee(name)["leave_history"] if entry["status"] in (PENDING, APPROVED)]
+        if active:
+            entry = rng.choice(active)
+            manager.handle_intent(name, "cancel_leave", {"leave_type": entry["type"], "start_date": entry["start_date"]})
+
+    for _ in range(60):
+        submit()
+    check_pending(db)
+    for step in range(80):
+        rng.choice((submit, submit, decide, cancel))()
+        if step % 20 == 19:
+            # Decide by filter, approve one employee's queue, and remove one employee
+            manager.decide_leaves(decision="deny", leave_type="Sick Leave", max_days=2)
+            manager.handle_intent("Boss", "approve_leave", {"employee_name": rng.choice(db.employee_names())})
+            db.delete_employee(rng.choice([name for name in db.employee_names() if name != "Boss"]))
+        check_pending(db)
+
+    # Changes made by another process reach the index through the journal
+    other = Database(filename, journal=True)
+    EmployeeManager(other).decide_leaves(decision="approve", max_days=3)
+    other.delete_employee(db.pending_employees()[0])
+    other.close()
+    db.refresh()
+    check_pending(db)
+    db.close()
@@ -0,0 +1,121 @@
+import json
+import os
+from pathlib import Path
+
+from conftest import employee, write_store
+from database import Database
+
+
+def open_db(filename, **kwargs):
+    return Database(filename, journal=True, **kwargs)
+
+def read_file(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def test_replay_applies_journal_over_snapshot(workdir):
+    filename = write_store(workdir / "employees.json", {"Alice": employee()})
+    db = open_db(filename)
+    bob = employee(history=[{"type": "Annual Leave", "days": 2, "start_date": "2031-03-03", "status": "Pending"}])
+    db.put_employee("Bob", bob)
+    db.add_holiday("2031-12-25")
+    db.delete_employee("Alice")
+    db.close()
+
+    # The snapshot is not rewritten until compaction: readers of the raw file see the
+    # old state, only a journaled load sees the changes
+    assert set(read_file(filename)["employees"]) == {"Alice"}
+    assert len(Path(filename + ".journal").read_text().splitlines()) == 3
+
+    db = open_db(filename)
+    assert db.employee_names() == ["Bob"]
+    assert db.get_employee("Bob") == bob
+    assert db.is_holiday("2031-12-25")
+    assert db.pending_requests("Bob")
+    db.close()
+
+def test_torn_tail_is_ignored_and_truncated(workdir):
+    filename = write_store(workdir / "employees.json")
+    db = open_db(filename)
+    db.put_employee("Alice", employee())
+    db.close()
+    journal = filename + ".journal"
+    valid_size = os.path.getsize(journal)
+    # A crash mid-append leaves a partial record without its newline
+    with open(journal, "a") as f:
+        f.write('{"op": "put_employee", "name": "Bob", "val')
+
+    db = open_db(filename)
+    assert db.employee_names() == ["Alice"]
+    assert os.path.getsize(journal) == valid_size
+    # New records start on a clean line and survive the next replay
+    db.put_employee("Carol", employee())
+    db.close()
+    db = open_db(filename)
+    assert sorted(db.employee_names()) == ["Alice", "Carol"]
+    db.close()
+
+def test_undecodable_line_ends_replay(workdir):
+    filename = write_store(workdir / "employees.json")
+    journal = filename + ".journal"
+    with open(journal, "w") as f:
+        f.write(json.dumps({"op": "put_employee", "name": "Alice", "value": employee()}) + "\n")
+        f.write("not json\n")
+        f.write(json.dumps({"op": "put_employee", "name": "Bob", "value": employee()}) + "\n")
+
+    db = open_db(filename)
+    assert db.employee_names() == ["Alice"]
+    db.close()
+    assert len(Path(journal).read_text().splitlines()) == 1
+
+def test_compaction_at_threshold(workdir):
+    filename = write_store(workdir / "employees.json")
+    db = open_db(filename, compact_threshold=3)
+    db.put_employee("Alice", employee())
+    db.put_employee("Bob", employee())
+    assert len(Path(filename + ".journal").read_text().splitlines()) == 2
+    assert read_file(filename)["employees"] == {}
+
+    db.add_holiday("2031-01-01")
+    # The third record folds the journal into the snapshot and empties it
+    assert os.path.getsize(filename + ".journal") == 0
+    document = read_file(filename)
+    assert sorted(document["employees"]) == ["Alice", "Bob"]
+    assert document["holidays"] == ["2031-01-01"]
+
+    db.put_employee("Carol", employee())
+    db.close()
+    db = open_db(filename)
+    assert sorted(db.employee_names()) == ["Alice", "Bob", "Carol"]
+    db.close()
+
+def test_save_compacts(workdir):
+    filename = write_store(workdir / "employees.json", {"Alice": employee()})
+    db = open_db(filename)
+    db.put_employee("Alice", employee(**{"Annual Leave": 4}))
+    db.save()
+    assert os.path.getsize(filename + ".journal") == 0
+    assert read_file(filename)["employees"]["Alice"]["leave_balance"] == {"Annual Leave": 4}
+    db.close()
+
+def test_replay_after_compaction_crash_is_harmless(workdir):
+    filename = write_store(workdir / "employees.json")
+    db = open_db(filename)
+    db.put_employee("Alice", employee())
+    db.add_holiday("2031-01-01")
+    db.close()
+    journal = filename + ".journal"
+    records = Path(journal).read_text()
+
+    db = open_db(filename)
+    db.backend.compact()
+    db.close()
+    # Crash after the new snapshot was renamed in but before the journal was emptied
+    with open(journal, "w") as f:
+        f.write(records)
+
+    db = open_db(filename)
+    assert db.employee_names() == ["Alice"]
+    assert db.get_holidays() == ["2031-01-01"]
+    db.close()
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ai
+from llm_cache import LLMResponseCache
+
+TEXT = "I need 2 days of sick leave tomorrow"
+
+
+class FakeOpenAI:
+    # Local OpenAI-compatible HTTP server: answers POST /v1/chat/completions with
+    # reply after delay seconds, or with an error body when status is not 200
+    def __init__(self):
+        self.reply = None
+        self.delay = 0.0
+        self.status = 200
+        self.requests = []
+        # Set on teardown so handlers still sleeping for a slow answer return at once
+        self.released = threading.Event()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.requests.append((self.path, self.headers.get("Authorization"), body))
+                fake.released.wait(fake.delay)
+                if fake.status == 200:
+                    payload = {"id": "chatcmpl-test", "object": "chat.completion", "created": int(time.time()),
+                               "model": body["model"],
+                               "choices": [{"index": 0, "finish_reason": "stop",
+                                            "message": {"role": "assistant", "content": fake.reply}}],
+                               "usage": {"prompt_tokens": 30, "completion_tokens": 12, "total_tokens": 42}}
+                else:
+                    payload = {"error": {"message": fake.reply, "type": fake.reply, "code": fake.reply}}
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(fake.status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:
+                    # The client gave up waiting and closed the connection
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def answer(self, reply, delay=0.0, status=200):
+        self.reply, self.delay, self.status = reply, delay, status
+        return self
+
+    def close(self):
+        self.released.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# The real AsyncOpenAI client, pointed at the fake server through OPENAI_BASE_URL
+@pytest.fixture
+def fake_openai(workdir, monkeypatch):
+    pytest.importorskip("openai")
+    fake = FakeOpenAI()
+    monkeypatch.setenv("OPENAI_BASE_URL", fake.url)
+    monkeypatch.setattr(ai, "OPENAI_BASE_URL", None)
+    monkeypatch.setattr(ai, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(ai, "async_client", None)
+    cache = LLMResponseCache(str(workdir / "llm_cache.db"), ai.resolve_date_local)
+    monkeypatch.setattr(ai, "response_cache", cache)
+    monkeypatch.delenv("LMS_OFFLINE", raising=False)
+    monkeypatch.setattr(ai, "OFFLINE_MODE", False)
+    yield fake
+    fake.close()
+    cache.close()
+
+# Run process_input_async and return its result, the seconds it took and the
+# tasks still pending when it returned
+def run(budget):
+    async def main():
+        start = time.perf_counter()
+        result = await ai.process_input_async(TEXT, budget)
+        elapsed = time.perf_counter() - start
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        return result, elapsed, pending
+    return asyncio.run(main())
+
+AI_ANSWER = {"intent": "request_leave", "entities": {"leave_type": "Sick Leave", "num_days": 2}}
+
+
+def test_slow_ai_falls_back_within_budget(fake_openai):
+    fake_openai.answer(json.dumps(AI_ANSWER), delay=5.0)
+    result, elapsed, pending = run(budget=0.2)
+    assert result == ai.extract_intent_entities(TEXT)
+    assert elapsed < 1.0
+    assert len(fake_openai.requests) == 1
+    assert pending == []
+    assert ai.latency_histograms()["llm_timeout"]
+
+def test_request_timeout_is_passed_to_the_http_call(fake_openai):
+    openai = pytest.importorskip("openai")
+    fake_openai.answer(json.dumps(AI_ANSWER), delay=5.0)
+    start = time.perf_counter()
+    # Without the outer budget, the client's own timeout= ends each attempt
+    with pytest.raises(openai.APITimeoutError):
+        asyncio.run(ai._llm_extract(TEXT, 0.2))
+    assert time.perf_counter() - start < 4.0
+    assert fake_openai.requests
+
+def test_fast_ai_answer_wins_and_is_cached(fake_openai, monkeypatch):
+    fake_openai.answer(json.dumps(AI_ANSWER), delay=0.01)
+    # A rule-based extraction still running when the AI answers is not waited for
+    local = ai._timed_local_extract
+    monkeypatch.setattr(ai, "_timed_local_extract", lambda text: (time.sleep(0.5), local(text))[1])
+    result, elapsed, pending = run(budget=2.0)
+    assert result == ("request_leave", AI_ANSWER["entities"])
+    assert pending == []
+    assert elapsed < 0.4
+
+    path, auth, body = fake_openai.requests[0]
+    assert path == "/v1/chat/completions"
+    assert auth == "Bearer sk-test"
+    assert body["messages"][-1] == {"role": "user", "content": TEXT}
+
+    # The same utterance is answered from the response cache without a call
+    result, _, _ = run(budget=2.0)
+    assert result[0] == "request_leave"
+    assert len(fake_openai.requests) == 1
+    assert ai.get_response_cache().stats()["tokens_saved"] == 42
+
+@pytest.mark.parametrize("reply", ["not json", json.dumps(["a list"]), json.dumps({"intent": 3, "entities": {}})])
+def test_invalid_ai_answer_falls_back(fake_openai, reply):
+    fake_openai.answer(reply)
+    result, _, pending = run(budget=2.0)
+    assert result == ai.extract_intent_entities(TEXT)
+    assert pending == []
+
+def test_ai_error_falls_back(fake_openai):
+    fake_openai.answer("invalid_api_key", status=401)
+    result, _, pending = run(budget=2.0)
+    assert result == ai.extract_intent_entities(TEXT)
+    assert pending == []
+    assert len(fake_openai.requests) == 1
+
+def test_offline_mode_skips_the_ai(fake_openai, monkeypatch):
+    fake_openai.answer(json.dumps(AI_ANSWER))
+    monkeypatch.setenv("LMS_OFFLINE", "1")
+    assert ai.process_input(TEXT) == ai.extract_intent_entities(TEXT)
+    assert fake_openai.requests == []
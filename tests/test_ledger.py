@@ -0,0 +1,43 @@
+import json
+
+import ledger
+from conftest import employee, write_store
+from database import Database, database_settings, open_database
+from employee import EmployeeManager
+
+
+def test_checker_reports_and_fix_repairs_a_corrupted_balance(workdir, capsys):
+    write_store(workdir / "employees.json", {"Alice": employee(), "Bob": employee(), "Carol": employee()})
+    assert ledger.check(database_settings(), workers=1).without_ledger == ["Alice", "Bob", "Carol"]
+    ledger.main(["--bootstrap", "--workers", "1"])
+    assert "Opened the ledger of 3 employee(s)." in capsys.readouterr().out
+
+    db = open_database()
+    manager = EmployeeManager(db)
+    manager.handle_intent("Bob", "request_leave", {"leave_type": "Annual Leave", "num_days": 2, "start_date": "2031-01-06"})
+    manager.handle_intent("Alice", "request_leave", {"leave_type": "Sick Leave", "num_days": 1, "start_date": "2031-01-07"})
+    # A balance written without a ledger event
+    bob = db.get_employee("Bob")
+    assert bob["leave_balance"]["Annual Leave"] == 8
+    bob["leave_balance"]["Annual Leave"] = 11
+    db.put_employee("Bob", bob)
+    db.close()
+
+    # Split over two worker processes, the checker finds only the corrupted balance
+    result = ledger.check(database_settings(), workers=2)
+    assert (result.checked, result.without_ledger) == (3, [])
+    assert result.mismatches == [("Bob", "Annual Leave", 11, 8)]
+
+    ledger.main(["--fix", "--workers", "1"])
+    out = capsys.readouterr().out
+    assert "1 mismatched balance(s)" in out
+    assert "Corrected the balances of 1 employee(s)." in out
+
+    assert ledger.check(database_settings(), workers=1).mismatches == []
+    db = Database("employees.json", journal=True)
+    assert db.get_employee("Bob")["leave_balance"] == {"Annual Leave": 8, "Sick Leave": 5}
+    assert db.get_employee("Alice")["leave_balance"] == {"Annual Leave": 10, "Sick Leave": 4}
+    db.close()
+    with open("system.log") as f:
+        fixes = [record for record in map(json.loads, f) if record.get("action") == "ledger_fix"]
+    assert [(r["employee"], r["leave_type"]) for r in fixes] == [("Bob", "Annual Leave")]
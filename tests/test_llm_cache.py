@@ -0,0 +1,82 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import llm_cache
+from llm_cache import LLMResponseCache
+
+ENTITIES = {"leave_type": "Annual Leave"}
+
+
+# Understands "tomorrow" only, resolving it against a fixed day
+def resolve(text):
+    if "tomorrow" in text:
+        return True, datetime(2031, 3, 5)
+    return False, None
+
+# A cache whose clock the test sets through clock.now
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+def open_cache(workdir, **kwargs):
+    return LLMResponseCache(str(workdir / "llm_cache.db"), resolve, **kwargs)
+
+
+def test_keys_ignore_case_and_spacing(workdir, clock):
+    cache = open_cache(workdir)
+    cache.put("Show my  Annual balance", "check_balance", ENTITIES, tokens=40)
+    assert cache.get("  show MY annual balance\n") == ("check_balance", ENTITIES)
+    assert cache.get("show my sick balance") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["tokens_saved"], stats["entries"]) == (1, 1, 40, 1)
+    cache.close()
+
+def test_entries_expire_after_ttl(workdir, clock):
+    cache = open_cache(workdir, ttl=60)
+    cache.put("show my balance", "check_balance", ENTITIES)
+    clock.now += 60
+    assert cache.get("show my balance") == ("check_balance", ENTITIES)
+    clock.now += 1
+    assert cache.get("show my balance") is None
+    # The next write drops the expired entry and its bytes
+    cache.put("show my history", "view_history", {})
+    stats = cache.stats()
+    assert (stats["entries"], stats["misses"]) == (1, 1)
+    assert stats["bytes"] == len("show my history") + len("view_history") + len("{}")
+    cache.close()
+
+def test_least_recently_used_entries_are_evicted(workdir, clock):
+    size = len("utterance 0") + len("check_balance") + len('{"leave_type": "Annual Leave"}')
+    cache = open_cache(workdir, max_bytes=3 * size)
+    for i in range(3):
+        clock.now += 1
+        cache.put(f"utterance {i}", "check_balance", ENTITIES)
+    clock.now += 1
+    assert cache.get("utterance 0") is not None
+    clock.now += 1
+    cache.put("utterance 3", "check_balance", ENTITIES)
+    assert cache.get("utterance 1") is None
+    assert all(cache.get(f"utterance {i}") is not None for i in (0, 2, 3))
+    assert cache.stats()["bytes"] == 3 * size
+    cache.close()
+
+    # The byte total is read back on reopen, so eviction keeps working across restarts
+    cache = open_cache(workdir, max_bytes=3 * size)
+    assert cache.stats()["bytes"] == 3 * size
+    cache.close()
+
+def test_dates_are_resolved_on_every_hit(workdir, clock):
+    cache = open_cache(workdir)
+    assert cache.put("annual leave tomorrow", "request_leave", dict(ENTITIES, start_date="2031-03-05"))
+    # Stored without the date, which the resolver supplies on each hit
+    assert cache.conn.execute("SELECT entities, has_date FROM responses").fetchall() == [
+        ('{"leave_type": "Annual Leave"}', 1)]
+    assert cache.get("Annual leave TOMORROW")[1]["start_date"] == "2031-03-05"
+    # A date the resolver cannot find again is not cached
+    assert not cache.put("annual leave on my birthday", "request_leave", dict(ENTITIES, start_date="2031-06-01"))
+    assert cache.get("annual leave on my birthday") is None
+    cache.close()
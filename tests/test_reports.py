@@ -0,0 +1,40 @@
+import archive
+from conftest import employee, write_store
+from database import Database
+from reporting import REPORTS, run_report
+
+
+def entry(start, status, days=2, ltype="Annual Leave"):
+    return {"type": ltype, "days": days, "start_date": start, "status": status,
+            "requested_on": start[:8] + "01", "decided_on": start[:8] + "02"}
+
+def store(workdir):
+    return write_store(workdir / "employees.json", {
+        "Alice": employee(history=[entry("2022-03-07", "Denied"), entry("2023-05-08", "Cancelled"),
+                                   entry("2023-06-05", "Approved"), entry("2031-01-06", "Pending")]),
+        "Bob": employee(history=[entry("2022-03-14", "Denied", 1, "Sick Leave"), entry("2022-04-04", "Approved")]),
+    })
+
+
+def test_reports_include_archived_entries(workdir):
+    db = Database(store(workdir))
+    archive_dir = str(workdir / "archive")
+    before = {name: run_report(db, name, archive_dir) for name in REPORTS}
+    result = archive.archive(db, "2025-01-01", directory=archive_dir, chunk_size=1)
+    assert result.entries == 3
+    assert len(db.get_employee("Alice")["leave_history"]) == 2
+    assert {name: run_report(db, name, archive_dir) for name in REPORTS} == before
+    # Without the archive the Denied and Cancelled entries are gone from the reports
+    assert run_report(db, "denials", str(workdir / "elsewhere")) != before["denials"]
+    db.close()
+
+def test_uncommitted_archive_lines_are_not_reported(workdir):
+    db = Database(store(workdir))
+    archive_dir = str(workdir / "archive")
+    before = run_report(db, "utilization", archive_dir)
+    archive.archive(db, "2025-01-01", directory=archive_dir)
+    # A crashed run appended a member for Alice's live entries but never saved the records
+    line = archive._prefix("Alice") + '"type": "Annual Leave", "days": 2, "start_date": "2022-06-06", "status": "Denied"}\n'
+    archive._append_segment(archive_dir, "2022", [line])
+    assert run_report(db, "utilization", archive_dir) == before
+    db.close()
@@ -0,0 +1,42 @@
+import asyncio
+
+from conftest import employee, write_store
+from database import ConflictError, Database
+from server import LeaveServer
+
+
+def request_leave(name, start_date):
+    return {"op": "intent", "employee": name, "intent": "request_leave",
+            "entities": {"leave_type": "Annual Leave", "num_days": 1, "start_date": start_date}}
+
+def test_conflict_fails_only_the_conflicting_writer_of_a_batch(workdir):
+    filename = write_store(workdir / "employees.json", {"Alice": employee(), "Bob": employee()})
+    db = Database(filename, journal=True)
+    other = Database(filename, journal=True)
+    server = LeaveServer(db)
+
+    async def run():
+        server._queued = asyncio.Event()
+        alice = asyncio.create_task(server.handle(request_leave("Alice", "2031-01-06"), {}))
+        bob = asyncio.create_task(server.handle(request_leave("Bob", "2031-01-07"), {}))
+        # Both requests have queued their writes; another process changes Alice first
+        while len(server._queue) < 2:
+            await asyncio.sleep(0)
+        emp = other.get_employee("Alice")
+        emp["is_manager"] = True
+        other.put_employee("Alice", emp)
+        server._commit()
+        return await asyncio.gather(alice, bob, return_exceptions=True)
+
+    alice, bob = asyncio.run(run())
+    assert isinstance(alice, ConflictError)
+    assert bob["ok"] and "requested" in bob["response"]
+    assert server.commits == 1 and server.committed_writes == 1
+    db.close()
+    other.close()
+
+    db = Database(filename, journal=True)
+    assert db.get_employee("Alice")["is_manager"] is True
+    assert db.get_employee("Alice")["leave_history"] == []
+    assert [entry["start_date"] for entry in db.get_employee("Bob")["leave_history"]] == ["2031-01-07"]
+    db.close()
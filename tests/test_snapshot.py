@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+import snapshot
+from conftest import employee, write_store
+from database import Database
+
+
+def read_file(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def test_round_trip_keeps_journal_changes(workdir):
+    source = write_store(workdir / "employees.json", {"Alice": employee()}, ["2031-01-01"])
+    db = Database(source, journal=True)
+    db.put_employee("Bob", employee(history=[{"type": "Sick Leave", "days": 2, "start_date": "2031-02-03",
+                                               "status": "Pending"}]))
+    db.close()
+
+    snapshot.json_to_snapshot(source, "employees.snap")
+    snapshot.snapshot_to_json("employees.snap", "round-trip.json")
+    db = Database(source, journal=True)
+    assert read_file("round-trip.json")["employees"] == dict(db.iter_employees())
+    db.close()
+
+def test_snapshot_to_json_replays_the_snapshot_journal(workdir):
+    write_store(workdir / "employees.json", {"Alice": employee()})
+    snapshot.json_to_snapshot("employees.json", "employees.snap")
+    db = Database("employees.snap", journal=True, binary=True)
+    db.backend.compact()
+    # Written after the last compaction, so only the snapshot's journal has them
+    db.put_employee("Carol", employee())
+    db.add_holiday("2031-12-25")
+    db.delete_employee("Alice")
+    db.close()
+    with open("employees.snap.journal") as f:
+        assert len(f.read().splitlines()) == 3
+
+    snapshot.snapshot_to_json("employees.snap", "out.json")
+    document = read_file("out.json")
+    assert document["employees"] == {"Carol": employee()}
+    assert document["holidays"] == ["2031-12-25"]
+
+def test_snapshot_to_json_rejects_other_files(workdir):
+    write_store(workdir / "employees.json")
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.snapshot_to_json("employees.json", "out.json")
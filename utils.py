@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 
 def validate_date(date_str):
     # Attempts to parse the input string into a date using the YYYY-MM-DD format
@@ -9,3 +9,24 @@ def validate_date(date_str):
     except:
         # Returns False if the input is not a valid date string
         return False
+
+def to_ordinal(date_str):
+    # Converts a YYYY-MM-DD string to a date ordinal, or None if it is not a valid date
+    # fromisoformat is much faster than strptime; the length check keeps it to YYYY-MM-DD
+    if not isinstance(date_str, str) or len(date_str) != 10 or date_str[4] != "-" or date_str[7] != "-":
+        return None
+    try:
+        return date.fromisoformat(date_str).toordinal()
+    except ValueError:
+        return None
+
+def leave_span(entry):
+    # Returns the (first_day, last_day) ordinals covered by a leave entry, both inclusive.
+    # Uses end_date when the entry has one, otherwise counts days from start_date.
+    first = to_ordinal(entry.get("start_date"))
+    if first is None:
+        return None
+    last = to_ordinal(entry.get("end_date"))
+    if last is None:
+        last = first + max(int(entry.get("days") or 1), 1) - 1
+    return first, max(first, last)